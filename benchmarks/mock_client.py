@@ -0,0 +1,99 @@
+# benchmarks/mock_client.py
+
+import itertools
+import json
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Sequence
+
+# Headers advertising limits high enough that the adaptive rate limiter never waits
+UNLIMITED_HEADERS = {
+    "x-ratelimit-limit-requests": "100000000",
+    "x-ratelimit-limit-tokens": "10000000000",
+}
+
+class _RawResponse:
+    def __init__(self, completion):
+        self.headers = UNLIMITED_HEADERS
+        self._completion = completion
+
+    def parse(self):
+        return self._completion
+
+class _Stream:
+    """
+    Iterable of completion chunks, one per token, `token_latency` apart.
+    """
+    def __init__(self, tokens: Sequence[str], token_latency: float, usage):
+        self._tokens = tokens
+        self._token_latency = token_latency
+        self._usage = usage
+        self.closed = False
+
+    def __iter__(self):
+        for token in self._tokens:
+            if self.closed:
+                return
+            if self._token_latency:
+                time.sleep(self._token_latency)
+            yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=token))], usage=None)
+        yield SimpleNamespace(choices=[], usage=self._usage)
+
+    def close(self):
+        self.closed = True
+
+class _Completions:
+    def __init__(self, client: "FakeOpenAIClient"):
+        self._client = client
+        self.with_raw_response = SimpleNamespace(create=lambda **kwargs: _RawResponse(self.create(**kwargs)))
+
+    def create(self, model: str, messages, max_tokens: int = 10, temperature: float = 0.8, stream: bool = False, **kwargs):
+        return self._client._complete(model, messages, max_tokens, stream, kwargs)
+
+class FakeOpenAIClient:
+    """
+    In-process stand-in for openai.OpenAI, for benchmarks.
+
+    Supports `chat.completions.create` and `chat.completions.with_raw_response.create`
+    (which is what utils.gpt4 calls). Each call sleeps `latency` seconds and
+    answers with the next of `replies`, so timings measure this project's code
+    plus a controlled amount of simulated network time, and no sockets are involved.
+
+    Replies are cut to `max_tokens` whitespace-separated tokens, and each token
+    adds `token_latency` seconds: before the reply is returned, or between the
+    chunks of a `stream=True` request. Requests with logit_bias or a JSON
+    response format get the reply's decision as 'C'/'D' or as JSON.
+    """
+    def __init__(self, latency: float = 0.0, replies: Sequence[str] = ("Cooperate", "Defect"), token_latency: float = 0.0):
+        self.latency = latency
+        self.token_latency = token_latency
+        self._replies = itertools.cycle(replies)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=_Completions(self))
+
+    def _complete(self, model: str, messages, max_tokens: int, stream: bool, options: dict):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            content = next(self._replies)
+        decision = "Defect" if "defect" in content.lower() else "Cooperate"
+        if options.get("logit_bias"):
+            content = decision[0]
+        elif options.get("response_format"):
+            content = json.dumps({"decision": decision})
+        tokens = re.findall(r"\s*\S+", content)[:max_tokens]
+        prompt_tokens = sum(len(str(message["content"])) for message in messages) // 4
+        usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=len(tokens), total_tokens=prompt_tokens + len(tokens))
+        if stream:
+            return _Stream(tokens, self.token_latency, usage)
+        if self.token_latency:
+            time.sleep(self.token_latency * len(tokens))
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(index=0, finish_reason="stop", message=SimpleNamespace(role="assistant", content="".join(tokens)))],
+            usage=usage,
+        )
@@ -0,0 +1,314 @@
+# benchmarks/run_benchmarks.py
+"""
+Offline benchmark suite for the game loop, decision parsing, visualization
+and results export.
+
+Every model call goes to an in-process fake client, so results depend only
+on this code and the simulated latency. Timings are written as JSON (one
+record per measurement) so runs can be diffed to catch regressions.
+
+Example:
+    python -m benchmarks.run_benchmarks --quick --output bench.json
+    python -m benchmarks.run_benchmarks --only round_loop concurrency
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from benchmarks.mock_client import FakeOpenAIClient
+from config import DEFAULT_PAYOFF_MATRIX, DEFAULT_INITIAL_PROMPT_A, DEFAULT_INITIAL_PROMPT_B, RESULT_COLUMNS
+from utils.backends import OpenAIBackend
+from utils.decisions import DECISION_MODES
+from utils.batch_runner import build_experiment_grid, run_experiments
+from utils.game_logic import run_prisoners_dilemma_round, run_prisoners_dilemma_round_concurrent
+from utils.gpt4 import get_gpt4_decision, parse_decision
+from utils.history import CompactHistory
+from utils.instrumentation import get_recorder
+from utils.rate_limit import configure_rate_limits
+from utils.results_model import IncrementalResults
+from utils.results_store import ResultsStore
+from utils.visualization import LiveDashboard, visualize_results
+from utils.download import download_results
+
+ROUND_COUNTS = [10, 100, 1000, 10000]
+QUICK_ROUND_COUNTS = [10, 100, 1000]
+LATENCIES = [0.0, 0.01, 0.05, 0.1]
+QUICK_LATENCIES = [0.0, 0.01, 0.05]
+WORKER_COUNTS = [1, 4, 16]
+
+def measure(fn: Callable[[], None], repeat: int = 3) -> Dict[str, float]:
+    """
+    Run `fn` `repeat` times; return the best and median wall time in seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {"seconds": min(times), "median_seconds": statistics.median(times), "repeat": repeat}
+
+def record(results: List[Dict], benchmark: str, params: Dict, timing: Dict, items: int, unit: str):
+    entry = {"benchmark": benchmark, "params": params, **timing, "items": items, "unit": unit}
+    entry["per_second"] = items / timing["seconds"] if timing["seconds"] else float("inf")
+    results.append(entry)
+    described = ", ".join(f"{key}={value}" for key, value in params.items())
+    print(f"{benchmark:<20} {described:<45} {timing['seconds'] * 1000:10.2f} ms  {entry['per_second']:12.0f} {unit}/s")
+
+def make_rows(num_rounds: int, seed: int = 0) -> List[tuple]:
+    rng = np.random.default_rng(seed)
+    moves = np.array(["Cooperate", "Defect"])[rng.integers(2, size=(num_rounds, 2))]
+    rows = []
+    for round_num, (decision_a, decision_b) in enumerate(moves, start=1):
+        payoff_a, payoff_b = DEFAULT_PAYOFF_MATRIX[(decision_a, decision_b)]
+        rows.append((round_num, decision_a, decision_b, payoff_a, payoff_b, False, False))
+    return rows
+
+def play_game(client, num_rounds: int, history_encoding: str):
+    agent_a_history = CompactHistory()
+    agent_b_history = CompactHistory()
+    for _ in range(num_rounds):
+        decision_a, decision_b = run_prisoners_dilemma_round(
+            client, agent_a_history, agent_b_history, True,
+            DEFAULT_INITIAL_PROMPT_A, DEFAULT_INITIAL_PROMPT_B,
+            history_encoding=history_encoding
+        )
+        agent_a_history.append(decision_a)
+        agent_b_history.append(decision_b)
+
+def bench_round_loop(results, round_counts, quick):
+    """
+    Rounds/sec of run_prisoners_dilemma_round with an instant client, by game length.
+    """
+    client = FakeOpenAIClient()
+    for encoding in ("full", "summary"):
+        for num_rounds in round_counts:
+            timing = measure(lambda: play_game(client, num_rounds, encoding), repeat=1 if num_rounds >= 1000 else 3)
+            record(results, "round_loop", {"rounds": num_rounds, "encoding": encoding}, timing, num_rounds, "rounds")
+            get_recorder().clear()
+
+def bench_decision_parsing(results, round_counts, quick):
+    """
+    get_gpt4_decision end to end (cache check, limiter, instrumentation, parsing)
+    and parse_decision alone, over a mix of well-formed and messy replies.
+    """
+    replies = ["Cooperate", "Defect", "  I will DEFECT.\n", "cooperate, to build trust", "Maybe?"]
+    calls = 2000 if quick else 20000
+    client = FakeOpenAIClient(replies=replies)
+
+    def decide():
+        for _ in range(calls):
+            get_gpt4_decision(client, "What should Agent A choose (Cooperate or Defect)?")
+    record(results, "decision_parsing", {"path": "get_gpt4_decision"}, measure(decide), calls, "calls")
+    get_recorder().clear()
+
+    texts = replies * (calls // len(replies))
+    record(results, "decision_parsing", {"path": "parse_decision"}, measure(lambda: [parse_decision(text) for text in texts]), len(texts), "calls")
+
+def bench_decision_modes(results, round_counts, quick):
+    """
+    Time to decision per call for each decision mode against a client that
+    spends `token_latency` per generated token and answers verbosely, as chat
+    models often do despite being asked for one word.
+    """
+    calls = 20 if quick else 100
+    replies = ["I choose to defect because it pays best against this opponent.", "Cooperate. Trust builds over rounds."]
+    for token_latency in (0.0, 0.01):
+        client = FakeOpenAIClient(replies=replies, token_latency=token_latency)
+        for mode in DECISION_MODES:
+            def decide():
+                for _ in range(calls):
+                    get_gpt4_decision(client, "What should Agent A choose (Cooperate or Defect)?", decision_mode=mode)
+            record(results, "decision_modes", {"mode": mode, "token_latency_s": token_latency},
+                   measure(decide, repeat=1 if token_latency else 3), calls, "calls")
+    get_recorder().clear()
+
+def bench_visualization(results, round_counts, quick):
+    """
+    Cost of drawing the charts for a finished game, by game length: the
+    DataFrame-based visualize_results against the incremental LiveDashboard.
+    """
+    for num_rounds in round_counts:
+        rows = make_rows(num_rounds)
+        df = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+        placeholders = [st.empty() for _ in range(5)]
+        timing = measure(lambda: visualize_results(df, *placeholders))
+        record(results, "visualization", {"rounds": num_rounds, "path": "visualize_results"}, timing, num_rounds, "rounds")
+
+        dashboard = LiveDashboard(IncrementalResults(rows))
+        timing = measure(dashboard.render)
+        record(results, "visualization", {"rounds": num_rounds, "path": "LiveDashboard.render"}, timing, num_rounds, "rounds")
+
+def bench_dataframe(results, round_counts, quick):
+    """
+    Building the results table as the main loop does: appending each round to
+    IncrementalResults and converting once, against rebuilding a DataFrame
+    from the full row list after every round (the original loop).
+    """
+    for num_rounds in round_counts:
+        rows = make_rows(num_rounds)
+
+        def incremental():
+            model = IncrementalResults()
+            for row in rows:
+                model.append(*row)
+            model.to_dataframe()
+        record(results, "dataframe", {"rounds": num_rounds, "path": "incremental"}, measure(incremental), num_rounds, "rounds")
+
+        if num_rounds <= 1000:
+            def rebuild_per_round():
+                for end in range(1, num_rounds + 1):
+                    pd.DataFrame(rows[:end], columns=RESULT_COLUMNS)
+            record(results, "dataframe", {"rounds": num_rounds, "path": "rebuild_per_round"}, measure(rebuild_per_round, repeat=1), num_rounds, "rounds")
+
+def bench_csv_export(results, round_counts, quick):
+    """
+    download_results (streamed from the results store) against to_csv of an
+    in-memory DataFrame.
+    """
+    with tempfile.TemporaryDirectory() as root:
+        store = ResultsStore(root)
+        for num_rounds in round_counts:
+            rows = make_rows(num_rounds)
+            game_id = f"bench-{num_rounds}"
+            store.append(game_id, rows)
+            store.flush(game_id)
+            record(results, "csv_export", {"rounds": num_rounds, "path": "download_results"},
+                   measure(lambda: download_results(store, game_id)), num_rounds, "rounds")
+            df = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+            record(results, "csv_export", {"rounds": num_rounds, "path": "DataFrame.to_csv"},
+                   measure(lambda: df.to_csv(index=False).encode("utf-8")), num_rounds, "rounds")
+
+def bench_concurrency(results, round_counts, quick):
+    """
+    The parallel-call path at several simulated latencies: both agents per
+    round concurrently vs one after the other, and whole games spread over
+    run_experiments workers.
+    """
+    num_rounds = 10 if quick else 20
+    for latency in (QUICK_LATENCIES if quick else LATENCIES):
+        client = FakeOpenAIClient(latency=latency)
+
+        def concurrent_rounds():
+            history_a, history_b = CompactHistory(), CompactHistory()
+            for _ in range(num_rounds):
+                outcome = run_prisoners_dilemma_round_concurrent(
+                    client, history_a, history_b, True, DEFAULT_INITIAL_PROMPT_A, DEFAULT_INITIAL_PROMPT_B
+                )
+                history_a.append(outcome.decision_a)
+                history_b.append(outcome.decision_b)
+
+        def sequential_rounds():
+            for _ in range(num_rounds):
+                get_gpt4_decision(client, DEFAULT_INITIAL_PROMPT_A)
+                get_gpt4_decision(client, DEFAULT_INITIAL_PROMPT_B)
+
+        repeat = 1 if latency else 3
+        record(results, "concurrency", {"latency_s": latency, "path": "round_concurrent"},
+               measure(concurrent_rounds, repeat), num_rounds, "rounds")
+        record(results, "concurrency", {"latency_s": latency, "path": "round_sequential"},
+               measure(sequential_rounds, repeat), num_rounds, "rounds")
+
+        specs = build_experiment_grid(
+            {"Default": DEFAULT_PAYOFF_MATRIX}, {"Default": (DEFAULT_INITIAL_PROMPT_A, DEFAULT_INITIAL_PROMPT_B)},
+            round_counts=[5], repetitions=16
+        )
+        backend = OpenAIBackend(client)
+        for workers in WORKER_COUNTS:
+            timing = measure(lambda: run_experiments(backend, specs, max_workers=workers), repeat)
+            record(results, "concurrency", {"latency_s": latency, "path": "run_experiments", "workers": workers},
+                   timing, 16 * 5, "rounds")
+        get_recorder().clear()
+
+def bench_startup(results, round_counts, quick):
+    """
+    Cold import of main.py in a fresh interpreter, and the first run and
+    reruns of the dashboard script under Streamlit's AppTest harness.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    repeat = 3 if quick else 5
+    code = "import time; start = time.perf_counter(); import main; print(time.perf_counter() - start)"
+
+    def cold_import():
+        subprocess.run([sys.executable, "-c", code], check=True, capture_output=True)
+    record(results, "startup", {"path": "cold_import_main_process"}, measure(cold_import, repeat), 1, "starts")
+
+    import_times = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+        import_times.append(float(output.strip().splitlines()[-1]))
+    timing = {"seconds": min(import_times), "median_seconds": statistics.median(import_times), "repeat": repeat}
+    record(results, "startup", {"path": "import_main"}, timing, 1, "starts")
+
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+    record(results, "startup", {"path": "new_session_run"},
+           measure(lambda: AppTest.from_file(script, default_timeout=60).run(), repeat), 1, "runs")
+    app = AppTest.from_file(script, default_timeout=60)
+    app.run()
+    record(results, "startup", {"path": "rerun"}, measure(app.run, repeat * 2), 1, "runs")
+
+BENCHMARKS = {
+    "round_loop": bench_round_loop,
+    "decision_parsing": bench_decision_parsing,
+    "decision_modes": bench_decision_modes,
+    "visualization": bench_visualization,
+    "dataframe": bench_dataframe,
+    "csv_export": bench_csv_export,
+    "concurrency": bench_concurrency,
+    "startup": bench_startup,
+}
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.time(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite.")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Benchmarks to run (default: all).")
+    parser.add_argument("--quick", action="store_true", help="Smaller sizes, for a fast smoke run.")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file to write.")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Per-call INFO logs and bare-mode Streamlit warnings would swamp the timings
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("utils").setLevel(logging.ERROR)
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    # The fake client advertises huge limits; start the limiter there as well
+    configure_rate_limits(initial_requests_per_minute=1e8, initial_tokens_per_minute=1e10)
+
+    round_counts = QUICK_ROUND_COUNTS if args.quick else ROUND_COUNTS
+    results = []
+    for name in args.only or BENCHMARKS:
+        BENCHMARKS[name](results, round_counts, args.quick)
+    with open(args.output, "w") as f:
+        json.dump({"environment": environment(), "quick": args.quick, "results": results}, f, indent=2)
+    print(f"Wrote {len(results)} measurements to {args.output}")
+
+if __name__ == "__main__":
+    main()
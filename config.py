@@ -5,3 +5,46 @@ DEFAULT_PAYOFF_MATRIX = {
     ('Defect', 'Cooperate'): (5, 0),
     ('Defect', 'Defect'): (1, 1),
 }
+
+# Named payoff matrices offered in the sidebar and usable by headless runs
+PAYOFF_PRESETS = {
+    "Default": DEFAULT_PAYOFF_MATRIX,
+    "High Mutual Cooperation": {
+        ('Cooperate', 'Cooperate'): (5, 5),
+        ('Cooperate', 'Defect'): (0, 6),
+        ('Defect', 'Cooperate'): (6, 0),
+        ('Defect', 'Defect'): (1, 1),
+    },
+    "Punishing Defection": {
+        ('Cooperate', 'Cooperate'): (3, 3),
+        ('Cooperate', 'Defect'): (0, 5),
+        ('Defect', 'Cooperate'): (5, 0),
+        ('Defect', 'Defect'): (-1, -1),
+    },
+    "Asymmetrical": {
+        ('Cooperate', 'Cooperate'): (4, 4),
+        ('Cooperate', 'Defect'): (1, 5),
+        ('Defect', 'Cooperate'): (5, 1),
+        ('Defect', 'Defect'): (2, 2),
+    },
+}
+
+DEFAULT_INITIAL_PROMPT_A = (
+    "You are Agent A, an altruistic participant in the Prisoner's Dilemma game. "
+    "Your primary goal is to promote mutual cooperation and trust. "
+    "Based on the previous decisions of Agent B, decide whether to 'Cooperate' or 'Defect'. "
+    "If Agent B has cooperated in the last round, consider reciprocating cooperation to build trust."
+)
+DEFAULT_INITIAL_PROMPT_B = (
+    "You are Agent B, an opportunistic participant in the Prisoner's Dilemma game. "
+    "Your primary goal is to maximize your own payoff, even if it means occasionally defecting. "
+    "Based on the previous decisions of Agent A, decide whether to 'Cooperate' or 'Defect'. "
+    "If Agent A has defected in the last round, consider retaliating to discourage further defections."
+)
+
+# Columns of a game's results table, one row per round. The fallback columns
+# flag decisions substituted because the agent gave no usable answer.
+RESULT_COLUMNS = [
+    "Round", "Agent A Decision", "Agent B Decision", "Agent A Payoff", "Agent B Payoff",
+    "Agent A Fallback", "Agent B Fallback",
+]
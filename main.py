@@ -1,41 +1,103 @@
 # main.py
 
+import time
+_SCRIPT_START = time.perf_counter()  # Every rerun re-executes this file; timed from here
+
+import logging
+import random
+import statistics
+import uuid
+from collections import deque
 import streamlit as st
-import pandas as pd
-from utils.gpt4 import get_openai_client, get_gpt4_decision, get_randomized_initial_prompts
-from utils.game_logic import run_prisoners_dilemma_round, randomize_payoff_matrix, reset_game
-from utils.visualization import visualize_results
-from utils.download import download_results
-from config import DEFAULT_PAYOFF_MATRIX
+from utils.gpt4 import DecisionError, get_openai_client, get_gpt4_decision, get_randomized_initial_prompts, configure_response_cache
+from utils.cache import ResponseCache, DEFAULT_CACHE_PATH, CACHE_MODES
+from utils.backends import BACKEND_CHOICES, OPENAI_BACKEND, MOCK_BACKEND, DEFAULT_MOCK_URL, MockLLMBackend, OpenAIBackend, create_backend
+from utils.game_logic import run_prisoners_dilemma_round_concurrent, randomize_payoff_matrix, reset_game, round_payoffs, dilemma_violations
+from utils.instrumentation import call_context, get_recorder
+from utils.results_model import IncrementalResults
+from utils.results_store import ResultsStore, DEFAULT_STORE_PATH
+from utils.checkpoint import CheckpointStore, DEFAULT_CHECKPOINT_PATH, encode_payoff_matrix
+from utils.history import CompactHistory, HISTORY_ENCODINGS
+from utils.decisions import DECISION_MODES
+from utils.prompt_builder import PROMPT_STYLES
+from config import (
+    DEFAULT_PAYOFF_MATRIX,
+    DEFAULT_INITIAL_PROMPT_A,
+    DEFAULT_INITIAL_PROMPT_B,
+    PAYOFF_PRESETS,
+)
+# The charting and export modules (plotly, pandas, pyarrow) are imported only
+# once there are results to show, so sidebar-only reruns never load them.
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+@st.cache_resource
+def get_cached_openai_client(api_key: str):
+    return get_openai_client(api_key)
+
+@st.cache_resource
+def get_mock_backend(mock_url: str, decision_mode: str) -> MockLLMBackend:
+    return MockLLMBackend(mock_url, decision_mode=decision_mode)
+
+@st.cache_resource
+def get_run_timings() -> dict:
+    return {"cold_start_s": None, "reruns_s": deque(maxlen=100)}
+
+@st.cache_resource
+def get_response_cache(mode: str, samples_per_key: int) -> ResponseCache:
+    return ResponseCache(DEFAULT_CACHE_PATH, mode=mode, samples_per_key=samples_per_key)
+
+@st.cache_resource
+def get_results_store() -> ResultsStore:
+    return ResultsStore(DEFAULT_STORE_PATH, chunk_rows=1000)
+
+@st.cache_resource
+def get_checkpoint_store() -> CheckpointStore:
+    return CheckpointStore(DEFAULT_CHECKPOINT_PATH)
+
+@st.cache_resource
+def get_job_manager():
+    from utils.jobs import GameJobManager
+    return GameJobManager(get_results_store(), get_checkpoint_store())
+
+@st.cache_resource
+def get_prompt_pool():
+    # Opened on first use: the pool's fingerprints need NumPy, which sidebar-only reruns never load
+    from utils.prompt_pool import PromptPool, DEFAULT_POOL_PATH
+    return PromptPool(DEFAULT_POOL_PATH)
+
+@st.cache_resource
+def start_mock_server(latency: float, error_rate: float, rate_limit_rate: float):
+    from utils.mock_server import MockLLMServer
+    return MockLLMServer(latency=latency, error_rate=error_rate, rate_limit_rate=rate_limit_rate).start()
 
 def main():
     st.title("Prisoner's Dilemma with GPT-4")
 
     # Initialize session state
     if 'agent_a_history' not in st.session_state:
-        st.session_state.agent_a_history = []
+        st.session_state.agent_a_history = CompactHistory()
     if 'agent_b_history' not in st.session_state:
-        st.session_state.agent_b_history = []
-    if 'results' not in st.session_state:
-        st.session_state.results = []
+        st.session_state.agent_b_history = CompactHistory()
+    if 'game_id' not in st.session_state:
+        st.session_state.game_id = None
     if 'payoff_matrix' not in st.session_state:
         st.session_state.payoff_matrix = DEFAULT_PAYOFF_MATRIX.copy()
     if 'openai_client' not in st.session_state:
         st.session_state.openai_client = None
     if 'initial_prompt_a' not in st.session_state:
-        st.session_state.initial_prompt_a = (
-            "You are Agent A, an altruistic participant in the Prisoner's Dilemma game. "
-            "Your primary goal is to promote mutual cooperation and trust. "
-            "Based on the previous decisions of Agent B, decide whether to 'Cooperate' or 'Defect'. "
-            "If Agent B has cooperated in the last round, consider reciprocating cooperation to build trust."
-        )
+        st.session_state.initial_prompt_a = DEFAULT_INITIAL_PROMPT_A
     if 'initial_prompt_b' not in st.session_state:
-        st.session_state.initial_prompt_b = (
-            "You are Agent B, an opportunistic participant in the Prisoner's Dilemma game. "
-            "Your primary goal is to maximize your own payoff, even if it means occasionally defecting. "
-            "Based on the previous decisions of Agent A, decide whether to 'Cooperate' or 'Defect'. "
-            "If Agent A has defected in the last round, consider retaliating to discourage further defections."
-        )
+        st.session_state.initial_prompt_b = DEFAULT_INITIAL_PROMPT_B
+    if 'model_comparison' not in st.session_state:
+        st.session_state.model_comparison = None
+    if 'payoff_sweep' not in st.session_state:
+        st.session_state.payoff_sweep = None
+    if 'analyze_stored_games' not in st.session_state:
+        st.session_state.analyze_stored_games = False
+    if 'prompt_generation' not in st.session_state:
+        st.session_state.prompt_generation = None
 
     # Sidebar for user inputs
     st.sidebar.header("Configuration")
@@ -45,42 +107,52 @@ def main():
 
     if api_key:
         if st.session_state.openai_client is None:
-            st.session_state.openai_client = get_openai_client(api_key)
+            st.session_state.openai_client = get_cached_openai_client(api_key)
+
+    # Decision backends for each agent
+    st.sidebar.subheader("Agent Backends")
+    backend_a_name = st.sidebar.selectbox("Agent A backend:", BACKEND_CHOICES)
+    backend_b_name = st.sidebar.selectbox("Agent B backend:", BACKEND_CHOICES)
+    mock_url = DEFAULT_MOCK_URL
+    if MOCK_BACKEND in (backend_a_name, backend_b_name):
+        if st.sidebar.checkbox("Start a local mock server", value=True):
+            latency = st.sidebar.number_input("Mock latency (s):", min_value=0.0, value=0.2, step=0.1)
+            error_rate = st.sidebar.slider("Mock error rate:", min_value=0.0, max_value=1.0, value=0.0)
+            rate_limit_rate = st.sidebar.slider("Mock 429 rate:", min_value=0.0, max_value=1.0, value=0.0)
+            mock_url = start_mock_server(latency, error_rate, rate_limit_rate).url
+        else:
+            mock_url = st.sidebar.text_input("Mock server URL:", value=DEFAULT_MOCK_URL)
+    decision_mode = "text"
+    if {backend_a_name, backend_b_name} & {OPENAI_BACKEND, MOCK_BACKEND}:
+        decision_mode = st.sidebar.selectbox(
+            "LLM decision mode:", DECISION_MODES,
+            help="stream stops reading once the decision is known; json_schema and logit_bias constrain the answer."
+        )
+    backend_a = create_game_backend(backend_a_name, mock_url, decision_mode=decision_mode)
+    backend_b = create_game_backend(backend_b_name, mock_url, decision_mode=decision_mode)
+
+    # Response cache for model calls
+    st.sidebar.subheader("Response Cache")
+    use_cache = st.sidebar.checkbox("Cache model responses", value=False)
+    if use_cache:
+        cache_mode = st.sidebar.selectbox("Cache mode:", CACHE_MODES)
+        samples_per_key = 1
+        if cache_mode == "sample":
+            samples_per_key = st.sidebar.number_input("Samples per prompt:", min_value=1, value=5)
+        configure_response_cache(get_response_cache(cache_mode, samples_per_key))
+    else:
+        configure_response_cache(None)
 
     # Payoff Matrix Configuration
     st.sidebar.subheader("Payoff Matrix Options")
     payoff_option = st.sidebar.selectbox(
         "Select Payoff Matrix Configuration:",
-        ["Default", "High Mutual Cooperation", "Punishing Defection", "Asymmetrical", "Custom"]
+        list(PAYOFF_PRESETS) + ["Custom"]
     )
     
-    if payoff_option == "Default":
-        st.session_state.payoff_matrix = DEFAULT_PAYOFF_MATRIX.copy()
-        st.sidebar.success("Payoff matrix set to Default.")
-    elif payoff_option == "High Mutual Cooperation":
-        st.session_state.payoff_matrix = {
-            ('Cooperate', 'Cooperate'): (5, 5),
-            ('Cooperate', 'Defect'): (0, 6),
-            ('Defect', 'Cooperate'): (6, 0),
-            ('Defect', 'Defect'): (1, 1),
-        }
-        st.sidebar.success("Payoff matrix set to High Mutual Cooperation.")
-    elif payoff_option == "Punishing Defection":
-        st.session_state.payoff_matrix = {
-            ('Cooperate', 'Cooperate'): (3, 3),
-            ('Cooperate', 'Defect'): (0, 5),
-            ('Defect', 'Cooperate'): (5, 0),
-            ('Defect', 'Defect'): (-1, -1),
-        }
-        st.sidebar.success("Payoff matrix set to Punishing Defection.")
-    elif payoff_option == "Asymmetrical":
-        st.session_state.payoff_matrix = {
-            ('Cooperate', 'Cooperate'): (4, 4),
-            ('Cooperate', 'Defect'): (1, 5),
-            ('Defect', 'Cooperate'): (5, 1),
-            ('Defect', 'Defect'): (2, 2),
-        }
-        st.sidebar.success("Payoff matrix set to Asymmetrical.")
+    if payoff_option in PAYOFF_PRESETS:
+        st.session_state.payoff_matrix = PAYOFF_PRESETS[payoff_option].copy()
+        st.sidebar.success(f"Payoff matrix set to {payoff_option}.")
     elif payoff_option == "Custom":
         st.sidebar.subheader("Custom Payoff Matrix")
         coop_coop = st.sidebar.number_input("Payoff for (Cooperate, Cooperate):", min_value=0, value=3)
@@ -94,16 +166,45 @@ def main():
             ('Defect', 'Defect'): (defect_defect, defect_defect),
         }
         st.sidebar.success("Payoff matrix set to Custom.")
+    # Custom payoffs can break the dilemma (e.g. T < R or S > P); games still run, but say so
+    violations = dilemma_violations(st.session_state.payoff_matrix)
+    if violations:
+        st.sidebar.warning("This matrix is not a Prisoner's Dilemma: " + "; ".join(violations) + ".")
 
     # Toggle for remembering previous rounds
     remember_history = st.sidebar.checkbox("Remember previous rounds", value=True)
+    history_encoding = "full"
+    history_window = 10
+    if remember_history:
+        history_encoding = st.sidebar.selectbox("History encoding in prompts:", HISTORY_ENCODINGS)
+        if history_encoding == "window":
+            history_window = st.sidebar.slider("Rounds of history shown:", min_value=1, max_value=50, value=10)
+    prompt_style = st.sidebar.selectbox(
+        "Prompt style:",
+        PROMPT_STYLES,
+        help="prefix_stable keeps the persona, payoffs and rules as a fixed prefix and adds each round as "
+             "new messages, so providers can serve the prefix from their prompt cache."
+    )
 
     # Number of rounds to play
-    num_rounds = st.sidebar.slider("Number of Rounds", min_value=1, max_value=100, value=10)
+    num_rounds = st.sidebar.slider("Number of Rounds", min_value=1, max_value=1000, value=10)
+
+    # How often the live charts are redrawn while a game runs
+    refresh_interval = st.sidebar.number_input("Chart refresh interval (s):", min_value=0.0, value=0.5, step=0.5)
 
     # Initial Prompts Configuration
     st.sidebar.subheader("Initial Prompts")
-    if st.sidebar.button("Randomize Initial Prompts"):
+    randomize = st.sidebar.button("Randomize Initial Prompts")
+    # A persistent, de-duplicated pool of personas generated in bulk, to sample prompt pairs from
+    with st.sidebar.expander("Prompt Pool"):
+        persona_count = st.number_input("Personas to generate:", min_value=1, value=50)
+        generate_personas = st.button("Generate Personas")
+        sample_pair = st.button("Sample Prompt Pair")
+        if generate_personas:
+            start_prompt_generation(backend_a, persona_count)
+        if st.session_state.prompt_generation is not None:
+            show_prompt_generation(st.session_state.prompt_generation)
+    if randomize:
         if st.session_state.openai_client:
             initial_prompt_a, initial_prompt_b = get_randomized_initial_prompts(st.session_state.openai_client)
             st.session_state.initial_prompt_a = initial_prompt_a
@@ -111,6 +212,16 @@ def main():
             st.sidebar.success("Initial prompts randomized.")
         else:
             st.sidebar.error("Please enter a valid OpenAI API key to randomize prompts.")
+    elif sample_pair:
+        pool = get_prompt_pool()
+        if len(pool) < 2:
+            st.sidebar.error("The prompt pool needs at least two personas. Generate some first.")
+        else:
+            from utils.prompt_pool import pair_name
+            prompt_a, prompt_b = pool.sample_pairs(1)[0]
+            st.session_state.initial_prompt_a = prompt_a.text
+            st.session_state.initial_prompt_b = prompt_b.text
+            st.sidebar.success(f"Sampled prompt pair {pair_name(prompt_a, prompt_b)} from {len(pool)} personas.")
     else:
         initial_prompt_a = st.sidebar.text_area(
             "Initial prompt for Agent A:",
@@ -128,107 +239,453 @@ def main():
     # Buttons for running and resetting the game
     st.sidebar.subheader("Game Controls")
     run_game = st.sidebar.button("Run Game")
+    background = st.sidebar.checkbox(
+        "Run games in the background",
+        value=True,
+        help="Background games keep playing while you use the page; several can run at once."
+    )
     reset = st.sidebar.button("Reset Game")
 
     if reset:
         reset_game()
         st.session_state.openai_client = None  # Reset the client
 
-    if st.session_state.openai_client:
-        if run_game:
-            if st.session_state.results:
-                st.warning("Game already run. Reset the game to start a new session.")
-            else:
-                with st.spinner("Running the game..."):
-                    agent_a_history = st.session_state.agent_a_history
-                    agent_b_history = st.session_state.agent_b_history
-                    results = st.session_state.results
-
-                    # Create separate placeholders for each chart
-                    payoff_placeholder = st.empty()
-                    cumulative_placeholder = st.empty()
-                    heatmap_placeholder = st.empty()
-                    decision_counts_placeholder = st.empty()
-                    summary_placeholder = st.empty()
-                    progress_bar = st.progress(0)
-
-                    client = st.session_state.openai_client
-
-                    for round_num in range(num_rounds):
-                        decision_a, decision_b = run_prisoners_dilemma_round(
-                            client,
-                            agent_a_history,
-                            agent_b_history,
-                            remember_history,
-                            st.session_state.initial_prompt_a,
-                            st.session_state.initial_prompt_b
-                        )
-
-                        if decision_a is None or decision_b is None:
-                            st.error("Error in getting decisions. Stopping the game.")
-                            break
-
-                        payoff_a, payoff_b = st.session_state.payoff_matrix.get(
-                            (decision_a, decision_b),
-                            (0, 0)  # Default payoffs if combination not found
-                        )
-
-                        agent_a_history.append(decision_a)
-                        agent_b_history.append(decision_b)
-                        results.append((round_num + 1, decision_a, decision_b, payoff_a, payoff_b))
-
-                        # Update progress bar
-                        progress_bar.progress((round_num + 1) / num_rounds)
-
-                        # Real-time update
-                        df_results = pd.DataFrame(results, columns=["Round", "Agent A Decision", "Agent B Decision", "Agent A Payoff", "Agent B Payoff"])
-                        visualize_results(
-                            df_results,
-                            payoff_placeholder,
-                            cumulative_placeholder,
-                            heatmap_placeholder,
-                            decision_counts_placeholder,
-                            summary_placeholder
-                        )
-
-                    # Update session state
-                    st.session_state.agent_a_history = agent_a_history
-                    st.session_state.agent_b_history = agent_b_history
-                    st.session_state.results = results
-
-                # Final visualization
-                df_results = pd.DataFrame(results, columns=["Round", "Agent A Decision", "Agent B Decision", "Agent A Payoff", "Agent B Payoff"])
-                visualize_results(
-                    df_results,
-                    payoff_placeholder,
-                    cumulative_placeholder,
-                    heatmap_placeholder,
-                    decision_counts_placeholder,
-                    summary_placeholder
-                )
-                download_results(df_results)
-        elif st.session_state.results:
-            # Display results if already run
-            df_results = pd.DataFrame(st.session_state.results, columns=["Round", "Agent A Decision", "Agent B Decision", "Agent A Payoff", "Agent B Payoff"])
-            
-            # Create separate placeholders for each chart
-            payoff_placeholder = st.empty()
-            cumulative_placeholder = st.empty()
-            heatmap_placeholder = st.empty()
-            decision_counts_placeholder = st.empty()
-            summary_placeholder = st.empty()
-
-            visualize_results(
-                df_results,
-                payoff_placeholder,
-                cumulative_placeholder,
-                heatmap_placeholder,
-                decision_counts_placeholder,
-                summary_placeholder
+    # The same settings played by several models at once, each with its own workers and rate budget
+    with st.sidebar.expander("Model Comparison"):
+        comparison_models = st.text_area(
+            "Models, one per line (MODEL[@BASE_URL][,workers=N][,rpm=N][,tpm=N][,mode=MODE]; @mock uses the mock server):",
+            value="gpt-4o-mini\ngpt-4o"
+        )
+        comparison_presets = st.multiselect(
+            "Payoff matrices:",
+            list(PAYOFF_PRESETS),
+            default=[payoff_option] if payoff_option in PAYOFF_PRESETS else []
+        )
+        comparison_repetitions = st.number_input("Games per model and matrix:", min_value=1, value=3)
+        compare = st.button("Compare Models")
+    if compare:
+        payoff_matrices = {name: PAYOFF_PRESETS[name] for name in comparison_presets}
+        if payoff_option == "Custom":
+            payoff_matrices["Custom"] = st.session_state.payoff_matrix
+        run_comparison(
+            comparison_models, payoff_matrices, comparison_repetitions,
+            remember_history, history_encoding, history_window, num_rounds, mock_url, decision_mode, prompt_style
+        )
+
+    # Many payoff matrices, each played until its cooperation rate is pinned down
+    with st.sidebar.expander("Payoff Sweep"):
+        sweep_kind = st.radio("Matrices:", ["Random", "Grid"], horizontal=True)
+        if sweep_kind == "Random":
+            sweep_matrices = st.number_input("Prisoner's Dilemmas to sample:", min_value=1, value=10)
+            sweep_seed = st.number_input("Seed:", min_value=0, value=0)
+            sweep_grid = None
+        else:
+            sweep_grid = [
+                st.text_input(f"{label} values (comma-separated):", value=default)
+                for label, default in (("T", "5, 7, 9"), ("R", "3, 4"), ("P", "1"), ("S", "0"))
+            ]
+            sweep_matrices = sweep_seed = None
+        sweep_max_games = st.number_input("Most games per matrix:", min_value=1, value=20)
+        sweep_min_games = st.number_input("Games before checking the interval:", min_value=1, value=4)
+        sweep_ci_width = st.number_input("Target cooperation CI width:", min_value=0.01, max_value=1.0, value=0.1, step=0.01)
+        sweep = st.button("Run Payoff Sweep")
+    if sweep:
+        run_sweep(
+            sweep_grid, sweep_matrices, sweep_seed, sweep_min_games, sweep_max_games, sweep_ci_width,
+            backend_a_name, backend_b_name, remember_history, history_encoding, history_window, num_rounds,
+            mock_url, decision_mode, prompt_style
+        )
+
+    # Finished games are kept on disk, so they survive a browser refresh
+    store = get_results_store()
+    stored_games = store.experiments()[::-1]
+    if stored_games:
+        st.sidebar.subheader("Stored Games")
+        stored_game = st.sidebar.selectbox("Previous games (newest first):", stored_games)
+        if st.sidebar.button("Load Game"):
+            st.session_state.game_id = stored_game
+        if st.sidebar.button("Analyze All Stored Games"):
+            st.session_state.analyze_stored_games = True
+
+    # Games interrupted by a crash, rerun or API failure can carry on from their checkpoint
+    checkpoints = get_checkpoint_store()
+    jobs = get_job_manager()
+    running_jobs = set(jobs.active_ids())
+    resume_id = None
+    unfinished = {
+        f"{game_id} ({completed}/{num_rounds} rounds)": game_id
+        for game_id, completed, num_rounds in checkpoints.unfinished_progress()
+        if game_id not in running_jobs
+    }
+    if unfinished:
+        st.sidebar.subheader("Unfinished Games")
+        unfinished_game = st.sidebar.selectbox("Resume from the last completed round:", list(unfinished))
+        if st.sidebar.button("Resume Game"):
+            resume_id = unfinished[unfinished_game]
+
+    checkpoint = None
+    if resume_id:
+        checkpoint = checkpoints.load(resume_id)
+    elif run_game and backend_a is not None and backend_b is not None:
+        if st.session_state.game_id and not background:
+            st.warning("Game already run. Reset the game to start a new session.")
+        else:
+            pool = get_prompt_pool()
+            checkpoint = checkpoints.start_game(uuid.uuid4().hex[:12], {
+                "payoff_matrix": encode_payoff_matrix(st.session_state.payoff_matrix),
+                "initial_prompt_a": st.session_state.initial_prompt_a,
+                "initial_prompt_b": st.session_state.initial_prompt_b,
+                # Pool entries the prompts came from (None for prompts not in the pool)
+                "prompt_ids": [pool.find(st.session_state.initial_prompt_a), pool.find(st.session_state.initial_prompt_b)],
+                "remember_history": remember_history,
+                "history_encoding": history_encoding,
+                "history_window": history_window,
+                "prompt_style": prompt_style,
+                "num_rounds": num_rounds,
+                "backend_a": backend_a_name,
+                "backend_b": backend_b_name,
+                "decision_mode": decision_mode,
+                "seed": random.randrange(2**31),
+            })
+
+    if checkpoint is not None:
+        config = checkpoint.config
+        seed = config["seed"]
+        game_decision_mode = config.get("decision_mode", "text")
+        game_backend_a = create_game_backend(config["backend_a"], mock_url, seed=seed, decision_mode=game_decision_mode)
+        game_backend_b = create_game_backend(config["backend_b"], mock_url, seed=seed + 1, decision_mode=game_decision_mode)
+        if game_backend_a is None or game_backend_b is None:
+            st.warning(f"Please enter your OpenAI API key to use the {OPENAI_BACKEND} backend.")
+        elif background:
+            try:
+                jobs.submit(checkpoint, game_backend_a, game_backend_b)
+                st.success(f"Game {checkpoint.game_id} is playing in the background. Follow it under Background Games.")
+            except ValueError as e:
+                st.warning(str(e))
+        else:
+            play_game(checkpoint, game_backend_a, game_backend_b, store, checkpoints, refresh_interval)
+    elif backend_a is None or backend_b is None:
+        st.warning(f"Please enter your OpenAI API key to use the {OPENAI_BACKEND} backend.")
+    elif st.session_state.game_id and st.session_state.game_id in store:
+        # Display results if already run
+        from utils.visualization import LiveDashboard, display_call_metrics
+        from utils.download import download_results, download_call_metrics
+        results = IncrementalResults(store.iter_rows(st.session_state.game_id))
+        LiveDashboard(results).render()
+        download_results(store, st.session_state.game_id)
+        show_game_analytics(store, st.session_state.game_id)
+        calls = get_recorder().to_dataframe(st.session_state.get('game_id'))
+        display_call_metrics(calls)
+        download_call_metrics(calls)
+
+    show_background_games(jobs, refresh_interval)
+
+    if st.session_state.analyze_stored_games and stored_games:
+        from utils.analytics import stored_game_metrics
+        from utils.visualization import display_strategy_analytics
+        # Metrics are memoized per stored experiment, so only new games are analyzed
+        display_strategy_analytics(stored_game_metrics(store))
+
+    if st.session_state.model_comparison is not None:
+        from utils.visualization import display_model_comparison
+        from utils.download import download_model_comparison
+        comparison, comparison_calls = st.session_state.model_comparison
+        display_model_comparison(comparison, comparison_calls)
+        download_model_comparison(comparison)
+
+    if st.session_state.payoff_sweep is not None:
+        from utils.visualization import display_payoff_sweep
+        from utils.download import download_payoff_sweep
+        display_payoff_sweep(st.session_state.payoff_sweep)
+        download_payoff_sweep(st.session_state.payoff_sweep)
+
+    if checkpoint is None and not compare and not sweep:
+        show_run_timing()
+
+def run_comparison(
+    model_text, payoff_matrices, repetitions, remember_history, history_encoding, history_window, num_rounds, mock_url,
+    decision_mode="text", prompt_style="legacy"
+):
+    """
+    Play the sidebar's prompts and settings with every listed model and keep
+    the results (and their call records) in the session for display.
+    """
+    from utils.batch_runner import build_experiment_grid
+    from utils.model_comparison import parse_model_spec, run_model_comparison
+    try:
+        models = [
+            parse_model_spec(line.strip().replace("@mock", f"@{mock_url}", 1), decision_mode=decision_mode)
+            for line in model_text.splitlines() if line.strip()
+        ]
+    except ValueError as e:
+        st.error(str(e))
+        return
+    if not models or not payoff_matrices:
+        st.warning("List at least one model and choose at least one payoff matrix to compare.")
+        return
+    if st.session_state.openai_client is None and any(model.base_url is None for model in models):
+        st.warning("Please enter your OpenAI API key to compare OpenAI models.")
+        return
+    specs = build_experiment_grid(
+        payoff_matrices,
+        {"Sidebar": (st.session_state.initial_prompt_a, st.session_state.initial_prompt_b)},
+        remember_history_options=[remember_history],
+        round_counts=[num_rounds],
+        repetitions=repetitions,
+        history_encodings=[history_encoding],
+        history_window=history_window,
+        prompt_style=prompt_style
+    )
+    started = time.time()
+    with st.spinner(f"Comparing {len(models)} models on {len(specs) * repetitions} games each..."):
+        try:
+            df = run_model_comparison(models, specs, client=st.session_state.openai_client)
+        except ValueError as e:
+            st.error(str(e))
+            return
+    calls = get_recorder().to_dataframe()
+    st.session_state.model_comparison = (df, calls[calls["timestamp"] >= started])
+
+def run_sweep(
+    grid, num_matrices, seed, min_games, max_games, ci_width, backend_a_name, backend_b_name,
+    remember_history, history_encoding, history_window, num_rounds, mock_url, decision_mode="text", prompt_style="legacy"
+):
+    """
+    Play the sidebar's agents, prompts and settings on sampled (or a grid of)
+    Prisoner's Dilemma matrices and keep the sweep summary in the session.
+    """
+    from utils.batch_runner import build_experiment_grid
+    from utils.payoff_sweep import payoff_grid, run_payoff_sweep, sample_payoff_matrices
+    if grid is not None:
+        try:
+            values = [[float(value) for value in text.split(",") if value.strip()] for text in grid]
+        except ValueError:
+            st.error("Payoff values must be comma-separated numbers.")
+            return
+        payoff_matrices = payoff_grid(*values)
+    else:
+        payoff_matrices = sample_payoff_matrices(num_matrices, seed=seed)
+    if not payoff_matrices:
+        st.warning("No Prisoner's Dilemma (T > R > P > S and 2R > T + S) among these payoff values.")
+        return
+    # Unseeded, so that repeated games of a matrix are independent samples
+    backend_a = create_game_backend(backend_a_name, mock_url, decision_mode=decision_mode)
+    backend_b = create_game_backend(backend_b_name, mock_url, decision_mode=decision_mode)
+    if backend_a is None or backend_b is None:
+        st.warning(f"Please enter your OpenAI API key to use the {OPENAI_BACKEND} backend.")
+        return
+    specs = build_experiment_grid(
+        payoff_matrices,
+        {"Sidebar": (st.session_state.initial_prompt_a, st.session_state.initial_prompt_b)},
+        remember_history_options=[remember_history],
+        round_counts=[num_rounds],
+        repetitions=max_games,
+        history_encodings=[history_encoding],
+        history_window=history_window,
+        prompt_style=prompt_style
+    )
+    with st.spinner(f"Sweeping {len(specs)} payoff matrices (up to {max_games} games each)..."):
+        _, summary = run_payoff_sweep(
+            backend_a, specs, min_games=min_games, ci_width=ci_width, client_b=backend_b, seed=seed
+        )
+    st.session_state.payoff_sweep = summary
+
+def create_game_backend(name: str, mock_url: str, seed=None, decision_mode: str = "text"):
+    """
+    create_backend with the session's OpenAI client, reusing mock backends
+    (and their HTTP clients) across reruns.
+    """
+    if name == MOCK_BACKEND:
+        return get_mock_backend(mock_url, decision_mode)
+    return create_backend(name, st.session_state.openai_client, mock_url, seed=seed, decision_mode=decision_mode)
+
+def show_run_timing():
+    """
+    Record how long this script run took and show cold-start and rerun
+    latency in the sidebar. Runs that play a game are not counted.
+    """
+    elapsed = time.perf_counter() - _SCRIPT_START
+    timings = get_run_timings()
+    if timings["cold_start_s"] is None:
+        timings["cold_start_s"] = elapsed
+        logger.info(f"Cold start took {elapsed:.3f}s.")
+    else:
+        timings["reruns_s"].append(elapsed)
+    with st.sidebar.expander("Performance"):
+        st.caption(f"Cold start: {timings['cold_start_s'] * 1000:.0f} ms")
+        if timings["reruns_s"]:
+            st.caption(
+                f"Last rerun: {timings['reruns_s'][-1] * 1000:.0f} ms, "
+                f"median {statistics.median(timings['reruns_s']) * 1000:.0f} ms over {len(timings['reruns_s'])} reruns"
             )
-            download_results(df_results)
+
+def show_background_games(jobs, refresh_interval):
+    """
+    Progress and controls of background games, redrawn on its own every
+    `refresh_interval` seconds (at least 0.5) while any of them is active.
+    """
+    if not jobs.jobs():
+        return
+    polling = bool(jobs.active_ids())
+    panel = st.fragment(background_games_panel, run_every=max(refresh_interval, 0.5) if polling else None)
+    panel(jobs, polling)
+
+def background_games_panel(jobs, polling):
+    from utils.visualization import display_game_progress
+    game_jobs = jobs.jobs()
+    if polling and not any(job.active for job in game_jobs):
+        st.rerun()  # The last game finished: redraw the page, which also stops polling
+    st.markdown("### **Background Games**")
+    for job in game_jobs:
+        status, pause, cancel, watch = st.columns([4, 1, 1, 1])
+        label = f"{job.game_id}: {job.status}, {job.completed_rounds}/{job.num_rounds} rounds"
+        status.progress(job.progress, text=f"{label} ({job.error})" if job.error else label)
+        if job.paused:
+            if pause.button("Resume", key=f"resume_{job.game_id}"):
+                job.resume()
+        elif job.active and pause.button("Pause", key=f"pause_{job.game_id}"):
+            job.pause()
+        if job.active and cancel.button("Cancel", key=f"cancel_{job.game_id}"):
+            job.cancel()
+        if job.active:
+            watch.checkbox("Watch", key=f"watch_{job.game_id}")
+        elif watch.button("Open", key=f"open_{job.game_id}"):
+            st.session_state.game_id = job.game_id
+            st.rerun()
+    if any(not job.active for job in game_jobs) and st.button("Clear Finished Games"):
+        jobs.clear_finished()
+        st.rerun()
+    for job in game_jobs:
+        if job.active and st.session_state.get(f"watch_{job.game_id}"):
+            display_game_progress(job.game_id, job.snapshot())
+
+def start_prompt_generation(backend_a, count):
+    """
+    Fill the prompt pool in the background with Agent A's model (or GPT-4).
+    """
+    from utils.prompt_pool import PromptGeneration
+    running = st.session_state.prompt_generation
+    if running is not None and running.active:
+        st.warning("Personas are already being generated.")
+        return
+    if isinstance(backend_a, OpenAIBackend):
+        client, model = backend_a.client, backend_a.model
+    elif st.session_state.openai_client is not None:
+        client, model = st.session_state.openai_client, "gpt-4"
     else:
-        st.warning("Please enter your OpenAI API key to proceed.")
+        st.error("Choose an LLM backend for Agent A or enter an OpenAI API key to generate personas.")
+        return
+    st.session_state.prompt_generation = PromptGeneration(client, get_prompt_pool(), count, model=model)
+
+def show_prompt_generation(generation):
+    """
+    Progress of the persona generation, redrawn every second while it runs.
+    """
+    polling = generation.active
+    st.fragment(prompt_generation_panel, run_every=1.0 if polling else None)(generation, polling)
+
+def prompt_generation_panel(generation, polling):
+    if polling and not generation.active:
+        st.rerun()
+    label = f"{generation.added}/{generation.count} personas added in {generation.calls} calls ({generation.status})"
+    st.progress(generation.progress, text=f"{label}: {generation.error}" if generation.error else label)
+    if generation.active and st.button("Stop Generating"):
+        generation.cancel()
+
+def show_game_analytics(store, game_id):
+    """
+    Strategy analytics of one stored game, memoized by its game ID, and the
+    analytic baselines of its payoff matrix.
+    """
+    from utils.analytics import experiment_metrics
+    from utils.equilibrium import analyze_payoff_matrix
+    from utils.visualization import display_matrix_baselines, display_strategy_analytics
+    df_results = store.read(game_id)
+    display_strategy_analytics(experiment_metrics(store, game_id), df_results)
+    # Analytic baselines for the game's own matrix and length, cached per matrix
+    checkpoint = get_checkpoint_store().load(game_id)
+    if checkpoint is not None:
+        analysis = analyze_payoff_matrix(checkpoint.payoff_matrix, rounds=checkpoint.num_rounds)
+        display_matrix_baselines(analysis, df_results)
+
+def play_game(checkpoint, backend_a, backend_b, store, checkpoints, refresh_interval):
+    """
+    Play the rounds of `checkpoint` that are still missing, committing each one.
+    """
+    from utils.visualization import LiveDashboard, display_call_metrics
+    from utils.download import download_results, download_call_metrics
+    config = checkpoint.config
+    game_id = checkpoint.game_id
+    payoff_matrix = checkpoint.payoff_matrix
+    num_rounds = config["num_rounds"]
+    st.session_state.game_id = game_id
+    st.session_state.payoff_matrix = payoff_matrix
+    st.session_state.initial_prompt_a = config["initial_prompt_a"]
+    st.session_state.initial_prompt_b = config["initial_prompt_b"]
+
+    with st.spinner("Running the game..."), call_context(game_id=game_id):
+        agent_a_history, agent_b_history = checkpoint.histories()
+        results = IncrementalResults(checkpoint.rows)
+        # Rounds restored from the checkpoint are rewritten with the rest of the game
+        store.delete(game_id)
+        store.append(game_id, checkpoint.rows)
+        if checkpoint.completed_rounds:
+            st.info(f"Resuming game {game_id} after round {checkpoint.completed_rounds}.")
+
+        # Charts are created once and refreshed from running totals
+        dashboard = LiveDashboard(results, refresh_interval=refresh_interval)
+        progress_bar = st.progress(checkpoint.completed_rounds / num_rounds)
+
+        for round_num in range(checkpoint.completed_rounds, num_rounds):
+            try:
+                decision_a, decision_b, fallback_a, fallback_b = run_prisoners_dilemma_round_concurrent(
+                    backend_a,
+                    agent_a_history,
+                    agent_b_history,
+                    config["remember_history"],
+                    config["initial_prompt_a"],
+                    config["initial_prompt_b"],
+                    client_b=backend_b,
+                    history_encoding=config["history_encoding"],
+                    history_window=config["history_window"],
+                    prompt_style=config.get("prompt_style", "legacy"),
+                    payoff_matrix=payoff_matrix
+                )
+            except DecisionError as e:
+                st.error(f"Error in getting decisions: {e} Stopping the game; it can be resumed from the sidebar.")
+                checkpoints.finish_game(game_id, status="interrupted")
+                break
+
+            payoff_a, payoff_b = round_payoffs(payoff_matrix, decision_a, decision_b)
+
+            agent_a_history.append(decision_a)
+            agent_b_history.append(decision_b)
+
+            # Commit the round before starting the next one
+            row = (round_num + 1, decision_a, decision_b, payoff_a, payoff_b, fallback_a, fallback_b)
+            checkpoints.record_round(game_id, row)
+            store.append(game_id, [row])
+
+            # Update progress bar
+            progress_bar.progress((round_num + 1) / num_rounds)
+
+            # Real-time update, throttled to the refresh interval
+            dashboard.add_round(*row)
+        else:
+            checkpoints.finish_game(game_id)
+
+        # Update session state
+        store.flush(game_id)
+        st.session_state.agent_a_history = agent_a_history
+        st.session_state.agent_b_history = agent_b_history
+
+    # Final visualization
+    dashboard.render()
+    download_results(store, game_id)
+    show_game_analytics(store, game_id)
+    calls = get_recorder().to_dataframe(game_id)
+    display_call_metrics(calls)
+    download_call_metrics(calls)
 
 if __name__ == "__main__":
     main()
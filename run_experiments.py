@@ -0,0 +1,359 @@
+# run_experiments.py
+"""
+Headless batch runner for Prisoner's Dilemma experiments.
+
+Example:
+    python run_experiments.py --presets Default "Punishing Defection" \
+        --rounds 10 50 --remember-history both --repetitions 20 \
+        --workers 8 --requests-per-minute 500 --output results.csv
+
+Add --batch-api to submit each round of every game as one OpenAI Batch API
+job instead (cheaper, no rate limiting, but results take minutes to hours).
+
+Add --models to play the whole grid with several models at once, each with
+its own workers and rate-limit budget, and print a side-by-side summary:
+    python run_experiments.py --presets Default Asymmetrical \
+        --models gpt-4o-mini,rpm=500 gpt-4o,rpm=100,workers=2 \
+        "llama3@http://localhost:11434/v1,workers=2" --output comparison.csv
+
+Add --payoff-sweep to replace the presets with many sampled (or a grid of)
+Prisoner's Dilemma matrices, each played until the confidence interval of its
+cooperation rate is narrow enough; --repetitions caps the games per matrix:
+    python run_experiments.py --payoff-sweep random --sweep-matrices 50 \
+        --repetitions 40 --ci-width 0.1 --output sweep.csv
+
+Add --pool-pairs to play prompt pairs sampled from the persona prompt pool,
+filled beforehand (concurrently, without duplicates) by --generate-prompts:
+    python run_experiments.py --generate-prompts 200
+    python run_experiments.py --pool-pairs 50 --pool-seed 1 --output personas.csv
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import pandas as pd
+from config import PAYOFF_PRESETS, RESULT_COLUMNS, DEFAULT_INITIAL_PROMPT_A, DEFAULT_INITIAL_PROMPT_B
+from utils.backends import BACKEND_CHOICES, OPENAI_BACKEND, MOCK_BACKEND, DEFAULT_MOCK_URL, STRATEGY_BACKENDS, OpenAIBackend, create_backend
+from utils.batch_api import run_batch_sweep
+from utils.batch_runner import EXPERIMENT_COLUMNS, build_experiment_grid, experiment_row_prefix, make_game_id, run_experiments
+from utils.cache import ResponseCache, CACHE_MODES
+from utils.checkpoint import CheckpointStore
+from utils.decisions import DECISION_MODES
+from utils.equilibrium import analyze_payoff_matrix
+from utils.history import HISTORY_ENCODINGS
+from utils.prompt_builder import PROMPT_STYLES
+from utils.gpt4 import get_openai_client, configure_response_cache
+from utils.instrumentation import get_recorder, summarize_calls
+from utils.model_comparison import (
+    COMPARISON_COLUMNS, comparison_game_id, compare_models, model_summary, parse_model_spec, run_model_comparison
+)
+from utils.payoff_sweep import payoff_grid, run_payoff_sweep, sample_payoff_matrices
+from utils.prompt_pool import DEFAULT_POOL_PATH, PromptPool, generate_prompts
+from utils.results_store import ResultsStore
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run a grid of Prisoner's Dilemma games without the dashboard.")
+    parser.add_argument("--api-key", default=os.environ.get("OPENAI_API_KEY"),
+                        help="OpenAI API key (defaults to $OPENAI_API_KEY).")
+    parser.add_argument("--agent-a", choices=BACKEND_CHOICES, default=OPENAI_BACKEND,
+                        help="Decision backend for Agent A.")
+    parser.add_argument("--agent-b", choices=BACKEND_CHOICES, default=OPENAI_BACKEND,
+                        help="Decision backend for Agent B.")
+    parser.add_argument("--mock-url", default=DEFAULT_MOCK_URL,
+                        help="Base URL of the mock LLM server used by the mock backend.")
+    parser.add_argument("--decision-mode", choices=DECISION_MODES, default="text",
+                        help="How LLM agents answer: free text, a stream closed once the decision is known, "
+                             "a JSON schema, or a single C/D token forced by logit bias.")
+    parser.add_argument("--models", nargs="+", default=None, metavar="SPEC",
+                        help="Compare these models on the whole grid: MODEL[@BASE_URL][,workers=N][,rpm=N][,tpm=N][,key=KEY]. "
+                             "Models with a base URL go to that OpenAI-compatible server. --agent-a/--agent-b are ignored.")
+    parser.add_argument("--opponent", choices=list(STRATEGY_BACKENDS), default=None,
+                        help="With --models, have Agent B play this strategy instead of the model itself.")
+    parser.add_argument("--presets", nargs="+", default=["Default"], choices=list(PAYOFF_PRESETS),
+                        help="Payoff matrix presets to include.")
+    parser.add_argument("--payoff-sweep", choices=["random", "grid"], default=None,
+                        help="Sweep payoff matrices instead of --presets: 'random' samples --sweep-matrices "
+                             "Prisoner's Dilemmas, 'grid' crosses the --sweep-t/r/p/s values (invalid ones dropped). "
+                             "Each matrix is played until its cooperation-rate CI is within --ci-width, "
+                             "or --repetitions games.")
+    parser.add_argument("--sweep-matrices", type=int, default=20, help="Matrices sampled by a random sweep.")
+    parser.add_argument("--sweep-seed", type=int, default=None, help="Seed for matrix sampling and bootstrapping.")
+    parser.add_argument("--sweep-t", nargs="+", type=float, default=[5, 7, 9], help="Temptation values of a grid sweep.")
+    parser.add_argument("--sweep-r", nargs="+", type=float, default=[3, 4], help="Reward values of a grid sweep.")
+    parser.add_argument("--sweep-p", nargs="+", type=float, default=[1], help="Punishment values of a grid sweep.")
+    parser.add_argument("--sweep-s", nargs="+", type=float, default=[0], help="Sucker's payoff values of a grid sweep.")
+    parser.add_argument("--min-games", type=int, default=4, help="Games per matrix before its CI is checked.")
+    parser.add_argument("--batch-games", type=int, default=4,
+                        help="Most games added to an unconverged matrix per wave of a payoff sweep.")
+    parser.add_argument("--ci-width", type=float, default=0.1,
+                        help="Target width of each matrix's cooperation-rate confidence interval.")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level of sweep intervals.")
+    parser.add_argument("--bootstrap-samples", type=int, default=2000, help="Bootstrap resamples per interval.")
+    parser.add_argument("--prompts-file",
+                        help="JSON file mapping a prompt pair name to [prompt_a, prompt_b]. "
+                             "Defaults to the dashboard's default prompts.")
+    parser.add_argument("--prompt-pool", default=DEFAULT_POOL_PATH,
+                        help="SQLite file of the persona prompt pool used by --generate-prompts and --pool-pairs.")
+    parser.add_argument("--generate-prompts", type=int, default=0, metavar="N",
+                        help="Add N new persona prompts to the pool with Agent A's model (or GPT-4), "
+                             "--workers calls at a time. Without --pool-pairs the run stops after generating.")
+    parser.add_argument("--pool-pairs", type=int, default=0, metavar="N",
+                        help="Play N prompt pairs sampled from the pool instead of --prompts-file; "
+                             "each pair is named after its pool entries (e.g. pool12-40).")
+    parser.add_argument("--pool-seed", type=int, default=None, help="Seed for sampling pool prompt pairs.")
+    parser.add_argument("--remember-history", choices=["on", "off", "both"], default="on")
+    parser.add_argument("--history-encodings", nargs="+", choices=HISTORY_ENCODINGS, default=["full"],
+                        help="How previous rounds are written into prompts when history is remembered.")
+    parser.add_argument("--history-window", type=int, default=10,
+                        help="Rounds shown by the 'window' history encoding.")
+    parser.add_argument("--prompt-style", choices=PROMPT_STYLES, default="legacy",
+                        help="prefix_stable sends a fixed persona/payoff/rules prefix plus per-round messages, "
+                             "so the provider's prompt cache can serve the prefix.")
+    parser.add_argument("--rounds", nargs="+", type=int, default=[10], help="Game lengths to include.")
+    parser.add_argument("--repetitions", type=int, default=1, help="Games per grid cell.")
+    parser.add_argument("--workers", type=int, default=4, help="Games played concurrently.")
+    parser.add_argument("--requests-per-minute", type=float, default=None,
+                        help="Cap on model requests per minute across all workers. "
+                             "Without it the rate ramps up to the limits reported by the API.")
+    parser.add_argument("--tokens-per-minute", type=float, default=None,
+                        help="Cap on model tokens per minute across all workers.")
+    parser.add_argument("--cache-path", default=None,
+                        help="SQLite file for the on-disk response cache. Caching is off when omitted.")
+    parser.add_argument("--cache-mode", choices=CACHE_MODES, default="replay")
+    parser.add_argument("--cache-samples", type=int, default=5,
+                        help="Responses stored per prompt in 'sample' cache mode.")
+    parser.add_argument("--checkpoint", default=None,
+                        help="SQLite file of per-round checkpoints. Rerunning the same command resumes "
+                             "the sweep: finished games are skipped and partial ones continue.")
+    parser.add_argument("--batch-api", action="store_true",
+                        help="Submit rounds through the Batch API. Both agents must use the same LLM backend.")
+    parser.add_argument("--poll-interval", type=float, default=30.0,
+                        help="Seconds between Batch API status checks.")
+    parser.add_argument("--output", default="experiment_results.csv",
+                        help="Results file to write; a .parquet extension writes Parquet instead of CSV.")
+    parser.add_argument("--results-store", default=None,
+                        help="Directory of an append-only Arrow results store; each finished game is "
+                             "written there (one partition per experiment ID) as soon as it completes.")
+    parser.add_argument("--baselines", action="store_true",
+                        help="Also write the analytic expected payoffs of classic strategy pairs for every payoff "
+                             "matrix and game length in the grid (no games simulated) to a _baselines.csv file.")
+    parser.add_argument("--metrics-output", default=None,
+                        help="CSV file for per-call latency/token/cost records "
+                             "(defaults to the results file name with a _calls suffix).")
+    return parser.parse_args(argv)
+
+def load_prompt_pairs(path):
+    if not path:
+        return {"Default": (DEFAULT_INITIAL_PROMPT_A, DEFAULT_INITIAL_PROMPT_B)}
+    with open(path) as f:
+        return {name: tuple(pair) for name, pair in json.load(f).items()}
+
+def write_baselines(payoff_matrices, round_counts, path):
+    """
+    Analytic baselines (utils.equilibrium) of each matrix and game length, one CSV.
+    """
+    frames = []
+    for name, matrix in payoff_matrices.items():
+        for rounds in round_counts:
+            analysis = analyze_payoff_matrix(matrix, rounds=rounds)
+            baselines = analysis.baselines.copy()
+            baselines.insert(0, "Num Rounds", rounds)
+            baselines.insert(0, "Prisoner's Dilemma", analysis.is_prisoners_dilemma)
+            baselines.insert(0, "Payoff Matrix", name)
+            frames.append(baselines)
+            if analysis.violations:
+                print(f"Warning: '{name}' is not a Prisoner's Dilemma ({'; '.join(analysis.violations)}).")
+    pd.concat(frames, ignore_index=True).to_csv(path, index=False)
+    print(f"Wrote analytic baselines for {len(payoff_matrices)} payoff matrices to {path}.")
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    models = None
+    if args.models:
+        try:
+            models = [parse_model_spec(text, max_workers=args.workers, decision_mode=args.decision_mode) for text in args.models]
+        except ValueError as e:
+            sys.exit(str(e))
+        if args.batch_api:
+            sys.exit("--models is not supported with --batch-api.")
+        if args.payoff_sweep:
+            sys.exit("--models is not supported with --payoff-sweep.")
+        if any(model.base_url is None for model in models) and not args.api_key:
+            sys.exit("An OpenAI API key is required (--api-key or $OPENAI_API_KEY).")
+    elif OPENAI_BACKEND in (args.agent_a, args.agent_b) and not args.api_key:
+        sys.exit("An OpenAI API key is required (--api-key or $OPENAI_API_KEY).")
+
+    if args.payoff_sweep and args.batch_api:
+        sys.exit("--payoff-sweep is not supported with --batch-api.")
+    if args.cache_path:
+        configure_response_cache(ResponseCache(args.cache_path, mode=args.cache_mode, samples_per_key=args.cache_samples))
+    client = get_openai_client(args.api_key) if args.api_key else None
+    backend_a = create_backend(args.agent_a, client, args.mock_url, decision_mode=args.decision_mode)
+
+    pool = PromptPool(args.prompt_pool) if args.generate_prompts or args.pool_pairs else None
+    if args.generate_prompts:
+        # Personas come from Agent A's model when it is an LLM
+        generator = backend_a if isinstance(backend_a, OpenAIBackend) else None
+        if generator is None and client is None:
+            sys.exit("--generate-prompts needs an LLM backend for Agent A or an OpenAI API key.")
+        added = generate_prompts(
+            generator.client if generator else client,
+            pool,
+            args.generate_prompts,
+            model=generator.model if generator else "gpt-4",
+            max_workers=args.workers
+        )
+        print(f"Added {added} persona prompts to {args.prompt_pool} ({len(pool)} in the pool).")
+        if not args.pool_pairs:
+            return
+    if args.pool_pairs:
+        try:
+            prompt_pairs = pool.prompt_pairs(args.pool_pairs, seed=args.pool_seed)
+        except ValueError as e:
+            sys.exit(str(e))
+    else:
+        prompt_pairs = load_prompt_pairs(args.prompts_file)
+
+    remember_options = {"on": [True], "off": [False], "both": [True, False]}[args.remember_history]
+    if args.payoff_sweep == "random":
+        payoff_matrices = sample_payoff_matrices(args.sweep_matrices, seed=args.sweep_seed)
+    elif args.payoff_sweep == "grid":
+        payoff_matrices = payoff_grid(args.sweep_t, args.sweep_r, args.sweep_p, args.sweep_s)
+        if not payoff_matrices:
+            sys.exit("No Prisoner's Dilemma (T > R > P > S, 2R > T + S) in the --sweep-t/r/p/s grid.")
+    else:
+        payoff_matrices = {name: PAYOFF_PRESETS[name] for name in args.presets}
+    specs = build_experiment_grid(
+        payoff_matrices,
+        prompt_pairs,
+        remember_history_options=remember_options,
+        round_counts=args.rounds,
+        repetitions=args.repetitions,
+        history_encodings=args.history_encodings,
+        history_window=args.history_window,
+        prompt_style=args.prompt_style
+    )
+    if args.baselines:
+        write_baselines(payoff_matrices, args.rounds, os.path.splitext(args.output)[0] + "_baselines.csv")
+    store = ResultsStore(args.results_store) if args.results_store else None
+    columns = COMPARISON_COLUMNS if models else EXPERIMENT_COLUMNS + RESULT_COLUMNS
+    checkpoints = CheckpointStore(args.checkpoint) if args.checkpoint else None
+    # Games finished by an earlier run are already in the results store
+    finished = set()
+    if checkpoints:
+        game_ids = [
+            comparison_game_id(model, spec, repetition) if model else make_game_id(spec, repetition)
+            for model in (models or [None])
+            for spec in specs
+            for repetition in range(1, spec.repetitions + 1)
+        ]
+        for game_id in game_ids:
+            checkpoint = checkpoints.load(game_id)
+            if checkpoint and checkpoint.status == "completed":
+                finished.add(game_id)
+        if finished:
+            print(f"Skipping {len(finished)} games completed in an earlier run.")
+
+    def store_game(spec, repetition, results):
+        if make_game_id(spec, repetition) in finished:
+            return
+        prefix = experiment_row_prefix(spec, repetition)
+        store.append(spec.experiment_id, [prefix + row for row in results], columns)
+
+    def store_comparison_game(model, spec, repetition, results):
+        game_id = comparison_game_id(model, spec, repetition)
+        if game_id in finished:
+            return
+        prefix = (model.name,) + experiment_row_prefix(spec, repetition)
+        # One partition per model and experiment
+        store.append(f"{model.name}|{spec.experiment_id}", [prefix + row for row in results], columns)
+
+    sweep_summary = None
+    if models:
+        df = run_model_comparison(
+            models,
+            specs,
+            client=client,
+            opponent=create_backend(args.opponent) if args.opponent else None,
+            on_game_complete=store_comparison_game if store else None,
+            checkpoints=checkpoints
+        )
+    elif args.batch_api:
+        if args.agent_a != args.agent_b or args.agent_a not in (OPENAI_BACKEND, MOCK_BACKEND):
+            sys.exit("--batch-api needs both agents on the same LLM backend (OpenAI or mock server).")
+        if checkpoints:
+            sys.exit("--checkpoint is not supported with --batch-api; batches are already kept server-side.")
+        df = run_batch_sweep(
+            backend_a.client, specs, model=backend_a.model, poll_interval=args.poll_interval, decision_mode=args.decision_mode
+        )
+        if store:
+            for experiment_id, rows in df.groupby("Experiment ID", sort=False):
+                store.append(experiment_id, rows.itertuples(index=False, name=None), columns)
+    elif args.payoff_sweep:
+        df, sweep_summary = run_payoff_sweep(
+            backend_a,
+            specs,
+            min_games=args.min_games,
+            batch_games=args.batch_games,
+            ci_width=args.ci_width,
+            confidence=args.confidence,
+            n_boot=args.bootstrap_samples,
+            max_workers=args.workers,
+            requests_per_minute=args.requests_per_minute,
+            tokens_per_minute=args.tokens_per_minute,
+            client_b=create_backend(args.agent_b, client, args.mock_url, decision_mode=args.decision_mode),
+            checkpoints=checkpoints,
+            on_game_complete=store_game if store else None,
+            seed=args.sweep_seed
+        )
+    else:
+        df = run_experiments(
+            backend_a,
+            specs,
+            max_workers=args.workers,
+            requests_per_minute=args.requests_per_minute,
+            tokens_per_minute=args.tokens_per_minute,
+            on_game_complete=store_game if store else None,
+            client_b=create_backend(args.agent_b, client, args.mock_url, decision_mode=args.decision_mode),
+            checkpoints=checkpoints
+        )
+    if store:
+        store.flush()
+    if args.output.endswith(".parquet"):
+        df.to_parquet(args.output, index=False)
+    else:
+        df.to_csv(args.output, index=False)
+    game_columns = (["Model"] if models else []) + ["Experiment ID", "Repetition"]
+    print(f"Wrote {len(df)} rounds from {df.groupby(game_columns).ngroups} games to {args.output}")
+    if sweep_summary is not None:
+        sweep_output = os.path.splitext(args.output)[0] + "_sweep.csv"
+        sweep_summary.to_csv(sweep_output, index=False)
+        print(
+            f"Wrote the sweep summary to {sweep_output}: {int(sweep_summary['Converged'].sum())} of "
+            f"{len(sweep_summary)} matrices reached a cooperation CI within {args.ci_width:g} "
+            f"using {int(sweep_summary['Games'].sum())} of {sum(spec.repetitions for spec in specs)} budgeted games."
+        )
+
+    calls = get_recorder().to_dataframe()
+    metrics_output = args.metrics_output or os.path.splitext(args.output)[0] + "_calls.csv"
+    calls.to_csv(metrics_output, index=False)
+    if len(calls):
+        summary = summarize_calls(calls)
+        print(
+            f"Wrote {summary['calls']} call records to {metrics_output}: "
+            f"p50 {summary['p50_latency_s']:.2f}s, p95 {summary['p95_latency_s']:.2f}s, "
+            f"{summary['rate_limited']} rate limited, {summary['tokens_per_round']:.0f} tokens/round "
+            f"({summary['prompt_cache_hit_rate']:.0%} of prompt tokens cached), "
+            f"${summary['cost_usd']:.4f}"
+        )
+    if models and len(df):
+        print("\nBy model:")
+        print(model_summary(df, calls).to_string(index=False, float_format="{:.3f}".format))
+        print("\nBy experiment:")
+        print(compare_models(df).to_string(float_format="{:.3f}".format))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+# tests/test_batch_api.py
+
+import pytest
+from types import SimpleNamespace
+from openai import OpenAI
+from utils.batch_api import run_batch_sweep, wait_for_batch
+from utils.batch_runner import ExperimentSpec
+from utils.mock_server import MockLLMServer
+from config import DEFAULT_PAYOFF_MATRIX
+
+SPEC = ExperimentSpec("default", DEFAULT_PAYOFF_MATRIX, "plain", "Prompt A", "Prompt B", True, 3, repetitions=2)
+
+def mock_client(server: MockLLMServer) -> OpenAI:
+    return OpenAI(api_key="mock", base_url=server.url, max_retries=0)
+
+@pytest.mark.parametrize("status", ["failed", "expired", "cancelled"])
+def test_wait_for_batch_raises_unless_completed(status):
+    batch = SimpleNamespace(status=status, errors=SimpleNamespace(data=[SimpleNamespace(message="quota exceeded")]))
+    client = SimpleNamespace(batches=SimpleNamespace(retrieve=lambda batch_id: batch))
+    with pytest.raises(RuntimeError, match=f"'{status}': quota exceeded"):
+        wait_for_batch(client, "batch_1", poll_interval=0)
+
+def test_failed_requests_are_resubmitted():
+    with MockLLMServer(error_rate=0.3, seed=1) as server:
+        df = run_batch_sweep(mock_client(server), [SPEC], model="mock", poll_interval=0.01, resubmits=10)
+    assert len(df) == 6
+    assert not df["Agent A Fallback"].any() and not df["Agent B Fallback"].any()
+
+def test_unanswered_requests_stop_the_sweep():
+    with MockLLMServer(error_rate=1.0) as server:
+        with pytest.raises(RuntimeError, match="unanswered"):
+            run_batch_sweep(mock_client(server), [SPEC], model="mock", poll_interval=0.01, resubmits=1)
@@ -0,0 +1,56 @@
+# tests/test_cache.py
+
+import itertools
+import pytest
+import utils.cache
+from utils.cache import ResponseCache
+
+@pytest.fixture(autouse=True)
+def ticking_clock(monkeypatch):
+    # Strictly increasing access times, so LRU order never depends on clock resolution
+    clock = itertools.count(1)
+    monkeypatch.setattr(utils.cache.time, "time", lambda: float(next(clock)))
+
+def make_cache(tmp_path, **options) -> ResponseCache:
+    return ResponseCache(str(tmp_path / "responses.sqlite"), **options)
+
+def test_keys_depend_on_every_request_field():
+    key = ResponseCache.make_key("gpt-4", [{"role": "system", "content": "x"}], 0.8, 10)
+    assert key == ResponseCache.make_key("gpt-4", [{"role": "system", "content": "x"}], 0.8, 10)
+    assert key != ResponseCache.make_key("gpt-4o", [{"role": "system", "content": "x"}], 0.8, 10)
+    assert key != ResponseCache.make_key("gpt-4", [{"role": "system", "content": "x"}], 0.8, 10, {"logit_bias": {}})
+
+def test_replay_returns_first_response(tmp_path):
+    cache = make_cache(tmp_path)
+    assert cache.get("k") is None
+    cache.put("k", "Cooperate")
+    cache.put("k", "Defect")
+    assert cache.get("k") == "Cooperate"
+
+def test_sample_mode_collects_before_serving(tmp_path):
+    cache = make_cache(tmp_path, mode="sample", samples_per_key=2, seed=0)
+    cache.put("k", "Cooperate")
+    assert cache.get("k") is None
+    cache.put("k", "Defect")
+    assert {cache.get("k") for _ in range(50)} == {"Cooperate", "Defect"}
+
+def test_evicts_least_recently_used_keys(tmp_path):
+    cache = make_cache(tmp_path, max_entries=2)
+    cache.put("a", "Cooperate")
+    cache.put("b", "Cooperate")
+    cache.get("a")
+    cache.put("c", "Defect")
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == "Cooperate" and cache.get("c") == "Defect"
+
+def test_evicts_down_to_byte_budget(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=20)
+    for key in "abc":
+        cache.put(key, "x" * 8)
+    assert len(cache) == 2
+    assert cache.get("a") is None
+
+def test_cache_persists_across_instances(tmp_path):
+    make_cache(tmp_path).put("k", "Defect")
+    assert make_cache(tmp_path).get("k") == "Defect"
@@ -0,0 +1,70 @@
+# tests/test_checkpoint.py
+
+import dataclasses
+import pytest
+from utils.backends import AlwaysCooperate, DecisionBackend
+from utils.batch_runner import ExperimentSpec, run_game
+from utils.checkpoint import CheckpointStore
+from utils.gpt4 import DecisionError
+from config import DEFAULT_PAYOFF_MATRIX
+
+class FailingBackend(DecisionBackend):
+    """
+    Defects for `rounds` rounds, then fails like an API that keeps erroring.
+    """
+    def __init__(self, rounds: int):
+        self.rounds = rounds
+
+    def decide(self, prompt, own_history, opponent_history):
+        if len(own_history) >= self.rounds:
+            raise DecisionError("API unavailable")
+        return "Defect"
+
+def make_spec(num_rounds: int = 5) -> ExperimentSpec:
+    return ExperimentSpec("default", DEFAULT_PAYOFF_MATRIX, "plain", "Prompt A", "Prompt B", True, num_rounds)
+
+@pytest.fixture
+def checkpoints(tmp_path):
+    return CheckpointStore(str(tmp_path / "checkpoints.sqlite"))
+
+def test_backend_failure_leaves_game_resumable(checkpoints):
+    spec = make_spec()
+    with pytest.raises(DecisionError):
+        run_game(FailingBackend(2), spec, AlwaysCooperate(), "game", checkpoints)
+    checkpoint = checkpoints.load("game")
+    assert checkpoint.status == "interrupted"
+    assert checkpoint.completed_rounds == 2
+    assert not any(row[5] or row[6] for row in checkpoint.rows)
+    assert [game_id for game_id, _, _ in checkpoints.unfinished_progress()] == ["game"]
+
+    rows = run_game(FailingBackend(10), spec, AlwaysCooperate(), "game", checkpoints)
+    assert [row[0] for row in rows] == [1, 2, 3, 4, 5]
+    assert all(row[1] == "Defect" and row[2] == "Cooperate" for row in rows)
+    assert checkpoints.load("game").status == "completed"
+    assert checkpoints.unfinished_progress() == []
+
+def test_unclear_answers_are_recorded_as_fallbacks(checkpoints):
+    class Unclear(DecisionBackend):
+        def decide(self, prompt, own_history, opponent_history):
+            return None
+    rows = run_game(Unclear(), make_spec(3), AlwaysCooperate(), "game", checkpoints)
+    assert [(row[1], row[5], row[6]) for row in rows] == [("Cooperate", True, False)] * 3
+
+def test_background_job_stops_on_backend_failure(checkpoints, tmp_path):
+    from utils.batch_runner import spec_config
+    from utils.jobs import GameJobManager
+    from utils.results_store import ResultsStore
+    manager = GameJobManager(ResultsStore(str(tmp_path / "results")), checkpoints, max_workers=1)
+    job = manager.submit(checkpoints.start_game("job", spec_config(make_spec())), FailingBackend(3), AlwaysCooperate())
+    manager.shutdown(wait=True)
+    assert job.status == "failed"
+    checkpoint = checkpoints.load("job")
+    assert checkpoint.status == "interrupted"
+    assert checkpoint.completed_rounds == 3
+
+def test_resume_with_changed_settings_is_refused(checkpoints):
+    run_game(AlwaysCooperate(), make_spec(3), AlwaysCooperate(), "game", checkpoints)
+    changed = dataclasses.replace(make_spec(3), payoff_matrix={**DEFAULT_PAYOFF_MATRIX, ("Defect", "Defect"): (0, 0)})
+    with pytest.raises(ValueError, match="payoff_matrix"):
+        run_game(AlwaysCooperate(), changed, AlwaysCooperate(), "game", checkpoints)
+    assert len(run_game(AlwaysCooperate(), make_spec(3), AlwaysCooperate(), "game", checkpoints)) == 3
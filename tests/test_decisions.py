@@ -0,0 +1,76 @@
+# tests/test_decisions.py
+
+import json
+import pytest
+from utils.decisions import DecisionParser, LETTER_TOKEN_IDS, decision_request, read_decision
+
+@pytest.mark.parametrize("text, decision", [
+    ("Cooperate", "Cooperate"),
+    ("I will defect this round.", "Defect"),
+    ("I choose to cooperate!", "Cooperate"),
+    ("Cooperate or defect? Defect", "Defect"),
+    ("Cooperate/Defect? Cooperate.", "Cooperate"),
+    ("I will not defect, I cooperate.", "Cooperate"),
+])
+def test_parse_reads_the_chosen_option(text, decision):
+    assert DecisionParser.parse(text) == decision
+
+@pytest.mark.parametrize("text", [
+    "Don't cooperate",
+    "I won't defect",
+    "Cooperate or defect?",
+    "I cooperate, then I defect.",
+    "Let me think about it.",
+    "",
+    None,
+])
+def test_unclear_replies_are_none(text):
+    assert DecisionParser.parse(text) is None
+
+def test_stream_settles_before_the_reply_ends():
+    parser = DecisionParser()
+    assert parser.feed("I will ") is None
+    assert parser.feed("defe") is None
+    # The keyword could still be "defect or ...", so wait for the next token
+    assert parser.feed("ct") is None
+    assert parser.feed(" o") is None
+    assert parser.feed("nce") is None
+    assert parser.feed(" more") == "Defect"
+    assert parser.feed(" round, not cooperate.") == "Defect"
+    assert parser.finish() == "Defect"
+
+def test_stream_skips_restated_options():
+    parser = DecisionParser()
+    for chunk in ["Cooperate", " or", " defect", "?", " Cooperate"]:
+        assert parser.feed(chunk) is None
+    # A one-word answer is only settled at the end of the reply
+    assert parser.finish() == "Cooperate"
+
+def test_stream_ignores_negated_keyword():
+    parser = DecisionParser()
+    assert parser.feed("Never cooperate ") is None
+    assert parser.feed("here; defect now.") == "Defect"
+
+def test_json_schema_replies():
+    assert read_decision(json.dumps({"decision": "Defect"}), "json_schema") == "Defect"
+    assert read_decision('{"decision": "Cooperate"}', "json_schema") == "Cooperate"
+    # Malformed structured output falls back to reading the text
+    assert read_decision('{"decision": "Defect"', "json_schema") == "Defect"
+    assert read_decision('{"decision": "Maybe"}', "json_schema") is None
+    assert read_decision("[]", "json_schema") is None
+
+def test_logit_bias_replies():
+    assert read_decision("C", "logit_bias") == "Cooperate"
+    assert read_decision(" d", "logit_bias") == "Defect"
+    assert read_decision("X", "logit_bias") is None
+    assert read_decision(None, "logit_bias") is None
+
+def test_decision_request_per_mode():
+    messages, max_tokens, options = decision_request("Prompt", "logit_bias")
+    assert max_tokens == 1
+    assert messages[-1]["content"].startswith("Prompt\n")
+    assert set(options["logit_bias"]) == {str(token) for token in LETTER_TOKEN_IDS.values()}
+    _, _, options = decision_request([{"role": "user", "content": "Prompt"}], "json_schema")
+    assert options["response_format"]["type"] == "json_schema"
+    with pytest.raises(ValueError):
+        decision_request("Prompt", "voice")
@@ -0,0 +1,88 @@
+# tests/test_equilibrium.py
+
+import numpy as np
+import pytest
+from utils.equilibrium import (
+    analyze_payoff_matrix, expected_payoffs, finite_horizon_distribution, long_run_distribution,
+    markov_chain, nash_equilibria, pareto_optimal_outcomes
+)
+from utils.game_logic import round_payoffs
+from utils.tournament import CLASSIC_STRATEGIES, random_strategies
+from config import DEFAULT_PAYOFF_MATRIX
+
+STRATEGIES = {strategy.name: strategy for strategy in CLASSIC_STRATEGIES}
+
+CHICKEN = {
+    ("Cooperate", "Cooperate"): (3, 3),
+    ("Cooperate", "Defect"): (1, 4),
+    ("Defect", "Cooperate"): (4, 1),
+    ("Defect", "Defect"): (0, 0),
+}
+
+def long_run(name_a: str, name_b: str, noise: float = 0.0) -> np.ndarray:
+    return long_run_distribution(*markov_chain(STRATEGIES[name_a], STRATEGIES[name_b], noise))
+
+def test_prisoners_dilemma_has_only_mutual_defection():
+    (equilibrium,) = nash_equilibria(DEFAULT_PAYOFF_MATRIX)
+    assert equilibrium.pure and equilibrium.describe() == "(Defect, Defect)"
+    assert (equilibrium.payoff_a, equilibrium.payoff_b) == (1, 1)
+
+def test_chicken_has_two_pure_and_one_mixed_equilibrium():
+    equilibria = nash_equilibria(CHICKEN)
+    assert sorted(e.describe() for e in equilibria if e.pure) == ["(Cooperate, Defect)", "(Defect, Cooperate)"]
+    (mixed,) = [e for e in equilibria if not e.pure]
+    assert mixed.cooperate_a == pytest.approx(0.5) and mixed.cooperate_b == pytest.approx(0.5)
+    assert mixed.payoff_a == pytest.approx(2.0)
+
+def test_pareto_optimal_outcomes_exclude_mutual_defection():
+    assert pareto_optimal_outcomes(DEFAULT_PAYOFF_MATRIX) == [
+        ("Cooperate", "Cooperate"), ("Cooperate", "Defect"), ("Defect", "Cooperate")
+    ]
+
+def test_tft_against_stft_alternates():
+    # Periodic chain: (C, D), (D, C), (C, D), ...
+    np.testing.assert_allclose(long_run("TFT", "STFT"), [0, 0.5, 0.5, 0])
+    initial, transitions = markov_chain(STRATEGIES["TFT"], STRATEGIES["STFT"])
+    np.testing.assert_allclose(finite_horizon_distribution(initial, transitions, 3), [0, 2 / 3, 1 / 3, 0])
+
+def test_grim_is_absorbed_into_defection():
+    # Reducible chains: the first defection locks GRIM into defecting for good
+    np.testing.assert_allclose(long_run("GRIM", "ALLD"), [0, 0, 0, 1])
+    np.testing.assert_allclose(long_run("GRIM", "RANDOM"), [0, 0, 0.5, 0.5])
+    np.testing.assert_allclose(long_run("GRIM", "TFT"), [1, 0, 0, 0])
+
+def test_grim_under_noise_rarely_cooperates():
+    # With noise the chain is irreducible; GRIM still ends up in mutual defection most of the time
+    distribution = long_run("GRIM", "GRIM", noise=0.01)
+    assert distribution.sum() == pytest.approx(1.0)
+    assert distribution[3] > 0.9
+
+def test_long_run_matches_long_finite_horizon():
+    for a, b in zip(random_strategies(5, seed=0), random_strategies(5, seed=1)):
+        initial, transitions = markov_chain(a, b, noise=0.02)
+        distribution = long_run_distribution(initial, transitions)
+        np.testing.assert_allclose(distribution @ transitions, distribution, atol=1e-12)
+        np.testing.assert_allclose(finite_horizon_distribution(initial, transitions, 20_000), distribution, atol=1e-3)
+
+def test_expected_payoffs_of_deterministic_pairs():
+    result = expected_payoffs(STRATEGIES["TFT"], STRATEGIES["ALLD"], DEFAULT_PAYOFF_MATRIX, rounds=10)
+    # One sucker's payoff, then nine rounds of mutual defection
+    assert result["Agent A Payoff"] == pytest.approx((0 + 9 * 1) / 10)
+    assert result["Agent B Payoff"] == pytest.approx((5 + 9 * 1) / 10)
+    assert result["Agent A Cooperation"] == pytest.approx(0.1)
+    result = expected_payoffs(STRATEGIES["WSLS"], STRATEGIES["WSLS"], DEFAULT_PAYOFF_MATRIX)
+    assert result["Mutual Cooperation"] == pytest.approx(1.0)
+    assert result["Agent A Payoff"] == pytest.approx(round_payoffs(DEFAULT_PAYOFF_MATRIX, "Cooperate", "Cooperate")[0])
+
+def test_analysis_is_cached_per_matrix():
+    as_lists = {outcome: list(payoffs) for outcome, payoffs in DEFAULT_PAYOFF_MATRIX.items()}
+    analysis = analyze_payoff_matrix(DEFAULT_PAYOFF_MATRIX, rounds=10)
+    assert analyze_payoff_matrix(as_lists, rounds=10) is analysis
+    assert analyze_payoff_matrix(DEFAULT_PAYOFF_MATRIX) is not analysis
+    assert analysis.is_prisoners_dilemma
+    assert len(analysis.baselines) == len(CLASSIC_STRATEGIES) ** 2
+    assert not analyze_payoff_matrix(CHICKEN).is_prisoners_dilemma
+
+def test_incomplete_matrix_is_rejected():
+    with pytest.raises(ValueError):
+        analyze_payoff_matrix({("Cooperate", "Cooperate"): (3, 3)})
@@ -0,0 +1,95 @@
+# tests/test_jobs.py
+
+import threading
+import time
+import pytest
+from utils.backends import AlwaysCooperate, DecisionBackend
+from utils.batch_runner import ExperimentSpec, spec_config
+from utils.checkpoint import CheckpointStore
+from utils.jobs import GameJobManager
+from utils.results_store import ResultsStore
+from config import DEFAULT_PAYOFF_MATRIX
+
+class GatedBackend(DecisionBackend):
+    """
+    Cooperates once `gate` is set, holding the only worker until then.
+    """
+    def __init__(self, gate: threading.Event):
+        self.gate = gate
+        self.deciding = threading.Event()
+
+    def decide(self, prompt, own_history, opponent_history):
+        self.deciding.set()
+        self.gate.wait(timeout=10)
+        return "Cooperate"
+
+def wait_for(condition, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+@pytest.fixture
+def checkpoints(tmp_path):
+    return CheckpointStore(str(tmp_path / "checkpoints.sqlite"))
+
+@pytest.fixture
+def manager(tmp_path, checkpoints):
+    manager = GameJobManager(ResultsStore(str(tmp_path / "results")), checkpoints, max_workers=1)
+    yield manager
+    # A paused game would keep its worker, and the interpreter, alive
+    for job in manager.jobs():
+        job.cancel()
+
+def submit(manager, checkpoints, game_id, backend, num_rounds=2):
+    spec = ExperimentSpec("default", DEFAULT_PAYOFF_MATRIX, "plain", "Prompt A", "Prompt B", True, num_rounds)
+    return manager.submit(checkpoints.start_game(game_id, spec_config(spec)), backend, AlwaysCooperate())
+
+def test_cancelling_a_queued_job_is_immediate(manager, checkpoints):
+    gate = threading.Event()
+    blocker = submit(manager, checkpoints, "blocker", GatedBackend(gate))
+    queued = submit(manager, checkpoints, "queued", AlwaysCooperate())
+    wait_for(lambda: blocker.status == "running")
+    assert queued.status == "queued"
+    queued.cancel()
+    assert queued.status == "cancelled" and not queued.active
+    assert manager.active_ids() == ["blocker"]
+    gate.set()
+    wait_for(lambda: not blocker.active)
+    assert blocker.status == "completed"
+    assert queued.status == "cancelled" and queued.completed_rounds == 0
+
+def test_paused_queued_job_stays_queued_until_started(manager, checkpoints):
+    gate = threading.Event()
+    blocker = submit(manager, checkpoints, "blocker", GatedBackend(gate))
+    held = submit(manager, checkpoints, "held", AlwaysCooperate())
+    later = submit(manager, checkpoints, "later", AlwaysCooperate())
+    held.pause()
+    later.pause()
+    assert (held.status, held.paused) == ("queued", True)
+    later.resume()
+    assert (later.status, later.paused) == ("queued", False)
+
+    gate.set()
+    wait_for(lambda: held.status == "paused")
+    assert held.completed_rounds == 0
+    held.resume()
+    wait_for(lambda: not held.active and not later.active)
+    assert [job.status for job in (blocker, held, later)] == ["completed"] * 3
+    assert held.completed_rounds == 2
+
+def test_pause_and_resume_between_rounds(manager, checkpoints):
+    gate = threading.Event()
+    backend = GatedBackend(gate)
+    job = submit(manager, checkpoints, "game", backend, num_rounds=3)
+    assert backend.deciding.wait(timeout=10)
+    job.pause()
+    assert (job.status, job.paused) == ("paused", True)
+    gate.set()
+    wait_for(lambda: job.completed_rounds == 1)
+    time.sleep(0.1)
+    assert job.status == "paused" and job.completed_rounds == 1
+    job.cancel()
+    wait_for(lambda: not job.active)
+    assert job.status == "cancelled"
+    assert checkpoints.load("game").status == "interrupted"
@@ -0,0 +1,28 @@
+# tests/test_model_comparison.py
+
+from utils.batch_runner import ExperimentSpec
+from utils.mock_server import MockLLMServer
+from utils.model_comparison import ModelSpec, parse_model_spec, run_model_comparison
+from utils.rate_limit import get_rate_limiter
+from config import DEFAULT_PAYOFF_MATRIX
+
+def test_parse_model_spec():
+    model = parse_model_spec("llama3@http://localhost:11434/v1,workers=2,rpm=500,tpm=20000")
+    assert model.model == "llama3"
+    assert model.base_url == "http://localhost:11434/v1"
+    assert model.max_workers == 2
+    assert model.requests_per_minute == 500
+    assert model.tokens_per_minute == 20000
+
+def test_per_model_caps_survive_advertised_limits():
+    spec = ExperimentSpec("default", DEFAULT_PAYOFF_MATRIX, "plain", "Cooperate or Defect?", "Cooperate or Defect?", False, 3)
+    with MockLLMServer(advertised_rpm=100_000, advertised_tpm=10_000_000) as server:
+        model = ModelSpec("cap-test-model", base_url=server.url, requests_per_minute=300, tokens_per_minute=20_000)
+        results = run_model_comparison([model], [spec])
+    assert len(results) == 3
+    limiter = get_rate_limiter("cap-test-model")
+    assert limiter.account_requests_per_minute == 100_000
+    assert limiter.max_requests_per_minute == 300
+    assert limiter.max_tokens_per_minute == 20_000
+    assert limiter.requests_per_minute <= 300
+    assert limiter.tokens_per_minute <= 20_000
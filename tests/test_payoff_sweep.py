@@ -0,0 +1,58 @@
+# tests/test_payoff_sweep.py
+
+import numpy as np
+import pytest
+from utils.backends import AlwaysCooperate, AlwaysDefect
+from utils.batch_runner import ExperimentSpec
+from utils.game_logic import is_prisoners_dilemma
+from utils.payoff_sweep import _games_wanted, bootstrap_ci, payoff_grid, run_payoff_sweep
+
+def make_specs(matrices, repetitions=12):
+    return [
+        ExperimentSpec(name, matrix, "plain", "Prompt A", "Prompt B", False, 4, repetitions=repetitions)
+        for name, matrix in matrices.items()
+    ]
+
+def test_bootstrap_ci_brackets_the_mean():
+    rng = np.random.default_rng(0)
+    samples = [rng.random(50), rng.random(10) + 5, [2.0] * 5, []]
+    means, lows, highs = bootstrap_ci(samples, n_boot=2000, confidence=0.95, seed=1)
+    assert means[:3] == pytest.approx([np.mean(samples[0]), np.mean(samples[1]), 2.0])
+    assert np.all(lows[:3] <= means[:3]) and np.all(means[:3] <= highs[:3])
+    assert lows[2] == highs[2] == 2.0
+    # More games give a narrower interval
+    assert highs[0] - lows[0] < highs[1] - lows[1]
+    assert np.isnan(means[3]) and np.isnan(lows[3]) and np.isnan(highs[3])
+
+def test_bootstrap_ci_is_reproducible_with_a_seed():
+    samples = [[0.1, 0.4, 0.9, 0.3], [1.0, 0.0]]
+    first = bootstrap_ci(samples, n_boot=500, seed=3)
+    second = bootstrap_ci(samples, n_boot=500, seed=3)
+    for a, b in zip(first, second):
+        np.testing.assert_array_equal(a, b)
+
+def test_games_wanted_projects_from_interval_width():
+    # Halving the width takes four times the games: 4 played, 12 more needed
+    assert _games_wanted(4, 0.2, 0.1, batch_games=100, budget_left=100) == 12
+    assert _games_wanted(4, 0.2, 0.1, batch_games=5, budget_left=100) == 5
+    assert _games_wanted(4, 0.2, 0.1, batch_games=100, budget_left=3) == 3
+    assert _games_wanted(4, 0.101, 0.1, batch_games=100, budget_left=100) == 1
+    assert _games_wanted(0, float("nan"), 0.1, batch_games=4, budget_left=10) == 4
+
+def test_payoff_grid_keeps_only_dilemmas():
+    matrices = payoff_grid([5, 3], [3], [1], [0])
+    assert list(matrices) == ["T5 R3 P1 S0"]
+    assert all(is_prisoners_dilemma(matrix) for matrix in matrices.values())
+    assert payoff_grid([2], [3], [1], [0]) == {}
+
+def test_empty_sweep_is_refused():
+    with pytest.raises(ValueError):
+        run_payoff_sweep(AlwaysCooperate(), make_specs(payoff_grid([2], [3], [1], [0])))
+
+def test_deterministic_games_converge_after_min_games():
+    specs = make_specs(payoff_grid([4, 5], [3], [1], [0]))
+    df, summary = run_payoff_sweep(AlwaysCooperate(), specs, min_games=3, client_b=AlwaysDefect(), n_boot=200, seed=0)
+    assert list(summary["Games"]) == [3, 3]
+    assert summary["Converged"].all()
+    assert list(summary["Cooperation Rate"]) == [0.5, 0.5]
+    assert len(df) == 2 * 3 * 4
@@ -0,0 +1,65 @@
+# tests/test_population.py
+
+import numpy as np
+import pytest
+from utils.backends import AlwaysDefect
+from utils.population import PopulationSimulation, grid_neighbours, grid_pairs
+from utils.tournament import CLASSIC_STRATEGIES
+
+STRATEGIES = {strategy.name: strategy for strategy in CLASSIC_STRATEGIES}
+
+@pytest.mark.parametrize("neighbourhood, degree", [("von_neumann", 4), ("moore", 8)])
+@pytest.mark.parametrize("side", [3, 4, 7])
+def test_grid_pairs_cover_every_torus_edge_once(side, neighbourhood, degree):
+    idx_a, idx_b = grid_pairs(side, neighbourhood)
+    edges = [frozenset(edge) for edge in zip(idx_a.tolist(), idx_b.tolist())]
+    assert all(len(edge) == 2 for edge in edges)
+    assert len(edges) == len(set(edges)) == side * side * degree // 2
+    neighbours = grid_neighbours(side, neighbourhood)
+    expected = {frozenset((cell, int(other))) for cell in range(side * side) for other in neighbours[cell]}
+    assert set(edges) == expected
+    # Every cell meets each of its neighbours
+    assert np.all(np.bincount(np.concatenate([idx_a, idx_b]), minlength=side * side) == degree)
+
+@pytest.mark.parametrize("update_rule", ["replicator", "moran"])
+@pytest.mark.parametrize("topology", ["well_mixed", "grid"])
+def test_update_never_replaces_or_copies_llm_agents(topology, update_rule):
+    sim = PopulationSimulation(
+        size=100, strategies=[STRATEGIES["ALLD"], STRATEGIES["ALLC"]], topology=topology, update_rule=update_rule,
+        moran_events=20, llm_backend=AlwaysDefect(), llm_fraction=0.3, seed=1
+    )
+    # LLM agents hold strategy 0 and are by far the fittest; nobody else holds strategy 0
+    sim.population = np.where(sim.is_llm, 0, 1)
+    fitness = np.where(sim.is_llm, 100.0, sim.rng.random(sim.size))
+    is_llm = sim.is_llm.copy()
+    for _ in range(20):
+        sim.update(fitness)
+    assert np.array_equal(sim.is_llm, is_llm)
+    assert np.all(sim.population[is_llm] == 0)
+    assert np.all(sim.population[~is_llm] == 1)
+
+def test_llm_payoffs_land_on_the_llm_agent_on_side_b():
+    sim = PopulationSimulation(
+        size=4, strategies=[STRATEGIES["ALLC"]], num_rounds=3, llm_backend=AlwaysDefect(), llm_fraction=0.25, seed=2
+    )
+    llm = int(np.flatnonzero(sim.is_llm)[0])
+    classic = (llm + 1) % sim.size
+    payoff_a, payoff_b, coop_a, coop_b = sim._play_llm_matches(np.array([classic, llm]), np.array([llm, classic]))
+    # Row 0 has the LLM on side B, row 1 on side A; ALLC is exploited by the defecting LLM
+    assert payoff_a.tolist() == [0.0, 15.0]
+    assert payoff_b.tolist() == [15.0, 0.0]
+    assert coop_a.tolist() == [3.0, 0.0]
+    assert coop_b.tolist() == [0.0, 3.0]
+
+def test_play_credits_llm_matches_to_both_sides():
+    sim = PopulationSimulation(
+        size=10, strategies=[STRATEGIES["ALLC"]], num_rounds=2, matches_per_agent=3,
+        llm_backend=AlwaysDefect(), llm_fraction=0.1, llm_workers=2, seed=3
+    )
+    fitness, cooperation = sim.play()
+    llm = sim.is_llm
+    # The defecting LLM earns T every round; its ALLC opponents earn S against it and R otherwise
+    assert fitness[llm].tolist() == [5.0]
+    assert cooperation[llm].tolist() == [0.0]
+    assert np.all(fitness[~llm] <= 3.0) and fitness[~llm].min() < 3.0
+    assert np.all(cooperation[~llm] == 1.0)
@@ -0,0 +1,75 @@
+# tests/test_prompt_pool.py
+
+import numpy as np
+import pytest
+from openai import OpenAI
+from utils.mock_server import MockLLMServer
+from utils.prompt_pool import (
+    PromptPool, generate_prompts, hamming_distances, normalize_prompt, pair_name, parse_pair_name,
+    parse_persona_lines, simhash
+)
+
+BANKER = (
+    "You are a cautious banker who has been burned by partners before, and a large loan depends "
+    "on this deal. Should you Cooperate or Defect?"
+)
+FARMER = (
+    "You are a generous farmer sharing water rights with a neighbour during a long drought, "
+    "trusting them to do the same. Should you Cooperate or Defect?"
+)
+
+@pytest.fixture
+def pool(tmp_path):
+    # A looser threshold than the default, so one changed word in these short prompts counts as a near-duplicate
+    return PromptPool(str(tmp_path / "pool.sqlite"), near_duplicate_bits=10)
+
+def test_normalize_ignores_case_punctuation_and_spacing():
+    assert normalize_prompt("  You are   a BANKER!  ") == normalize_prompt("you are a banker")
+
+def test_simhash_is_closer_for_rewordings_than_for_other_prompts():
+    fingerprints = np.array([simhash(BANKER.replace("large", "big")), simhash(FARMER)], dtype=np.uint64)
+    near, far = hamming_distances(simhash(BANKER), fingerprints)
+    assert near < 10 < 20 < far
+    assert simhash(BANKER) == simhash(BANKER.upper())
+
+def test_hamming_distances_count_differing_bits():
+    fingerprints = np.array([0, 1, 0b1011, (1 << 64) - 1], dtype=np.uint64)
+    assert list(hamming_distances(0, fingerprints)) == [0, 1, 3, 64]
+
+def test_add_rejects_exact_and_near_duplicates(pool):
+    ids = pool.add([BANKER, FARMER, BANKER.lower() + "!!", BANKER.replace("large", "big")])
+    assert ids[0] is not None and ids[1] is not None
+    assert ids[2:] == [None, None]
+    assert pool.add([FARMER]) == [None]
+    assert len(pool) == 2
+    assert pool.find(FARMER.upper()) == ids[1]
+
+def test_pool_reloads_fingerprints(pool):
+    pool.add([BANKER])
+    reopened = PromptPool(pool.path, near_duplicate_bits=10)
+    assert len(reopened) == 1
+    assert reopened.add([BANKER.replace("large", "big"), FARMER])[0] is None
+
+def test_pairs_are_reproducible_and_replayable(pool):
+    pool.add([BANKER, FARMER, "You are a chess grandmaster who never forgives a blunder. Should you Cooperate or Defect?"])
+    pairs = pool.prompt_pairs(4, seed=7)
+    assert pairs == pool.prompt_pairs(4, seed=7)
+    assert len(pairs) == 4
+    for name, prompts in pairs.items():
+        assert pool.pair(name) == prompts
+    a, b = pool.sample_pairs(1, seed=1)[0]
+    assert parse_pair_name(pair_name(a, b)) == (a.prompt_id, b.prompt_id)
+    assert parse_pair_name("default") is None
+
+def test_parse_persona_lines_strips_numbering():
+    reply = "Here you go:\n1. " + BANKER + "\n2) " + FARMER + "\n- too short"
+    assert parse_persona_lines(reply) == [BANKER, FARMER]
+
+def test_generate_prompts_fills_pool_without_duplicates(tmp_path):
+    pool = PromptPool(str(tmp_path / "generated.sqlite"))
+    with MockLLMServer() as server:
+        client = OpenAI(api_key="mock", base_url=server.url, max_retries=0)
+        added = generate_prompts(client, pool, 30, model="mock-personas", max_workers=4)
+    texts = [prompt.text for prompt in pool.prompts()]
+    assert added == len(texts) == 30
+    assert len({normalize_prompt(text) for text in texts}) == 30
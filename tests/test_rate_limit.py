@@ -0,0 +1,95 @@
+# tests/test_rate_limit.py
+
+import pytest
+import utils.rate_limit
+from utils.rate_limit import (
+    AdaptiveRateLimiter, configure_rate_limits, get_rate_limiter, parse_duration, parse_retry_after
+)
+
+ACCOUNT_HEADERS = {"x-ratelimit-limit-requests": "10000", "x-ratelimit-limit-tokens": "2000000"}
+
+def test_headers_do_not_raise_configured_caps():
+    limiter = AdaptiveRateLimiter(requests_per_minute=100, tokens_per_minute=1000)
+    for _ in range(200):
+        limiter.on_success(ACCOUNT_HEADERS)
+    assert limiter.max_requests_per_minute == 100
+    assert limiter.max_tokens_per_minute == 1000
+    assert limiter.requests_per_minute == 100
+    assert limiter.tokens_per_minute == 1000
+
+def test_headers_lower_the_ceiling_below_the_cap():
+    limiter = AdaptiveRateLimiter(requests_per_minute=100, tokens_per_minute=1000, initial_requests_per_minute=100)
+    limiter.on_success({"x-ratelimit-limit-requests": "30", "x-ratelimit-limit-tokens": "500"})
+    assert limiter.requests_per_minute == 30
+    assert limiter.tokens_per_minute == 500
+
+def test_rate_ramps_towards_learned_limit():
+    limiter = AdaptiveRateLimiter(initial_requests_per_minute=60)
+    limiter.on_success(ACCOUNT_HEADERS)
+    assert 60 < limiter.requests_per_minute < 100
+    assert limiter.tokens_per_minute < 2000000
+    for _ in range(500):
+        limiter.on_success(ACCOUNT_HEADERS)
+    assert limiter.requests_per_minute == 10000
+    assert limiter.tokens_per_minute == 2000000
+
+def test_rate_limited_halves_once_per_cooldown():
+    limiter = AdaptiveRateLimiter(initial_requests_per_minute=100, tokens_per_minute=1000, decrease_cooldown=60)
+    limiter.on_rate_limited()
+    limiter.on_rate_limited()
+    assert limiter.requests_per_minute == 50
+    assert limiter.tokens_per_minute == 500
+
+def test_rate_limited_keeps_minimum_rate():
+    limiter = AdaptiveRateLimiter(initial_requests_per_minute=8, min_requests_per_minute=6, decrease_cooldown=0)
+    limiter.on_rate_limited()
+    assert limiter.requests_per_minute == 6
+
+def test_malformed_limit_header_is_ignored():
+    limiter = AdaptiveRateLimiter(requests_per_minute=100, initial_requests_per_minute=100)
+    limiter.on_success({"x-ratelimit-limit-requests": "lots"})
+    assert limiter.requests_per_minute == 100
+
+def test_parse_headers():
+    assert parse_duration("6m0s") == 360
+    assert parse_duration("20ms") == 0.02
+    assert parse_duration("") is None
+    assert parse_retry_after({"retry-after-ms": "1500"}) == 1.5
+    assert parse_retry_after({"retry-after": "2"}) == 2
+    assert parse_retry_after({"retry-after": "Wed, 21 Oct 2026 07:28:00 GMT"}) is None
+
+@pytest.fixture
+def fresh_limiters(monkeypatch):
+    monkeypatch.setattr(utils.rate_limit, "_limiters", {})
+    monkeypatch.setattr(utils.rate_limit, "_limiter_defaults", {})
+    monkeypatch.setattr(utils.rate_limit, "_limiter_overrides", {})
+
+def test_per_model_cap_survives_new_defaults(fresh_limiters):
+    configure_rate_limits("model-a", requests_per_minute=100, tokens_per_minute=None)
+    limiter_a = get_rate_limiter("model-a")
+    limiter_a.on_success()
+    learned = limiter_a.requests_per_minute
+    limiter_b = get_rate_limiter("model-b")
+
+    configure_rate_limits(requests_per_minute=500, tokens_per_minute=2000)
+    assert get_rate_limiter("model-a") is limiter_a
+    assert limiter_a.requests_per_minute == learned
+    assert limiter_a.max_requests_per_minute == 100
+    assert get_rate_limiter("model-b") is not limiter_b
+    assert get_rate_limiter("model-b").max_requests_per_minute == 500
+    assert get_rate_limiter("model-b").max_tokens_per_minute == 2000
+
+def test_rebuilt_per_model_limiter_merges_defaults(fresh_limiters):
+    configure_rate_limits(tokens_per_minute=2000)
+    configure_rate_limits("model-a", requests_per_minute=100)
+    limiter = get_rate_limiter("model-a")
+    assert (limiter.max_requests_per_minute, limiter.max_tokens_per_minute) == (100, 2000)
+
+def test_unchanged_options_keep_learned_rates(fresh_limiters):
+    configure_rate_limits(requests_per_minute=500)
+    configure_rate_limits("model-a", requests_per_minute=100)
+    default_limiter, model_limiter = get_rate_limiter("model-b"), get_rate_limiter("model-a")
+    configure_rate_limits(requests_per_minute=500)
+    configure_rate_limits("model-a", requests_per_minute=100)
+    assert get_rate_limiter("model-b") is default_limiter
+    assert get_rate_limiter("model-a") is model_limiter
@@ -0,0 +1,50 @@
+# tests/test_results_store.py
+
+import io
+import threading
+import pandas as pd
+from utils.results_store import ResultsStore
+from config import RESULT_COLUMNS
+
+def make_rows(start: int, count: int):
+    return [(round_num, "Cooperate", "Defect", 0.0, 5.0, False, False) for round_num in range(start, start + count)]
+
+def test_two_stores_appending_to_one_experiment_keep_all_rows(tmp_path):
+    first, second = ResultsStore(str(tmp_path), chunk_rows=5), ResultsStore(str(tmp_path), chunk_rows=5)
+
+    def write(store, start):
+        for offset in range(0, 50, 10):
+            store.append("game", make_rows(start + offset, 10))
+        store.flush("game")
+
+    threads = [threading.Thread(target=write, args=(store, start)) for store, start in ((first, 1), (second, 1001))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    rounds = sorted(ResultsStore(str(tmp_path)).read("game")["Round"])
+    assert rounds == list(range(1, 51)) + list(range(1001, 1051))
+
+def test_parts_are_read_in_append_order(tmp_path):
+    store = ResultsStore(str(tmp_path), chunk_rows=3)
+    for start in range(1, 31, 2):
+        store.append("game", make_rows(start, 2))
+    store.flush("game")
+    assert list(store.read("game")["Round"]) == list(range(1, 31))
+    assert [row[0] for row in store.iter_rows("game")] == list(range(1, 31))
+
+def test_round_trip_and_exports(tmp_path):
+    store = ResultsStore(str(tmp_path))
+    store.append("game", make_rows(1, 4))
+    assert "game" not in store
+    store.flush()
+    assert "game" in store and store.experiments() == ["game"]
+    df = store.read("game")
+    assert list(df.columns) == RESULT_COLUMNS
+    assert list(df["Agent A Decision"].astype(str)) == ["Cooperate"] * 4
+    sink = io.BytesIO()
+    store.export_csv(sink, "game")
+    sink.seek(0)
+    assert len(pd.read_csv(sink)) == 4
+    store.delete("game")
+    assert "game" not in store
@@ -0,0 +1,88 @@
+# tests/test_tournament.py
+
+import numpy as np
+import pytest
+from utils.tournament import (
+    CLASSIC_STRATEGIES, moves_to_results, payoff_matrices_to_array, payoff_matrix_to_array, run_tournament,
+    score_games, simulate_games
+)
+from config import DEFAULT_PAYOFF_MATRIX, PAYOFF_PRESETS, RESULT_COLUMNS
+
+STRATEGIES = {strategy.name: strategy for strategy in CLASSIC_STRATEGIES}
+
+def play(name_a: str, name_b: str, num_rounds: int = 10, **kwargs):
+    return simulate_games(
+        STRATEGIES[name_a].as_row()[None], STRATEGIES[name_b].as_row()[None], num_rounds, seed=0, **kwargs
+    )
+
+@pytest.mark.parametrize("name_a, name_b, counts", [
+    # Outcome counts are CC, CD, DC, DD from A's side
+    ("ALLC", "ALLD", [0, 10, 0, 0]),
+    ("ALLD", "ALLC", [0, 0, 10, 0]),
+    ("TFT", "TFT", [10, 0, 0, 0]),
+    ("TFT", "ALLD", [0, 1, 0, 9]),
+    ("GRIM", "ALLC", [10, 0, 0, 0]),
+    ("TFT", "STFT", [0, 5, 5, 0]),
+    ("WSLS", "ALLD", [0, 5, 0, 5]),
+])
+def test_deterministic_outcome_counts(name_a, name_b, counts):
+    assert play(name_a, name_b)["outcome_counts"].tolist() == [counts]
+
+def test_recorded_moves_match_counts():
+    result = play("TFT", "STFT", num_rounds=4, record_moves=True)
+    assert result["moves_a"].tolist() == [[0, 1, 0, 1]]
+    assert result["moves_b"].tolist() == [[1, 0, 1, 0]]
+
+def test_many_games_at_once_and_noise():
+    rows = np.stack([STRATEGIES["ALLC"].as_row()] * 1000)
+    counts = simulate_games(rows, rows, 20, seed=1, noise=0.1)["outcome_counts"]
+    assert counts.shape == (1000, 4) and np.all(counts.sum(axis=1) == 20)
+    # Each move flips with probability 0.1, so about 81% of rounds stay CC
+    assert counts[:, 0].mean() / 20 == pytest.approx(0.81, abs=0.02)
+
+def test_score_games_against_hand_computed_totals():
+    counts = np.array([[2, 1, 0, 3], [0, 0, 4, 0]])
+    # Default: CC (3, 3), CD (0, 5), DC (5, 0), DD (1, 1)
+    score_a, score_b = score_games(counts, payoff_matrix_to_array(DEFAULT_PAYOFF_MATRIX))
+    assert score_a.tolist() == [2 * 3 + 0 + 3 * 1, 4 * 5]
+    assert score_b.tolist() == [2 * 3 + 5 + 3 * 1, 0]
+
+    matrices = [DEFAULT_PAYOFF_MATRIX, PAYOFF_PRESETS["Asymmetrical"]]
+    score_a, score_b = score_games(counts, payoff_matrices_to_array(matrices))
+    assert score_a.shape == score_b.shape == (2, 2)
+    for column, matrix in enumerate(matrices):
+        expected = [
+            sum(count * matrix[outcome][player] for count, outcome in zip(row, matrix))
+            for row in counts.tolist() for player in (0, 1)
+        ]
+        assert np.column_stack([score_a[:, column], score_b[:, column]]).reshape(-1).tolist() == expected
+
+def test_run_tournament_scores_per_round():
+    strategies = [STRATEGIES[name] for name in ("ALLC", "ALLD", "TFT")]
+    matches = run_tournament(strategies, [DEFAULT_PAYOFF_MATRIX], num_rounds=10, repetitions=2, seed=0)
+    assert len(matches) == 9
+    scores = matches.set_index(["Strategy", "Opponent"])
+    assert scores.loc[("ALLC", "ALLD"), "Score"] == 0.0
+    assert scores.loc[("ALLD", "ALLC"), "Score"] == 5.0
+    assert scores.loc[("TFT", "ALLD"), "Score"] == pytest.approx(0.9)
+    assert scores.loc[("ALLD", "TFT"), "Score"] == pytest.approx(1.4)
+    assert scores.loc[("ALLD", "TFT"), "Opponent Score"] == pytest.approx(0.9)
+    assert scores.loc[("TFT", "TFT"), "Score"] == 3.0
+    assert scores.loc[("TFT", "ALLD"), "Cooperation Rate"] == pytest.approx(0.1)
+
+def test_run_tournament_rows_per_matrix():
+    matrices = [DEFAULT_PAYOFF_MATRIX, PAYOFF_PRESETS["Punishing Defection"]]
+    matches = run_tournament(CLASSIC_STRATEGIES[:3], matrices, num_rounds=5, seed=0)
+    assert matches.groupby("Matrix").size().tolist() == [9, 9]
+    punishing = matches[(matches["Matrix"] == 1) & (matches["Strategy"] == "ALLD") & (matches["Opponent"] == "ALLD")]
+    assert punishing["Score"].tolist() == [PAYOFF_PRESETS["Punishing Defection"][("Defect", "Defect")][0]]
+
+def test_moves_to_results_schema():
+    results = moves_to_results(np.array([0, 1, 1]), np.array([0, 0, 1]), DEFAULT_PAYOFF_MATRIX)
+    assert list(results.columns) == RESULT_COLUMNS
+    assert results["Round"].tolist() == [1, 2, 3]
+    assert results["Agent A Decision"].tolist() == ["Cooperate", "Defect", "Defect"]
+    assert results["Agent B Decision"].tolist() == ["Cooperate", "Cooperate", "Defect"]
+    assert results["Agent A Payoff"].tolist() == [3, 5, 1]
+    assert results["Agent B Payoff"].tolist() == [3, 0, 1]
+    assert not results["Agent A Fallback"].any() and not results["Agent B Fallback"].any()
@@ -0,0 +1,179 @@
+# utils/analytics.py
+
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from utils.results_store import ResultsStore
+from utils.tournament import CLASSIC_STRATEGIES
+
+logger = logging.getLogger(__name__)
+
+# Strategies a game's play is matched against, in tie-breaking order
+CLASSIFIED_STRATEGIES = ("TFT", "GRIM", "WSLS", "ALLD", "ALLC")
+
+# Columns that tell games apart within one results table, where present
+GAME_COLUMNS = ("Model", "Experiment ID", "Repetition")
+
+METRIC_COLUMNS = [
+    "Agent", "Rounds", "Cooperation Rate", "P(C | Opponent C)", "P(C | Opponent D)",
+    "Retaliation Rate", "Forgiveness Rate", "Mean Cooperation Streak", "Longest Cooperation Streak",
+    "Nearest Strategy", "Strategy Match",
+]
+
+def _strategy_table(names: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    First-round and (CC, CD, DC, DD) cooperation probabilities of `names`.
+    """
+    by_name = {strategy.name: strategy for strategy in CLASSIC_STRATEGIES}
+    unknown = [name for name in names if name not in by_name]
+    if unknown:
+        raise ValueError(f"Unknown strategies {unknown}. Expected names from {list(by_name)}.")
+    rows = np.stack([by_name[name].as_row() for name in names])
+    return rows[:, 0], rows[:, 1:]
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(denominator > 0, numerator / denominator, np.nan)
+
+def game_metrics(
+    df: pd.DataFrame,
+    game_columns: Optional[Sequence[str]] = None,
+    strategies: Sequence[str] = CLASSIFIED_STRATEGIES
+) -> pd.DataFrame:
+    """
+    Per game and agent: cooperation rate, conditional cooperation, retaliation
+    and forgiveness, cooperation streaks and the nearest classic strategy.
+
+    `df` has the usual RESULT_COLUMNS, plus `game_columns` (by default those
+    of GAME_COLUMNS present) telling its games apart. All metrics are computed
+    over every game at once with array operations:
+    - P(C | Opponent C/D): cooperation after the opponent cooperated/defected
+      in the previous round; NaN if that never happened.
+    - Retaliation Rate: share of opponent defections answered with a defection.
+    - Forgiveness Rate: cooperation after a round in which the agent defected
+      and the opponent cooperated, i.e. returning to cooperation.
+    - Nearest Strategy: the strategy among `strategies` (see
+      utils.tournament.CLASSIC_STRATEGIES) that would have made the most of
+      the agent's moves given the same history; Strategy Match is that share.
+    """
+    if game_columns is None:
+        game_columns = [column for column in GAME_COLUMNS if column in df.columns]
+    game_columns = list(game_columns)
+    if df.empty:
+        return pd.DataFrame(columns=game_columns + METRIC_COLUMNS)
+    df = df.sort_values(game_columns + ["Round"], kind="stable")
+    games = df.groupby(game_columns, sort=False, observed=True, dropna=False).ngroup().to_numpy() if game_columns else np.zeros(len(df), dtype=np.int64)
+    num_games = int(games.max()) + 1
+    first_rows = np.r_[True, games[1:] != games[:-1]]
+
+    # One long sequence of rounds: every game from A's side, then from B's
+    coop_a = (df["Agent A Decision"] == "Cooperate").to_numpy()
+    coop_b = (df["Agent B Decision"] == "Cooperate").to_numpy()
+    own = np.concatenate([coop_a, coop_b])
+    opponent = np.concatenate([coop_b, coop_a])
+    group = np.concatenate([games * 2, games * 2 + 1])
+    first = np.concatenate([first_rows, first_rows])
+    previous_own = np.r_[False, own[:-1]]
+    previous_opponent = np.r_[False, opponent[:-1]]
+    later = ~first
+    num_groups = num_games * 2
+
+    def count(mask: np.ndarray) -> np.ndarray:
+        return np.bincount(group[mask], minlength=num_groups)
+
+    rounds = count(np.ones_like(own))
+    after_c = later & previous_opponent
+    after_d = later & ~previous_opponent
+    after_forgivable = later & ~previous_own & previous_opponent
+
+    # Cooperation streaks: a run starts at a cooperation not preceded by one in the same game
+    run_starts = own & (first | ~previous_own)
+    run_ids = np.cumsum(run_starts) - 1
+    run_lengths = np.bincount(run_ids[own], minlength=int(run_starts.sum()))
+    run_groups = group[run_starts]
+    longest = np.zeros(num_groups, dtype=np.int64)
+    np.maximum.at(longest, run_groups, run_lengths)
+    mean_streak = _ratio(np.bincount(run_groups, run_lengths, minlength=num_groups), np.bincount(run_groups, minlength=num_groups))
+
+    # Probability each strategy gives to cooperating, given the actual previous round
+    first_p, p = _strategy_table(strategies)
+    state = 2 * (~previous_own) + (~previous_opponent)
+    predicted = np.where(first[:, None], first_p[None, :], p[:, state].T)
+    agreement = 1.0 - np.abs(own[:, None] - predicted)
+    match = np.stack([np.bincount(group, agreement[:, index], minlength=num_groups) for index in range(len(strategies))], axis=1)
+    match /= np.maximum(rounds, 1)[:, None]
+    nearest = match.argmax(axis=1)
+
+    metrics = pd.DataFrame({
+        "Agent": np.tile(["A", "B"], num_games),
+        "Rounds": rounds,
+        "Cooperation Rate": _ratio(count(own), rounds),
+        "P(C | Opponent C)": _ratio(count(after_c & own), count(after_c)),
+        "P(C | Opponent D)": _ratio(count(after_d & own), count(after_d)),
+        "Retaliation Rate": _ratio(count(after_d & ~own), count(after_d)),
+        "Forgiveness Rate": _ratio(count(after_forgivable & own), count(after_forgivable)),
+        "Mean Cooperation Streak": np.nan_to_num(mean_streak),
+        "Longest Cooperation Streak": longest,
+        "Nearest Strategy": np.asarray(strategies)[nearest],
+        "Strategy Match": match[np.arange(num_groups), nearest],
+    })
+    if game_columns:
+        keys = df.loc[first_rows, game_columns].reset_index(drop=True)
+        metrics = pd.concat([keys.loc[keys.index.repeat(2)].reset_index(drop=True), metrics], axis=1)
+    return metrics
+
+def rolling_cooperation(df: pd.DataFrame, window: int = 10) -> pd.DataFrame:
+    """
+    Each agent's cooperation rate over the last `window` rounds of one game.
+    """
+    df = df.sort_values("Round")
+    return pd.DataFrame({
+        "Round": df["Round"].to_numpy(),
+        "Agent A": (df["Agent A Decision"] == "Cooperate").astype(float).rolling(window, min_periods=1).mean().to_numpy(),
+        "Agent B": (df["Agent B Decision"] == "Cooperate").astype(float).rolling(window, min_periods=1).mean().to_numpy(),
+    })
+
+def strategy_profile(metrics: pd.DataFrame, by: Sequence[str] = ("Agent",)) -> pd.DataFrame:
+    """
+    Share of games whose play is nearest to each strategy, per group of `by`.
+    """
+    shares = metrics.groupby(list(by), observed=True)["Nearest Strategy"].value_counts(normalize=True)
+    return shares.rename("Share").reset_index()
+
+# Metrics of stored experiments, keyed by (store root, experiment ID) and kept
+# with the fingerprint of the part files they were computed from
+_metrics_cache: Dict[Tuple[str, str], Tuple[Tuple, pd.DataFrame]] = {}
+_metrics_lock = threading.Lock()
+
+def experiment_metrics(store: ResultsStore, experiment_id: str) -> pd.DataFrame:
+    """
+    game_metrics of one stored experiment, computed once per version of its
+    rows on disk. Rows get an 'Experiment ID' column if they lack one.
+    """
+    key = (store.root, experiment_id)
+    fingerprint = store.fingerprint(experiment_id)
+    with _metrics_lock:
+        cached = _metrics_cache.get(key)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+    df = store.read(experiment_id)
+    if "Experiment ID" not in df.columns:
+        df.insert(0, "Experiment ID", experiment_id)
+    metrics = game_metrics(df)
+    with _metrics_lock:
+        _metrics_cache[key] = (fingerprint, metrics)
+    return metrics
+
+def stored_game_metrics(store: ResultsStore, experiment_ids: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """
+    game_metrics of every game in the store (or in `experiment_ids`), reusing
+    the metrics of experiments whose rows have not changed since last time.
+    """
+    ids: List[str] = list(experiment_ids) if experiment_ids is not None else store.experiments()
+    frames = [experiment_metrics(store, experiment_id) for experiment_id in ids]
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return game_metrics(pd.DataFrame())
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,156 @@
+# utils/backends.py
+
+import random
+import threading
+from typing import List, Optional, Sequence, Union
+from utils.cache import ResponseCache
+from utils.gpt4 import get_gpt4_decision
+
+DEFAULT_MOCK_URL = "http://127.0.0.1:8099/v1"
+
+class DecisionBackend:
+    """
+    Something that can make an agent's decision for one round.
+
+    `decide` receives the agent's prompt for the round (a string, or a message
+    list in the prefix_stable prompt style) and both histories from
+    the agent's own point of view, and returns 'Cooperate', 'Defect' or None
+    if the answer was unclear. Backends that cannot answer at all (e.g. the
+    API keeps failing) raise utils.gpt4.DecisionError.
+    """
+    name = "Backend"
+
+    def decide(self, prompt: Union[str, List[dict]], own_history: Sequence[str], opponent_history: Sequence[str]) -> Optional[str]:
+        raise NotImplementedError
+
+class OpenAIBackend(DecisionBackend):
+    """
+    Asks a chat completion model through an OpenAI client, in one of
+    utils.decisions.DECISION_MODES.
+    """
+    def __init__(self, client: "OpenAI", model: str = "gpt-4", cache: Optional[ResponseCache] = None, decision_mode: str = "text"):
+        self.client = client
+        self.model = model
+        self.cache = cache
+        self.decision_mode = decision_mode
+        self.name = model
+
+    def decide(self, prompt, own_history, opponent_history):
+        return get_gpt4_decision(self.client, prompt, model=self.model, cache=self.cache, decision_mode=self.decision_mode)
+
+class MockLLMBackend(OpenAIBackend):
+    """
+    Talks to an OpenAI-compatible stand-in such as utils.mock_server.
+
+    The client's own retries are disabled so that injected errors and 429s
+    reach the retry logic in get_gpt4_decision.
+    """
+    def __init__(
+        self,
+        base_url: str = DEFAULT_MOCK_URL,
+        model: str = "mock-gpt-4",
+        cache: Optional[ResponseCache] = None,
+        decision_mode: str = "text"
+    ):
+        from openai import OpenAI
+        super().__init__(
+            OpenAI(api_key="mock", base_url=base_url, max_retries=0), model=model, cache=cache, decision_mode=decision_mode
+        )
+        self.name = f"{model} @ {base_url}"
+
+class AlwaysCooperate(DecisionBackend):
+    name = "Always Cooperate"
+
+    def decide(self, prompt, own_history, opponent_history):
+        return "Cooperate"
+
+class AlwaysDefect(DecisionBackend):
+    name = "Always Defect"
+
+    def decide(self, prompt, own_history, opponent_history):
+        return "Defect"
+
+class TitForTat(DecisionBackend):
+    """
+    Cooperates first, then copies the opponent's previous move.
+    """
+    name = "Tit-for-Tat"
+
+    def decide(self, prompt, own_history, opponent_history):
+        return opponent_history[-1] if len(opponent_history) else "Cooperate"
+
+class GrimTrigger(DecisionBackend):
+    """
+    Cooperates until the opponent defects once, then defects forever.
+    """
+    name = "Grim Trigger"
+
+    def decide(self, prompt, own_history, opponent_history):
+        return "Defect" if "Defect" in opponent_history else "Cooperate"
+
+class RandomStrategy(DecisionBackend):
+    """
+    Cooperates with probability `cooperate_probability`, reproducibly when seeded.
+
+    A seeded strategy draws each round from (seed, round number) alone, so a
+    game resumed from a checkpoint makes the same choices it would have made.
+    """
+    name = "Random"
+
+    def __init__(self, cooperate_probability: float = 0.5, seed: Optional[int] = None):
+        self.cooperate_probability = cooperate_probability
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def decide(self, prompt, own_history, opponent_history):
+        if self.seed is not None:
+            draw = random.Random(f"{self.seed}:{len(own_history)}").random()
+        else:
+            with self._lock:
+                draw = self._rng.random()
+        return "Cooperate" if draw < self.cooperate_probability else "Defect"
+
+# Rule-based strategies selectable by name
+STRATEGY_BACKENDS = {
+    "Tit-for-Tat": TitForTat,
+    "Grim Trigger": GrimTrigger,
+    "Random": RandomStrategy,
+    "Always Cooperate": AlwaysCooperate,
+    "Always Defect": AlwaysDefect,
+}
+OPENAI_BACKEND = "OpenAI GPT-4"
+MOCK_BACKEND = "Mock LLM Server"
+BACKEND_CHOICES = [OPENAI_BACKEND, MOCK_BACKEND] + list(STRATEGY_BACKENDS)
+
+def create_backend(
+    name: str,
+    client: Optional["OpenAI"] = None,
+    mock_url: str = DEFAULT_MOCK_URL,
+    model: str = "gpt-4",
+    seed: Optional[int] = None,
+    decision_mode: str = "text"
+) -> Optional[DecisionBackend]:
+    """
+    Build the backend called `name` (one of BACKEND_CHOICES). Returns None for
+    the OpenAI backend when no client is available yet. `seed` makes the
+    Random strategy reproducible; `decision_mode` applies to LLM backends.
+    """
+    if name == OPENAI_BACKEND:
+        return OpenAIBackend(client, model=model, decision_mode=decision_mode) if client is not None else None
+    if name == MOCK_BACKEND:
+        return MockLLMBackend(mock_url, decision_mode=decision_mode)
+    if name == "Random":
+        return RandomStrategy(seed=seed)
+    if name in STRATEGY_BACKENDS:
+        return STRATEGY_BACKENDS[name]()
+    raise ValueError(f"Unknown decision backend '{name}'. Expected one of {BACKEND_CHOICES}.")
+
+def resolve_backend(client_or_backend) -> DecisionBackend:
+    """
+    Accept either a DecisionBackend or a bare OpenAI client, as callers of the
+    round functions have always passed a client.
+    """
+    if isinstance(client_or_backend, DecisionBackend):
+        return client_or_backend
+    return OpenAIBackend(client_or_backend)
@@ -0,0 +1,207 @@
+# utils/batch_api.py
+
+import json
+import logging
+import time
+import pandas as pd
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Tuple
+from openai import OpenAI
+from utils.batch_runner import ExperimentSpec, EXPERIMENT_COLUMNS, experiment_row_prefix, make_game_id
+from utils.game_logic import build_round_prompts, validate_decision, is_valid_decision, round_payoffs
+from utils.decisions import decision_request
+from utils.gpt4 import parse_decision
+from utils.history import CompactHistory
+from utils.instrumentation import call_context, get_recorder
+from config import RESULT_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+# Provider cap on requests per batch input file
+MAX_REQUESTS_PER_BATCH = 50_000
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+def build_batch_file(
+    requests: List[Tuple[str, List[dict]]],
+    model: str = "gpt-4",
+    max_tokens: int = 10,
+    temperature: float = 0.8,
+    options: Optional[dict] = None
+) -> bytes:
+    """
+    Encode (custom_id, messages) pairs as a Batch API JSONL input file, using
+    the same request parameters (and structured-output `options`) as
+    get_gpt4_decision.
+    """
+    lines = [
+        json.dumps({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": BATCH_ENDPOINT,
+            "body": {"model": model, "messages": messages, "max_tokens": max_tokens, "temperature": temperature, **(options or {})},
+        })
+        for custom_id, messages in requests
+    ]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+def submit_batch(client: OpenAI, batch_file: bytes, description: str = "prisoners-dilemma") -> str:
+    """
+    Upload a JSONL input file and create a batch for it. Returns the batch ID.
+    """
+    uploaded = client.files.create(file=("requests.jsonl", batch_file), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=uploaded.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window="24h",
+        metadata={"description": description}
+    )
+    logger.info(f"Submitted batch {batch.id} with input file {uploaded.id}.")
+    return batch.id
+
+def wait_for_batch(client: OpenAI, batch_id: str, poll_interval: float = 30.0, timeout: Optional[float] = None):
+    """
+    Poll a batch until it reaches a terminal status and return it. Raises
+    RuntimeError if it ended in any status other than 'completed'.
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if batch.status == "completed":
+            logger.info(f"Batch {batch_id} finished with status '{batch.status}'.")
+            return batch
+        if batch.status in TERMINAL_STATUSES:
+            errors = getattr(batch, "errors", None)
+            messages = [error.message for error in getattr(errors, "data", None) or [] if getattr(error, "message", None)]
+            raise RuntimeError(
+                f"Batch {batch_id} ended with status '{batch.status}'" + (f": {'; '.join(messages)}" if messages else ".")
+            )
+        if deadline and time.monotonic() > deadline:
+            raise TimeoutError(f"Batch {batch_id} still '{batch.status}' after {timeout}s.")
+        time.sleep(poll_interval)
+
+def fetch_batch_results(client: OpenAI, batch) -> Dict[str, dict]:
+    """
+    Download a finished batch's output and error files.
+
+    Returns a mapping of custom_id to {"content": str or None, "usage": dict,
+    "status_code": int}. Requests missing from both files are absent.
+    """
+    results = {}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        for line in client.files.content(file_id).text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            body = response.get("body") or {}
+            choices = body.get("choices") or []
+            results[record["custom_id"]] = {
+                "content": choices[0]["message"]["content"] if choices else None,
+                "usage": body.get("usage") or {},
+                "status_code": response.get("status_code"),
+            }
+    return results
+
+def _answered(answer: Optional[dict]) -> bool:
+    return answer is not None and answer["status_code"] == 200
+
+@dataclass
+class _BatchGame:
+    spec: ExperimentSpec
+    repetition: int
+    agent_a_history: CompactHistory = field(default_factory=CompactHistory)
+    agent_b_history: CompactHistory = field(default_factory=CompactHistory)
+    results: List[Tuple] = field(default_factory=list)
+
+    @property
+    def game_id(self) -> str:
+        return make_game_id(self.spec, self.repetition)
+
+def run_batch_sweep(
+    client: OpenAI,
+    specs: List[ExperimentSpec],
+    model: str = "gpt-4",
+    poll_interval: float = 30.0,
+    timeout: Optional[float] = None,
+    on_wave_complete: Optional[Callable[[int, int], None]] = None,
+    decision_mode: str = "text",
+    resubmits: int = 2
+) -> pd.DataFrame:
+    """
+    Play every repetition of every spec through the Batch API.
+
+    Round r of every unfinished game forms one wave: both agents' prompts are
+    built exactly as run_prisoners_dilemma_round would, submitted as one (or,
+    above the provider cap, several) batches, and the answers are validated
+    with the same fallback rules. Requests that got no answer (missing from
+    the output or failed) are resubmitted up to `resubmits` times; after that,
+    or if a batch fails, expires or is cancelled, RuntimeError is raised
+    rather than playing fallback rounds. Batches cannot stream, so the
+    'stream' decision mode is sent as 'text'. Returns the same long-format
+    DataFrame as batch_runner.run_experiments.
+    """
+    if decision_mode == "stream":
+        decision_mode = "text"
+    games = [_BatchGame(spec, repetition) for spec in specs for repetition in range(1, spec.repetitions + 1)]
+    recorder = get_recorder()
+    round_idx = 0
+    while True:
+        active = [game for game in games if len(game.results) < game.spec.num_rounds]
+        if not active:
+            break
+        requests = []
+        for index, game in enumerate(active):
+            prompt_a, prompt_b = build_round_prompts(
+                game.agent_a_history, game.agent_b_history, game.spec.remember_history,
+                game.spec.initial_prompt_a, game.spec.initial_prompt_b,
+                game.spec.history_encoding, game.spec.history_window,
+                game.spec.prompt_style, game.spec.payoff_matrix
+            )
+            requests.append((f"{index}-A", decision_request(prompt_a, decision_mode)[0]))
+            requests.append((f"{index}-B", decision_request(prompt_b, decision_mode)[0]))
+        _, max_tokens, options = decision_request("", decision_mode)
+
+        wave_start = time.perf_counter()
+        answers = {}
+        unanswered = requests
+        for attempt in range(resubmits + 1):
+            for start in range(0, len(unanswered), MAX_REQUESTS_PER_BATCH):
+                chunk = unanswered[start:start + MAX_REQUESTS_PER_BATCH]
+                batch_id = submit_batch(client, build_batch_file(chunk, model=model, max_tokens=max_tokens, options=options), description=f"round {round_idx + 1}")
+                batch = wait_for_batch(client, batch_id, poll_interval=poll_interval, timeout=timeout)
+                answers.update(fetch_batch_results(client, batch))
+            unanswered = [(custom_id, messages) for custom_id, messages in requests if not _answered(answers.get(custom_id))]
+            if not unanswered:
+                break
+            logger.warning(f"Wave {round_idx + 1}: {len(unanswered)} requests got no answer (attempt {attempt + 1}).")
+        else:
+            raise RuntimeError(f"Wave {round_idx + 1}: {len(unanswered)} requests still unanswered after {resubmits} resubmissions.")
+        wave_latency = time.perf_counter() - wave_start
+
+        for index, game in enumerate(active):
+            decisions = {}
+            for agent in ("A", "B"):
+                answer = answers[f"{index}-{agent}"]
+                decisions[agent] = parse_decision(answer["content"], decision_mode)
+                with call_context(game_id=game.game_id, round=round_idx + 1, agent=agent):
+                    recorder.record("batch_decision", model, 1, "ok", wave_latency, SimpleNamespace(**answer["usage"]))
+            decision_a, decision_b = validate_decision(decisions["A"]), validate_decision(decisions["B"])
+            payoff_a, payoff_b = round_payoffs(game.spec.payoff_matrix, decision_a, decision_b)
+            game.agent_a_history.append(decision_a)
+            game.agent_b_history.append(decision_b)
+            game.results.append((
+                round_idx + 1, decision_a, decision_b, payoff_a, payoff_b,
+                not is_valid_decision(decisions["A"]), not is_valid_decision(decisions["B"])
+            ))
+        logger.info(f"Wave {round_idx + 1}: {len(requests)} requests for {len(active)} games in {wave_latency:.1f}s.")
+        round_idx += 1
+        if on_wave_complete:
+            on_wave_complete(round_idx, len(active))
+
+    rows = [experiment_row_prefix(game.spec, game.repetition) + row for game in games for row in game.results]
+    df = pd.DataFrame(rows, columns=EXPERIMENT_COLUMNS + RESULT_COLUMNS)
+    return df.sort_values(["Experiment ID", "Repetition", "Round"], ignore_index=True)
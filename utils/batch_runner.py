@@ -0,0 +1,214 @@
+# utils/batch_runner.py
+
+import itertools
+import logging
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from utils.checkpoint import CheckpointStore, encode_payoff_matrix
+from utils.game_logic import round_payoffs, run_prisoners_dilemma_round_concurrent, validate_payoff_matrix
+from utils.gpt4 import DecisionError
+from utils.history import CompactHistory
+from utils.instrumentation import call_context
+from utils.rate_limit import configure_rate_limits
+from config import RESULT_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# Columns identifying which experiment and repetition a results row belongs to
+EXPERIMENT_COLUMNS = ["Experiment ID", "Payoff Matrix", "Prompt Pair", "Remember History", "History Encoding", "Num Rounds", "Repetition"]
+
+@dataclass(frozen=True)
+class ExperimentSpec:
+    """
+    One cell of an experiment grid: a payoff matrix, a pair of initial prompts,
+    the history setting and encoding, a game length and the prompt style
+    (see utils.prompt_builder), played `repetitions` times.
+    """
+    payoff_name: str
+    payoff_matrix: dict
+    prompt_name: str
+    initial_prompt_a: str
+    initial_prompt_b: str
+    remember_history: bool
+    num_rounds: int
+    repetitions: int = 1
+    history_encoding: str = "full"
+    history_window: int = 10
+    prompt_style: str = "legacy"
+
+    @property
+    def encoding_label(self) -> str:
+        if self.history_encoding == "window":
+            return f"window{self.history_window}"
+        return self.history_encoding
+
+    @property
+    def experiment_id(self) -> str:
+        history = self.encoding_label if self.remember_history else "nohistory"
+        experiment_id = f"{self.payoff_name}|{self.prompt_name}|{history}|{self.num_rounds}"
+        return experiment_id if self.prompt_style == "legacy" else f"{experiment_id}|{self.prompt_style}"
+
+def build_experiment_grid(
+    payoff_matrices: Dict[str, dict],
+    prompt_pairs: Dict[str, Tuple[str, str]],
+    remember_history_options: Iterable[bool] = (True,),
+    round_counts: Iterable[int] = (10,),
+    repetitions: int = 1,
+    history_encodings: Iterable[str] = ("full",),
+    history_window: int = 10,
+    prompt_style: str = "legacy"
+) -> List[ExperimentSpec]:
+    """
+    Expand payoff matrix x prompt pair x remember_history x history encoding
+    x rounds into specs. Encodings only vary for specs that remember history.
+    Raises ValueError for a payoff matrix that does not price every outcome.
+    """
+    for matrix in payoff_matrices.values():
+        validate_payoff_matrix(matrix)
+    specs = []
+    history_encodings = list(history_encodings)
+    for (payoff_name, matrix), (prompt_name, (prompt_a, prompt_b)), remember, rounds in itertools.product(
+        payoff_matrices.items(), prompt_pairs.items(), remember_history_options, round_counts
+    ):
+        for encoding in (history_encodings if remember else history_encodings[:1]):
+            specs.append(ExperimentSpec(
+                payoff_name=payoff_name,
+                payoff_matrix=matrix,
+                prompt_name=prompt_name,
+                initial_prompt_a=prompt_a,
+                initial_prompt_b=prompt_b,
+                remember_history=remember,
+                num_rounds=rounds,
+                repetitions=repetitions,
+                history_encoding=encoding,
+                history_window=history_window,
+                prompt_style=prompt_style
+            ))
+    return specs
+
+def make_game_id(spec: ExperimentSpec, repetition: int) -> str:
+    """
+    Identifier of one game in a sweep, as used in call metrics.
+    """
+    return f"{spec.experiment_id}#{repetition}"
+
+def experiment_row_prefix(spec: ExperimentSpec, repetition: int) -> Tuple:
+    """
+    Values of EXPERIMENT_COLUMNS for every results row of one game.
+    """
+    return (
+        spec.experiment_id, spec.payoff_name, spec.prompt_name, spec.remember_history,
+        spec.encoding_label if spec.remember_history else None, spec.num_rounds, repetition
+    )
+
+def run_game(
+    client: "OpenAI",
+    spec: ExperimentSpec,
+    client_b: Optional["DecisionBackend"] = None,
+    game_id: Optional[str] = None,
+    checkpoints: Optional[CheckpointStore] = None
+) -> List[Tuple]:
+    """
+    Play one game of `spec` without any UI and return its results rows.
+    `client`/`client_b` may be OpenAI clients or DecisionBackends; model calls
+    are recorded under `game_id` (the spec's experiment ID by default).
+
+    With `checkpoints`, every round is committed as it finishes and a game
+    already in the store continues after its last completed round. A backend
+    failure (DecisionError) stops the game before the failed round.
+    """
+    game_id = game_id or spec.experiment_id
+    with call_context(game_id=game_id):
+        return _play_game(client, spec, client_b, game_id, checkpoints)
+
+def spec_config(spec: ExperimentSpec) -> dict:
+    """
+    The spec as a JSON-friendly dict, as recorded in checkpoints.
+    """
+    return {**asdict(spec), "payoff_matrix": encode_payoff_matrix(spec.payoff_matrix)}
+
+def _play_game(client, spec, client_b, game_id, checkpoints) -> List[Tuple]:
+    agent_a_history = CompactHistory()
+    agent_b_history = CompactHistory()
+    results = []
+    if checkpoints is not None:
+        checkpoint = checkpoints.start_game(game_id, spec_config(spec))
+        agent_a_history, agent_b_history = checkpoint.histories()
+        results = list(checkpoint.rows)
+    for round_num in range(len(results), spec.num_rounds):
+        try:
+            decision_a, decision_b, fallback_a, fallback_b = run_prisoners_dilemma_round_concurrent(
+                client,
+                agent_a_history,
+                agent_b_history,
+                spec.remember_history,
+                spec.initial_prompt_a,
+                spec.initial_prompt_b,
+                client_b=client_b,
+                history_encoding=spec.history_encoding,
+                history_window=spec.history_window,
+                prompt_style=spec.prompt_style,
+                payoff_matrix=spec.payoff_matrix
+            )
+        except DecisionError:
+            # Leave the game resumable from the last committed round
+            if checkpoints is not None:
+                checkpoints.finish_game(game_id, status="interrupted")
+            raise
+        payoff_a, payoff_b = round_payoffs(spec.payoff_matrix, decision_a, decision_b)
+        agent_a_history.append(decision_a)
+        agent_b_history.append(decision_b)
+        row = (round_num + 1, decision_a, decision_b, payoff_a, payoff_b, fallback_a, fallback_b)
+        results.append(row)
+        if checkpoints is not None:
+            checkpoints.record_round(game_id, row)
+    if checkpoints is not None:
+        checkpoints.finish_game(game_id)
+    return results
+
+def run_experiments(
+    client: "OpenAI",
+    specs: List[ExperimentSpec],
+    max_workers: int = 4,
+    requests_per_minute: Optional[float] = None,
+    tokens_per_minute: Optional[float] = None,
+    on_game_complete: Optional[Callable[[ExperimentSpec, int, List[Tuple]], None]] = None,
+    client_b: Optional["DecisionBackend"] = None,
+    checkpoints: Optional[CheckpointStore] = None
+) -> pd.DataFrame:
+    """
+    Run every repetition of every spec, up to `max_workers` games at a time.
+    Model calls share the process-wide per-model rate limiters;
+    `requests_per_minute`/`tokens_per_minute` cap them when given.
+
+    With `checkpoints`, rerunning the same grid after a crash or failed game
+    skips completed games and resumes partial ones from their last round.
+
+    Returns one long-format DataFrame with EXPERIMENT_COLUMNS followed by the
+    usual RESULT_COLUMNS, one row per round of every game.
+    """
+    if requests_per_minute or tokens_per_minute:
+        configure_rate_limits(requests_per_minute=requests_per_minute, tokens_per_minute=tokens_per_minute)
+    jobs = [(spec, repetition) for spec in specs for repetition in range(1, spec.repetitions + 1)]
+    logger.info(f"Running {len(jobs)} games with {max_workers} workers.")
+
+    rows = []
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pd-game") as executor:
+        futures = {executor.submit(run_game, client, spec, client_b, make_game_id(spec, repetition), checkpoints): (spec, repetition) for spec, repetition in jobs}
+        for done, future in enumerate(as_completed(futures), start=1):
+            spec, repetition = futures[future]
+            try:
+                results = future.result()
+            except Exception as e:
+                logger.error(f"Game {spec.experiment_id} #{repetition} failed: {e}")
+                continue
+            prefix = experiment_row_prefix(spec, repetition)
+            rows.extend(prefix + row for row in results)
+            logger.info(f"Finished game {done}/{len(jobs)}: {spec.experiment_id} #{repetition}")
+            if on_game_complete:
+                on_game_complete(spec, repetition, results)
+
+    df = pd.DataFrame(rows, columns=EXPERIMENT_COLUMNS + RESULT_COLUMNS)
+    return df.sort_values(["Experiment ID", "Repetition", "Round"], ignore_index=True)
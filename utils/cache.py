@@ -0,0 +1,138 @@
+# utils/cache.py
+
+import hashlib
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "responses.sqlite")
+CACHE_MODES = ("replay", "sample")
+
+class ResponseCache:
+    """
+    Persistent, content-addressed cache of chat completion texts.
+
+    Entries are keyed on (model, messages, temperature, max_tokens). Two modes:
+    - "replay": the first stored response for a key is returned on every hit.
+    - "sample": up to `samples_per_key` responses are collected per key; once
+      that many are stored, hits draw one of them at random, so temperature
+      variability is preserved without paying for new calls.
+
+    The cache is bounded by `max_entries` keys and, optionally, `max_bytes` of
+    stored text; the least recently used keys are evicted first.
+    """
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        mode: str = "replay",
+        samples_per_key: int = 5,
+        max_entries: int = 100_000,
+        max_bytes: Optional[int] = None,
+        seed: Optional[int] = None
+    ):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode '{mode}'. Expected one of {CACHE_MODES}.")
+        self.path = path
+        self.mode = mode
+        self.samples_per_key = samples_per_key if mode == "sample" else 1
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_keys ("
+                "key TEXT PRIMARY KEY, last_access REAL NOT NULL, size INTEGER NOT NULL DEFAULT 0)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_samples ("
+                "key TEXT NOT NULL, sample_idx INTEGER NOT NULL, content TEXT NOT NULL, "
+                "PRIMARY KEY (key, sample_idx))"
+            )
+
+    @staticmethod
+    def make_key(model: str, messages: List[dict], temperature: float, max_tokens: int, options: Optional[dict] = None) -> str:
+        request = {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens}
+        if options:
+            # Structured-output options change the answer; plain requests keep their old keys
+            request["options"] = options
+        payload = json.dumps(
+            request,
+            sort_keys=True,
+            separators=(",", ":")
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return a cached response for `key`, or None if the caller should make a
+        real request (a miss, or a key still collecting samples).
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT content FROM cache_samples WHERE key = ? ORDER BY sample_idx", (key,)
+            ).fetchall()
+            if len(rows) < self.samples_per_key:
+                return None
+            with self._conn:
+                self._conn.execute("UPDATE cache_keys SET last_access = ? WHERE key = ?", (time.time(), key))
+        if self.mode == "replay":
+            return rows[0][0]
+        return self._rng.choice(rows)[0]
+
+    def put(self, key: str, content: str):
+        with self._lock:
+            with self._conn:
+                count = self._conn.execute(
+                    "SELECT COUNT(*) FROM cache_samples WHERE key = ?", (key,)
+                ).fetchone()[0]
+                if count >= self.samples_per_key:
+                    return
+                self._conn.execute(
+                    "INSERT INTO cache_samples (key, sample_idx, content) VALUES (?, ?, ?)", (key, count, content)
+                )
+                self._conn.execute(
+                    "INSERT INTO cache_keys (key, last_access, size) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET last_access = excluded.last_access, size = size + excluded.size",
+                    (key, time.time(), len(content.encode("utf-8")))
+                )
+                self._evict()
+
+    def _evict(self):
+        entries, total_bytes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_keys").fetchone()
+        excess = max(0, entries - self.max_entries)
+        over_bytes = total_bytes - self.max_bytes if self.max_bytes else 0
+        if not excess and over_bytes <= 0:
+            return
+        evicted = []
+        for key, size in self._conn.execute("SELECT key, size FROM cache_keys ORDER BY last_access"):
+            if len(evicted) >= excess and over_bytes <= 0:
+                break
+            evicted.append((key,))
+            over_bytes -= size
+        self._conn.executemany("DELETE FROM cache_samples WHERE key = ?", evicted)
+        self._conn.executemany("DELETE FROM cache_keys WHERE key = ?", evicted)
+        logger.info(f"Evicted {len(evicted)} cached responses.")
+
+    def clear(self):
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM cache_samples")
+                self._conn.execute("DELETE FROM cache_keys")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache_keys").fetchone()[0]
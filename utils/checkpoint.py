@@ -0,0 +1,171 @@
+# utils/checkpoint.py
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from utils.history import CompactHistory
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_PATH = os.path.join(".results", "checkpoints.sqlite")
+
+def encode_payoff_matrix(payoff_matrix: Dict) -> List[List]:
+    """
+    JSON-friendly form of a payoff matrix: [[decision_a, decision_b, payoff_a, payoff_b], ...].
+    """
+    return [[a, b, payoff_a, payoff_b] for (a, b), (payoff_a, payoff_b) in payoff_matrix.items()]
+
+def decode_payoff_matrix(entries: List[List]) -> Dict:
+    return {(a, b): (payoff_a, payoff_b) for a, b, payoff_a, payoff_b in entries}
+
+@dataclass
+class GameCheckpoint:
+    """
+    Everything needed to continue a game: its settings and the rounds played so far.
+    """
+    game_id: str
+    config: dict
+    status: str
+    rows: List[Tuple] = field(default_factory=list)
+
+    @property
+    def completed_rounds(self) -> int:
+        return len(self.rows)
+
+    @property
+    def num_rounds(self) -> Optional[int]:
+        return self.config.get("num_rounds")
+
+    @property
+    def payoff_matrix(self) -> Dict:
+        return decode_payoff_matrix(self.config["payoff_matrix"])
+
+    def histories(self) -> Tuple[CompactHistory, CompactHistory]:
+        return (
+            CompactHistory(row[1] for row in self.rows),
+            CompactHistory(row[2] for row in self.rows)
+        )
+
+class CheckpointStore:
+    """
+    Durable per-round checkpoints of games in a SQLite file.
+
+    `start_game` records a game's settings (prompts, payoff matrix, history
+    options, backends, RNG seed); `record_round` commits each finished round
+    before the next one starts, so a crash, rerun or API failure loses at most
+    the round in flight. Calling `start_game` again with the same ID and
+    settings returns the stored checkpoint, and the caller carries on from
+    `completed_rounds`.
+    """
+    def __init__(self, path: str = DEFAULT_CHECKPOINT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS games ("
+                "game_id TEXT PRIMARY KEY, config TEXT NOT NULL, status TEXT NOT NULL, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS rounds ("
+                "game_id TEXT NOT NULL, round INTEGER NOT NULL, "
+                "decision_a TEXT, decision_b TEXT, payoff_a REAL, payoff_b REAL, "
+                "fallback_a INTEGER NOT NULL DEFAULT 0, fallback_b INTEGER NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (game_id, round))"
+            )
+
+    def start_game(self, game_id: str, config: dict) -> GameCheckpoint:
+        """
+        Register a new game, or return the checkpoint of an existing one.
+        Raises ValueError if the existing game was started with other settings,
+        so a changed grid never resumes a different game under the same ID.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO games (game_id, config, status, created_at, updated_at) "
+                "VALUES (?, ?, 'running', ?, ?)",
+                (game_id, json.dumps(config), now, now)
+            )
+        checkpoint = self.load(game_id)
+        # Compare in stored (JSON) form, where tuples have become lists
+        config = json.loads(json.dumps(config))
+        if checkpoint.config != config:
+            changed = sorted(key for key in config.keys() | checkpoint.config.keys() if config.get(key) != checkpoint.config.get(key))
+            raise ValueError(
+                f"Checkpoint {game_id} was started with different settings ({', '.join(changed)}). "
+                "Delete it or use another checkpoint file to play the new settings."
+            )
+        if checkpoint.completed_rounds:
+            logger.info(f"Resuming game {game_id} after round {checkpoint.completed_rounds}.")
+        return checkpoint
+
+    def record_round(self, game_id: str, row: Tuple):
+        """
+        Commit one results row (Round, decisions, payoffs, fallback flags).
+        """
+        round_num, decision_a, decision_b, payoff_a, payoff_b, fallback_a, fallback_b = row
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO rounds VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (game_id, round_num, decision_a, decision_b, payoff_a, payoff_b, int(fallback_a), int(fallback_b))
+            )
+            self._conn.execute("UPDATE games SET updated_at = ? WHERE game_id = ?", (time.time(), game_id))
+
+    def finish_game(self, game_id: str, status: str = "completed"):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE games SET status = ?, updated_at = ? WHERE game_id = ?", (status, time.time(), game_id)
+            )
+
+    def load(self, game_id: str) -> Optional[GameCheckpoint]:
+        with self._lock:
+            game = self._conn.execute(
+                "SELECT config, status FROM games WHERE game_id = ?", (game_id,)
+            ).fetchone()
+            if game is None:
+                return None
+            rows = self._conn.execute(
+                "SELECT round, decision_a, decision_b, payoff_a, payoff_b, fallback_a, fallback_b "
+                "FROM rounds WHERE game_id = ? ORDER BY round", (game_id,)
+            ).fetchall()
+        rows = [row[:5] + (bool(row[5]), bool(row[6])) for row in rows]
+        return GameCheckpoint(game_id, json.loads(game[0]), game[1], rows)
+
+    def unfinished(self) -> List[GameCheckpoint]:
+        """
+        Checkpoints of games that never completed, most recently updated first.
+        """
+        with self._lock:
+            ids = [row[0] for row in self._conn.execute(
+                "SELECT game_id FROM games WHERE status != 'completed' ORDER BY updated_at DESC"
+            )]
+        return [self.load(game_id) for game_id in ids]
+
+    def unfinished_progress(self) -> List[Tuple[str, int, Optional[int]]]:
+        """
+        (game_id, completed_rounds, num_rounds) of each unfinished game, most
+        recently updated first, without loading any rounds.
+        """
+        with self._lock:
+            games = self._conn.execute(
+                "SELECT g.game_id, g.config, COUNT(r.round) FROM games g "
+                "LEFT JOIN rounds r ON r.game_id = g.game_id "
+                "WHERE g.status != 'completed' GROUP BY g.game_id ORDER BY g.updated_at DESC"
+            ).fetchall()
+        return [(game_id, completed, json.loads(config).get("num_rounds")) for game_id, config, completed in games]
+
+    def delete(self, game_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM rounds WHERE game_id = ?", (game_id,))
+            self._conn.execute("DELETE FROM games WHERE game_id = ?", (game_id,))
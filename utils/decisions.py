@@ -0,0 +1,121 @@
+# utils/decisions.py
+
+import json
+import re
+from typing import Dict, List, Optional, Tuple, Union
+
+# How an agent's decision is requested and read back:
+# - text: a short free-text completion, searched for a decision keyword
+# - stream: the same request streamed, closed as soon as the decision is settled
+# - json_schema: structured output constrained to {"decision": "Cooperate" | "Defect"}
+# - logit_bias: a single completion token constrained to "C" or "D"
+DECISION_MODES = ("text", "stream", "json_schema", "logit_bias")
+
+# Token ids of "C" and "D"; single ASCII letters share ids in cl100k_base (GPT-4) and o200k_base (GPT-4o)
+LETTER_TOKEN_IDS = {"C": 34, "D": 35}
+LETTER_DECISIONS = {"C": "Cooperate", "D": "Defect"}
+LETTER_INSTRUCTION = "Answer with a single letter: C to cooperate or D to defect."
+
+DECISION_SCHEMA = {
+    "name": "decision",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {"decision": {"type": "string", "enum": ["Cooperate", "Defect"]}},
+        "required": ["decision"],
+        "additionalProperties": False,
+    },
+}
+
+_KEYWORD = re.compile(r"\b(cooperat|defect)", re.IGNORECASE)
+_NEGATIONS = {"not", "never", "no", "don't", "won't", "wouldn't", "shouldn't", "cannot", "can't", "refuse"}
+# A keyword followed by one of these is restating the options, not choosing
+_OPTION_JOINERS = {"or", "/", "?"}
+_CLAUSE_BREAK = re.compile(r"[.!?;,\n]")
+_NEXT_TOKEN = re.compile(r"\s*(\w+|[^\w\s])")
+
+class DecisionParser:
+    """
+    Incremental reader of a decision from completion text.
+
+    `feed` each piece of text as it arrives; it returns the decision once one
+    is settled: a keyword (a form of 'cooperate' or 'defect') that is not
+    negated in its clause ("I will not defect") and not restating the options
+    ("Cooperate or Defect?"). Settling needs the token after the keyword, so a
+    one-word reply settles at `finish`. `finish` reads the whole text and returns None when
+    it names neither decision or both, rather than guessing.
+    """
+    def __init__(self):
+        self.text = ""
+        self.decision: Optional[str] = None
+        self._scanned = 0
+
+    def feed(self, chunk: str) -> Optional[str]:
+        self.text += chunk
+        if self.decision is None:
+            for decision in self._votes(final=False):
+                self.decision = decision
+                break
+        return self.decision
+
+    def finish(self) -> Optional[str]:
+        if self.decision is not None:
+            return self.decision
+        self._scanned = 0
+        votes = set(self._votes(final=True))
+        return votes.pop() if len(votes) == 1 else None
+
+    def _votes(self, final: bool):
+        text = self.text
+        for match in _KEYWORD.finditer(text, self._scanned):
+            word_end = match.end()
+            while word_end < len(text) and text[word_end].isalpha():
+                word_end += 1
+            following = _NEXT_TOKEN.match(text, word_end)
+            if not final and (following is None or (following.group(1)[-1].isalnum() and following.end() == len(text))):
+                return  # Wait for the next token
+            self._scanned = match.end()
+            if following is not None and following.group(1).lower() in _OPTION_JOINERS:
+                continue
+            clause = _CLAUSE_BREAK.split(text[:match.start()])[-1]
+            if _NEGATIONS.intersection(clause.lower().split()):
+                continue
+            yield "Cooperate" if match.group(1).lower() == "cooperat" else "Defect"
+
+    @classmethod
+    def parse(cls, text: Optional[str]) -> Optional[str]:
+        parser = cls()
+        parser.text = text or ""
+        return parser.finish()
+
+def decision_request(prompt: Union[str, List[dict]], mode: str = "text") -> Tuple[List[dict], int, Dict]:
+    """
+    Messages, max_tokens and extra request options for asking `prompt` in `mode`.
+    A string prompt is sent as one system message; a message list as given.
+    Any mode instruction is added to the last message, leaving the prefix intact.
+    """
+    if mode not in DECISION_MODES:
+        raise ValueError(f"Unknown decision mode '{mode}'. Expected one of {DECISION_MODES}.")
+    messages = [{"role": "system", "content": prompt}] if isinstance(prompt, str) else list(prompt)
+    if mode == "logit_bias":
+        messages[-1] = {**messages[-1], "content": f"{messages[-1]['content']}\n{LETTER_INSTRUCTION}"}
+        return messages, 1, {"logit_bias": {str(token): 100 for token in LETTER_TOKEN_IDS.values()}}
+    if mode == "json_schema":
+        return messages, 20, {"response_format": {"type": "json_schema", "json_schema": DECISION_SCHEMA}}
+    return messages, 10, {}
+
+def read_decision(content: Optional[str], mode: str = "text") -> Optional[str]:
+    """
+    The decision in a completion requested in `mode`, or None if there is none.
+    """
+    content = (content or "").strip()
+    if mode == "logit_bias":
+        return LETTER_DECISIONS.get(content[:1].upper())
+    if mode == "json_schema":
+        try:
+            decision = json.loads(content).get("decision")
+        except (ValueError, AttributeError):
+            decision = None
+        if decision in LETTER_DECISIONS.values():
+            return decision
+    return DecisionParser.parse(content)
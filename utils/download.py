@@ -1,13 +1,54 @@
 # utils/download.py
 
-import pandas as pd
+import io
 import streamlit as st
+from utils.results_store import ResultsStore
 
-def download_results(df: pd.DataFrame):
-    csv = df.to_csv(index=False).encode('utf-8')
+def download_results(store: ResultsStore, game_id: str):
+    """
+    CSV and Parquet downloads of one stored game, exported from the results
+    store. st.download_button holds the whole file in memory either way.
+    """
+    csv = io.BytesIO()
+    store.export_csv(csv, game_id)
     st.download_button(
         label="Download Results as CSV",
-        data=csv,
+        data=csv.getvalue(),
         file_name='prisoners_dilemma_results.csv',
         mime='text/csv',
     )
+    parquet = io.BytesIO()
+    store.export_parquet(parquet, game_id)
+    st.download_button(
+        label="Download Results as Parquet",
+        data=parquet.getvalue(),
+        file_name='prisoners_dilemma_results.parquet',
+        mime='application/vnd.apache.parquet',
+    )
+
+def download_call_metrics(df: "pd.DataFrame"):
+    csv = df.to_csv(index=False).encode('utf-8')
+    st.download_button(
+        label="Download Call Metrics as CSV",
+        data=csv,
+        file_name='prisoners_dilemma_call_metrics.csv',
+        mime='text/csv',
+    )
+
+def download_model_comparison(df: "pd.DataFrame"):
+    csv = df.to_csv(index=False).encode('utf-8')
+    st.download_button(
+        label="Download Model Comparison as CSV",
+        data=csv,
+        file_name='prisoners_dilemma_model_comparison.csv',
+        mime='text/csv',
+    )
+
+def download_payoff_sweep(df: "pd.DataFrame"):
+    csv = df.to_csv(index=False).encode('utf-8')
+    st.download_button(
+        label="Download Payoff Sweep Summary as CSV",
+        data=csv,
+        file_name='prisoners_dilemma_payoff_sweep.csv',
+        mime='text/csv',
+    )
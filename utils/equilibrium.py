@@ -0,0 +1,215 @@
+# utils/equilibrium.py
+
+import functools
+import itertools
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+from utils.game_logic import OUTCOMES, dilemma_violations, validate_payoff_matrix
+from utils.tournament import CLASSIC_STRATEGIES, MemoryOneStrategy, payoff_matrix_to_array
+
+BASELINE_COLUMNS = [
+    "Strategy A", "Strategy B", "Agent A Payoff", "Agent B Payoff",
+    "Agent A Cooperation", "Agent B Cooperation", "Mutual Cooperation",
+]
+
+# B's view of each state (own move, opponent move) indexed by A's view: CD and DC swap
+_B_STATE = np.array([0, 2, 1, 3])
+
+class NashEquilibrium(NamedTuple):
+    cooperate_a: float  # Probability that Agent A cooperates
+    cooperate_b: float
+    payoff_a: float  # Expected payoffs per round
+    payoff_b: float
+
+    @property
+    def pure(self) -> bool:
+        return self.cooperate_a in (0.0, 1.0) and self.cooperate_b in (0.0, 1.0)
+
+    def describe(self) -> str:
+        if self.pure:
+            moves = ["Cooperate" if p else "Defect" for p in (self.cooperate_a, self.cooperate_b)]
+            return f"({moves[0]}, {moves[1]})"
+        return f"A cooperates w.p. {self.cooperate_a:.3f}, B w.p. {self.cooperate_b:.3f}"
+
+def nash_equilibria(payoff_matrix: dict) -> List[NashEquilibrium]:
+    """
+    Nash equilibria of the one-shot game: every pure one, then the mixed one
+    that makes each agent indifferent, when it exists and is strictly mixed.
+    With ties between an agent's payoffs (degenerate games) a continuum of
+    mixed equilibria may exist; only its pure end points are returned.
+    """
+    payoffs = payoff_matrix_to_array(payoff_matrix)  # [move_a, move_b, player], 0 = Cooperate
+    a, b = payoffs[:, :, 0], payoffs[:, :, 1]
+    equilibria = []
+    for i, j in itertools.product(range(2), repeat=2):
+        if a[i, j] >= a[1 - i, j] and b[i, j] >= b[i, 1 - j]:
+            equilibria.append(NashEquilibrium(float(i == 0), float(j == 0), float(a[i, j]), float(b[i, j])))
+    # B's cooperation probability q leaves A indifferent, and A's p leaves B indifferent
+    denominator_a = a[0, 0] - a[0, 1] - a[1, 0] + a[1, 1]
+    denominator_b = b[0, 0] - b[1, 0] - b[0, 1] + b[1, 1]
+    if denominator_a and denominator_b:
+        q = (a[1, 1] - a[0, 1]) / denominator_a
+        p = (b[1, 1] - b[1, 0]) / denominator_b
+        if 0 < p < 1 and 0 < q < 1:
+            weights = np.outer([p, 1 - p], [q, 1 - q])
+            equilibria.append(NashEquilibrium(float(p), float(q), float((weights * a).sum()), float((weights * b).sum())))
+    return equilibria
+
+def pareto_optimal_outcomes(payoff_matrix: dict) -> List[Tuple[str, str]]:
+    """
+    Outcomes no other outcome improves on for one agent without hurting the other.
+    """
+    def dominates(x, y):
+        return x[0] >= y[0] and x[1] >= y[1] and tuple(x) != tuple(y)
+    return [
+        outcome for outcome in OUTCOMES
+        if not any(dominates(payoff_matrix[other], payoff_matrix[outcome]) for other in OUTCOMES)
+    ]
+
+def markov_chain(
+    strategy_a: MemoryOneStrategy,
+    strategy_b: MemoryOneStrategy,
+    noise: float = 0.0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    First-round distribution and 4x4 transition matrix over the outcomes
+    CC, CD, DC, DD (A's move first) of two memory-one strategies. With
+    `noise`, each move is flipped with that probability, as in
+    utils.tournament.simulate_games.
+    """
+    rows = np.stack([strategy_a.as_row(), strategy_b.as_row()])
+    rows = rows * (1 - noise) + (1 - rows) * noise
+    first_a, first_b = rows[:, 0]
+    initial = np.outer([first_a, 1 - first_a], [first_b, 1 - first_b]).reshape(4)
+    cooperate_a = rows[0, 1:]
+    cooperate_b = rows[1, 1:][_B_STATE]
+    transitions = np.stack([
+        cooperate_a * cooperate_b,
+        cooperate_a * (1 - cooperate_b),
+        (1 - cooperate_a) * cooperate_b,
+        (1 - cooperate_a) * (1 - cooperate_b),
+    ], axis=1)
+    return initial, transitions
+
+def long_run_distribution(initial: np.ndarray, transitions: np.ndarray) -> np.ndarray:
+    """
+    Long-run share of rounds in each state, lim (1/n) sum_t initial M^t.
+
+    Solved exactly, also for chains that are reducible (e.g. GRIM) or
+    periodic (e.g. TFT against STFT): each closed class gets its stationary
+    distribution, weighted by the probability of ending up in it, which
+    comes from one linear solve over the transient states.
+    """
+    size = len(initial)
+    reach = (transitions > 0) | np.eye(size, dtype=bool)
+    for _ in range(size.bit_length()):
+        reach = (reach.astype(np.int64) @ reach.astype(np.int64)) > 0
+    recurrent = np.array([all(reach[j, i] for j in range(size) if reach[i, j]) for i in range(size)])
+    transient = np.flatnonzero(~recurrent)
+    classes = {tuple(np.flatnonzero(reach[i] & reach[:, i])) for i in np.flatnonzero(recurrent)}
+
+    distribution = np.zeros(size)
+    fundamental = np.eye(len(transient)) - transitions[np.ix_(transient, transient)]
+    for members in classes:
+        members = list(members)
+        # Stationary distribution within the class: pi (M - I) = 0, sum(pi) = 1
+        system = transitions[np.ix_(members, members)].T - np.eye(len(members))
+        system[-1] = 1.0
+        target = np.zeros(len(members))
+        target[-1] = 1.0
+        stationary = np.linalg.solve(system, target)
+        mass = initial[members].sum()
+        if len(transient):
+            absorbed = np.linalg.solve(fundamental, transitions[np.ix_(transient, members)].sum(axis=1))
+            mass += initial[transient] @ absorbed
+        distribution[members] = mass * stationary
+    return distribution
+
+def finite_horizon_distribution(initial: np.ndarray, transitions: np.ndarray, rounds: int) -> np.ndarray:
+    """
+    Expected share of each state over the first `rounds` rounds.
+    """
+    state = initial
+    total = np.zeros_like(initial)
+    for _ in range(rounds):
+        total += state
+        state = state @ transitions
+    return total / rounds
+
+def expected_payoffs(
+    strategy_a: MemoryOneStrategy,
+    strategy_b: MemoryOneStrategy,
+    payoff_matrix: dict,
+    rounds: Optional[int] = None,
+    noise: float = 0.0
+) -> dict:
+    """
+    Expected payoffs per round and cooperation rates of two memory-one
+    strategies: exact for a game of `rounds` rounds, or in the long run.
+    """
+    initial, transitions = markov_chain(strategy_a, strategy_b, noise)
+    if rounds:
+        distribution = finite_horizon_distribution(initial, transitions, rounds)
+    else:
+        distribution = long_run_distribution(initial, transitions)
+    payoffs = payoff_matrix_to_array(payoff_matrix).reshape(4, 2)
+    return {
+        "Agent A Payoff": float(distribution @ payoffs[:, 0]),
+        "Agent B Payoff": float(distribution @ payoffs[:, 1]),
+        "Agent A Cooperation": float(distribution[0] + distribution[1]),
+        "Agent B Cooperation": float(distribution[0] + distribution[2]),
+        "Mutual Cooperation": float(distribution[0]),
+    }
+
+def baseline_table(
+    payoff_matrix: dict,
+    strategies: Sequence[MemoryOneStrategy] = CLASSIC_STRATEGIES,
+    rounds: Optional[int] = None,
+    noise: float = 0.0
+) -> pd.DataFrame:
+    """
+    expected_payoffs of every ordered pair of `strategies`, one row per pair
+    with BASELINE_COLUMNS.
+    """
+    rows = [
+        {"Strategy A": a.name, "Strategy B": b.name, **expected_payoffs(a, b, payoff_matrix, rounds, noise)}
+        for a, b in itertools.product(strategies, repeat=2)
+    ]
+    return pd.DataFrame(rows, columns=BASELINE_COLUMNS)
+
+@dataclass(frozen=True)
+class MatrixAnalysis:
+    """
+    Everything known about a payoff matrix without playing it.
+    Shared between callers by analyze_payoff_matrix, so treat it as read-only.
+    """
+    violations: Tuple[str, ...]
+    nash_equilibria: Tuple[NashEquilibrium, ...]
+    pareto_optimal: Tuple[Tuple[str, str], ...]
+    baselines: pd.DataFrame
+
+    @property
+    def is_prisoners_dilemma(self) -> bool:
+        return not self.violations
+
+def analyze_payoff_matrix(payoff_matrix: dict, rounds: Optional[int] = None, noise: float = 0.0) -> MatrixAnalysis:
+    """
+    Dilemma check, Nash equilibria, Pareto-optimal outcomes and classic
+    strategy baselines (see baseline_table) of a payoff matrix, computed once
+    per matrix, game length and noise level and then served from memory.
+    """
+    validate_payoff_matrix(payoff_matrix)
+    key = tuple((outcome, tuple(float(x) for x in payoff_matrix[outcome])) for outcome in OUTCOMES)
+    return _analyze(key, rounds or None, float(noise))
+
+@functools.lru_cache(maxsize=256)
+def _analyze(key: Tuple, rounds: Optional[int], noise: float) -> MatrixAnalysis:
+    payoff_matrix = dict(key)
+    return MatrixAnalysis(
+        violations=tuple(dilemma_violations(payoff_matrix)),
+        nash_equilibria=tuple(nash_equilibria(payoff_matrix)),
+        pareto_optimal=tuple(pareto_optimal_outcomes(payoff_matrix)),
+        baselines=baseline_table(payoff_matrix, rounds=rounds, noise=noise),
+    )
@@ -1,39 +1,207 @@
 # utils/game_logic.py
 
+import contextvars
+import numbers
 import random
+import threading
 import streamlit as st
-from typing import List, Tuple
-from utils.gpt4 import get_gpt4_decision
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Optional, Tuple, Union
+from utils.backends import resolve_backend
+from utils.history import CompactHistory, describe_history
+from utils.instrumentation import call_context
+from utils.prompt_builder import PROMPT_STYLES, build_agent_messages
 
-def run_prisoners_dilemma_round(
-    client: "OpenAI",  # Import OpenAI from openai
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:  # Older Streamlit releases
+    add_script_run_ctx = get_script_run_ctx = None
+
+# Upper bound on agent calls in flight on the shared pool. Each round only puts
+# one call on the pool (the other runs on the caller's thread), so this is also
+# the number of games that can overlap their model calls.
+AGENT_EXECUTOR_WORKERS = 32
+
+_agent_executor = None
+_agent_executor_lock = threading.Lock()
+
+def _get_agent_executor() -> ThreadPoolExecutor:
+    global _agent_executor
+    with _agent_executor_lock:
+        if _agent_executor is None:
+            _agent_executor = ThreadPoolExecutor(
+                max_workers=AGENT_EXECUTOR_WORKERS,
+                thread_name_prefix="pd-agent"
+            )
+        return _agent_executor
+
+def _with_script_run_ctx(fn):
+    """
+    Bind the caller's Streamlit script context and context variables (such as
+    call instrumentation tags) to a function that will run on a pool thread,
+    so Streamlit calls made from it still reach the page.
+    """
+    # Background games and headless runs have no script context; don't warn about it every round
+    ctx = get_script_run_ctx(suppress_warning=True) if get_script_run_ctx else None
+    context = contextvars.copy_context()
+
+    def wrapped(*args, **kwargs):
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        return context.run(fn, *args, **kwargs)
+    return wrapped
+
+def _tagged(fn, **tags):
+    def wrapped(*args, **kwargs):
+        with call_context(**tags):
+            return fn(*args, **kwargs)
+    return wrapped
+
+def build_round_prompts(
     agent_a_history: List[str],
     agent_b_history: List[str],
     remember_history: bool,
     initial_prompt_a: str,
-    initial_prompt_b: str
-) -> Tuple[str, str]:
+    initial_prompt_b: str,
+    history_encoding: str = "full",
+    history_window: int = 10,
+    prompt_style: str = "legacy",
+    payoff_matrix: Optional[dict] = None
+) -> Tuple[Union[str, List[dict]], Union[str, List[dict]]]:
+    """
+    Build the prompts sent to Agent A and Agent B for the next round.
+    `history_encoding`/`history_window` select how the opponent's history is
+    written into the prompt (see utils.history.describe_history).
+
+    With the 'prefix_stable' `prompt_style` each prompt is a message list with
+    the initial prompt and `payoff_matrix` as a fixed prefix (see
+    utils.prompt_builder); 'legacy' prompts are single strings.
+    """
+    if prompt_style not in PROMPT_STYLES:
+        raise ValueError(f"Unknown prompt style '{prompt_style}'. Expected one of {PROMPT_STYLES}.")
+    if prompt_style == "prefix_stable":
+        if payoff_matrix is None:
+            raise ValueError("The prefix_stable prompt style needs the payoff matrix.")
+        return (
+            build_agent_messages(initial_prompt_a, payoff_matrix, "Agent A", agent_a_history, agent_b_history,
+                                 remember_history, history_encoding, history_window),
+            build_agent_messages(initial_prompt_b, payoff_matrix, "Agent B", agent_b_history, agent_a_history,
+                                 remember_history, history_encoding, history_window)
+        )
     if not agent_a_history or not remember_history:
         prompt_a = initial_prompt_a
         prompt_b = initial_prompt_b
     else:
-        prompt_a = f"Given the previous decisions of Agent B: {agent_b_history}, what should Agent A choose (Cooperate or Defect)?"
-        prompt_b = f"Given the previous decisions of Agent A: {agent_a_history}, what should Agent B choose (Cooperate or Defect)?"
+        history_b = describe_history(agent_b_history, "Agent B", history_encoding, history_window)
+        history_a = describe_history(agent_a_history, "Agent A", history_encoding, history_window)
+        prompt_a = f"Given {history_b}, what should Agent A choose (Cooperate or Defect)?"
+        prompt_b = f"Given {history_a}, what should Agent B choose (Cooperate or Defect)?"
+    return prompt_a, prompt_b
+
+# Substituted when an agent's answer is unclear; always flagged as a fallback
+FALLBACK_DECISION = "Cooperate"
+
+class RoundOutcome(NamedTuple):
+    decision_a: str
+    decision_b: str
+    fallback_a: bool = False  # True if decision_a is FALLBACK_DECISION standing in for an unclear answer
+    fallback_b: bool = False
 
-    decision_a = get_gpt4_decision(client, prompt_a)
-    decision_b = get_gpt4_decision(client, prompt_b)
+def is_valid_decision(decision) -> bool:
+    return decision in ["Cooperate", "Defect"]
 
-    # Ensure decisions are valid
-    decision_a = decision_a if decision_a in ["Cooperate", "Defect"] else "Cooperate"
-    decision_b = decision_b if decision_b in ["Cooperate", "Defect"] else "Cooperate"
+def validate_decision(decision) -> str:
+    """
+    Coerce a raw agent decision into 'Cooperate' or 'Defect'.
+    """
+    return decision if is_valid_decision(decision) else FALLBACK_DECISION
+
+def run_prisoners_dilemma_round_concurrent(
+    client: "OpenAI",  # Import OpenAI from openai
+    agent_a_history: List[str],
+    agent_b_history: List[str],
+    remember_history: bool,
+    initial_prompt_a: str,
+    initial_prompt_b: str,
+    client_b: Optional["DecisionBackend"] = None,
+    history_encoding: str = "full",
+    history_window: int = 10,
+    prompt_style: str = "legacy",
+    payoff_matrix: Optional[dict] = None
+) -> RoundOutcome:
+    """
+    Play one round with both agents' model calls in flight at the same time.
 
-    return decision_a, decision_b
+    Neither agent sees the other's decision for the current round, so Agent A's
+    request is sent from the shared agent pool while Agent B's is sent from the
+    calling thread, and the round takes one model round-trip instead of two.
 
-def randomize_payoff_matrix() -> dict:
-    coop_coop = random.randint(1, 10)
-    coop_defect = random.randint(0, 5)
-    defect_coop = random.randint(5, 10)
-    defect_defect = random.randint(0, 5)
+    `client` may be an OpenAI client or any DecisionBackend; Agent B uses
+    `client_b` when given, so LLM agents can play rule-based strategies.
+    `prompt_style` and `payoff_matrix` are passed to build_round_prompts.
+
+    An agent whose answer is unclear is assigned FALLBACK_DECISION and flagged
+    in the outcome. A backend that fails outright raises DecisionError, and
+    the round is not played, so a checkpointed game can be resumed from it.
+    """
+    backend_a = resolve_backend(client)
+    backend_b = resolve_backend(client_b) if client_b is not None else backend_a
+    prompt_a, prompt_b = build_round_prompts(
+        agent_a_history, agent_b_history, remember_history, initial_prompt_a, initial_prompt_b,
+        history_encoding, history_window, prompt_style, payoff_matrix
+    )
+
+    round_num = len(agent_a_history) + 1
+    future_a = _get_agent_executor().submit(
+        _with_script_run_ctx(_tagged(backend_a.decide, round=round_num, agent="A")),
+        prompt_a, agent_a_history, agent_b_history
+    )
+    with call_context(round=round_num, agent="B"):
+        decision_b = backend_b.decide(prompt_b, agent_b_history, agent_a_history)
+    decision_a = future_a.result()
+
+    # Ensure decisions are valid, flagging any substitutes
+    return RoundOutcome(
+        validate_decision(decision_a),
+        validate_decision(decision_b),
+        not is_valid_decision(decision_a),
+        not is_valid_decision(decision_b)
+    )
+
+def run_prisoners_dilemma_round(
+    client: "OpenAI",  # Import OpenAI from openai
+    agent_a_history: List[str],
+    agent_b_history: List[str],
+    remember_history: bool,
+    initial_prompt_a: str,
+    initial_prompt_b: str,
+    client_b: Optional["DecisionBackend"] = None,
+    history_encoding: str = "full",
+    history_window: int = 10,
+    prompt_style: str = "legacy",
+    payoff_matrix: Optional[dict] = None
+) -> Tuple[str, str]:
+    outcome = run_prisoners_dilemma_round_concurrent(
+        client,
+        agent_a_history,
+        agent_b_history,
+        remember_history,
+        initial_prompt_a,
+        initial_prompt_b,
+        client_b=client_b,
+        history_encoding=history_encoding,
+        history_window=history_window,
+        prompt_style=prompt_style,
+        payoff_matrix=payoff_matrix
+    )
+    return outcome.decision_a, outcome.decision_b
+
+def randomize_payoff_matrix(rng: Optional[random.Random] = None) -> dict:
+    rng = rng or random
+    coop_coop = rng.randint(1, 10)
+    coop_defect = rng.randint(0, 5)
+    defect_coop = rng.randint(5, 10)
+    defect_defect = rng.randint(0, 5)
     return {
         ('Cooperate', 'Cooperate'): (coop_coop, coop_coop),
         ('Cooperate', 'Defect'): (coop_defect, defect_coop),
@@ -41,10 +209,74 @@ def randomize_payoff_matrix() -> dict:
         ('Defect', 'Defect'): (defect_defect, defect_defect),
     }
 
+# The (decision A, decision B) outcomes every payoff matrix must price
+OUTCOMES = (
+    ("Cooperate", "Cooperate"), ("Cooperate", "Defect"), ("Defect", "Cooperate"), ("Defect", "Defect"),
+)
+
+def validate_payoff_matrix(payoff_matrix: dict) -> dict:
+    """
+    Raise ValueError unless every outcome has a pair of numeric payoffs.
+    """
+    for outcome in OUTCOMES:
+        payoffs = payoff_matrix.get(outcome)
+        if payoffs is None or len(payoffs) != 2 or not all(isinstance(x, numbers.Real) for x in payoffs):
+            raise ValueError(f"Payoff matrix needs a pair of numbers for {outcome}, got {payoffs!r}.")
+    return payoff_matrix
+
+def round_payoffs(payoff_matrix: dict, decision_a: str, decision_b: str) -> Tuple[float, float]:
+    """
+    The payoffs of one round; a matrix without the outcome is an error, not (0, 0).
+    """
+    try:
+        return payoff_matrix[(decision_a, decision_b)]
+    except KeyError:
+        raise ValueError(f"Payoff matrix has no payoffs for ({decision_a}, {decision_b}).") from None
+
+def pd_parameters(payoff_matrix: dict, agent: str = "Agent A") -> Tuple[float, float, float, float]:
+    """
+    `agent`'s (T, R, P, S): temptation, reward, punishment and sucker's payoff.
+    """
+    if agent == "Agent A":
+        return (
+            payoff_matrix[("Defect", "Cooperate")][0],
+            payoff_matrix[("Cooperate", "Cooperate")][0],
+            payoff_matrix[("Defect", "Defect")][0],
+            payoff_matrix[("Cooperate", "Defect")][0],
+        )
+    return (
+        payoff_matrix[("Cooperate", "Defect")][1],
+        payoff_matrix[("Cooperate", "Cooperate")][1],
+        payoff_matrix[("Defect", "Defect")][1],
+        payoff_matrix[("Defect", "Cooperate")][1],
+    )
+
+def dilemma_violations(payoff_matrix: dict) -> List[str]:
+    """
+    The Prisoner's Dilemma conditions the matrix breaks, for either agent:
+    T > R > P > S (defecting dominates, yet mutual cooperation beats mutual
+    defection) and 2R > T + S (taking turns exploiting does not pay).
+    An empty list means the matrix is a Prisoner's Dilemma.
+    """
+    violations = []
+    for agent in ("Agent A", "Agent B"):
+        temptation, reward, punishment, sucker = pd_parameters(payoff_matrix, agent)
+        checks = [
+            (temptation > reward, f"T ({temptation}) > R ({reward})"),
+            (reward > punishment, f"R ({reward}) > P ({punishment})"),
+            (punishment > sucker, f"P ({punishment}) > S ({sucker})"),
+            (2 * reward > temptation + sucker, f"2R ({2 * reward}) > T + S ({temptation + sucker})"),
+        ]
+        violations.extend(f"{agent}: needs {condition}" for holds, condition in checks if not holds)
+    return violations
+
+def is_prisoners_dilemma(payoff_matrix: dict) -> bool:
+    return not dilemma_violations(payoff_matrix)
+
 def reset_game():
-    st.session_state.agent_a_history = []
-    st.session_state.agent_b_history = []
-    st.session_state.results = []
+    st.session_state.agent_a_history = CompactHistory()
+    st.session_state.agent_b_history = CompactHistory()
+    st.session_state.game_id = None
     st.session_state.payoff_matrix = {
         ('Cooperate', 'Cooperate'): (3, 3),
         ('Cooperate', 'Defect'): (0, 5),
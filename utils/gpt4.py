@@ -1,84 +1,271 @@
 # utils/gpt4.py
 
-import openai
 import streamlit as st
 import time
 import logging
-from typing import Tuple, Optional
-from openai import OpenAI, AuthenticationError, RateLimitError, OpenAIError
+from types import SimpleNamespace
+from typing import List, Tuple, Optional, Union
+from utils.cache import ResponseCache
+from utils.decisions import DecisionParser, decision_request, read_decision
+from utils.instrumentation import get_recorder
+from utils.rate_limit import get_rate_limiter, parse_retry_after, backoff_delay
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# openai is imported inside the functions that use it: it is the slowest
+# import on the dashboard's cold start and is not needed until a model call.
 logger = logging.getLogger(__name__)
 
-def get_openai_client(api_key: str) -> OpenAI:
+class DecisionError(Exception):
+    """
+    A model call failed outright (invalid key, API error or retries used up),
+    as opposed to answering without a clear decision.
+    """
+
+# Process-wide response cache used when no cache is passed explicitly
+_response_cache: Optional[ResponseCache] = None
+
+def configure_response_cache(cache: Optional[ResponseCache]):
+    """
+    Set (or clear, with None) the cache used by default for all model calls.
+    """
+    global _response_cache
+    _response_cache = cache
+
+def _chat_completion(
+    client: "OpenAI",
+    messages: List[dict],
+    model: str,
+    max_tokens: int,
+    temperature: float,
+    cache: Optional[ResponseCache] = None,
+    call_type: str = "decision",
+    attempt: int = 1,
+    options: Optional[dict] = None,
+    parser: Optional[DecisionParser] = None
+) -> str:
+    """
+    Return the completion text for `messages`, answering from the response
+    cache when it has an entry and storing fresh responses in it.
+    Requests wait for the model's shared rate limiter, which is told about
+    every success (with the x-ratelimit-* headers) and every 429.
+    Every attempt is timed and recorded with its token usage and outcome.
+
+    `options` are extra request parameters (response_format, logit_bias).
+    With a `parser` the completion is streamed into it and the stream is
+    closed as soon as the parser has settled on a decision; the text read so
+    far is returned and the recorded latency is the time to that decision.
+    """
+    from openai import AuthenticationError, OpenAIError, RateLimitError
+    if cache is None:
+        cache = _response_cache
+    recorder = get_recorder()
+    start = time.perf_counter()
+    key = None
+    if cache is not None:
+        key = ResponseCache.make_key(model, messages, temperature, max_tokens, options)
+        cached = cache.get(key)
+        if cached is not None:
+            logger.info("Answered from response cache.")
+            recorder.record(call_type, model, attempt, "cache_hit", time.perf_counter() - start)
+            return cached
+    limiter = get_rate_limiter(model)
+    estimated_tokens = sum(len(str(message["content"])) for message in messages) // 4 + max_tokens
+    limiter.acquire(estimated_tokens)
+    start = time.perf_counter()
+    try:
+        raw = client.chat.completions.with_raw_response.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **(options or {}),
+            **({"stream": True, "stream_options": {"include_usage": True}} if parser is not None else {})
+        )
+        if parser is not None:
+            content, usage = _read_stream(raw.parse(), parser)
+            response = SimpleNamespace(usage=usage or SimpleNamespace(
+                # The stream was cut before its usage chunk; estimate instead
+                prompt_tokens=estimated_tokens - max_tokens,
+                completion_tokens=len(content.split()) or 1
+            ))
+        else:
+            response = raw.parse()
+            content = response.choices[0].message.content
+    except Exception as e:
+        if isinstance(e, RateLimitError):
+            outcome = "rate_limited"
+            limiter.on_rate_limited(parse_retry_after(getattr(e.response, "headers", None)))
+        elif isinstance(e, AuthenticationError):
+            outcome = "auth_error"
+        elif isinstance(e, OpenAIError):
+            outcome = "api_error"
+        else:
+            outcome = "error"
+        recorder.record(call_type, model, attempt, outcome, time.perf_counter() - start)
+        raise
+    recorder.record(call_type, model, attempt, "ok", time.perf_counter() - start, response.usage)
+    limiter.on_success(
+        raw.headers,
+        tokens_used=getattr(response.usage, "total_tokens", 0) or 0,
+        tokens_reserved=estimated_tokens
+    )
+    if key is not None:
+        cache.put(key, content)
+    return content
+
+def _read_stream(stream, parser: DecisionParser):
+    """
+    Feed streamed completion text to `parser` until it settles on a decision
+    or the stream ends, then close the stream. Returns (text, usage or None).
+    """
+    usage = None
+    try:
+        for chunk in stream:
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                if parser.feed(chunk.choices[0].delta.content):
+                    logger.debug("Decision settled; closing the stream early.")
+                    break
+    finally:
+        stream.close()
+    return parser.text, usage
+
+def parse_decision(content: Optional[str], decision_mode: str = "text") -> Optional[str]:
+    """
+    Map a completion text to 'Cooperate' or 'Defect', or None if it is unclear
+    (names neither, or both, decisions).
+    """
+    decision = read_decision(content, decision_mode)
+    if decision is None:
+        logger.warning(f"Unclear decision '{(content or '').strip().lower()}'.")
+    return decision
+
+def get_openai_client(api_key: str) -> "OpenAI":
     """
     Instantiate and return an OpenAI client with the provided API key.
     """
+    from openai import OpenAI
     return OpenAI(api_key=api_key)
 
-def get_gpt4_decision(client: OpenAI, prompt: str, retries: int = 3, delay: int = 2) -> Optional[str]:
+def get_gpt4_decision(
+    client: "OpenAI",
+    prompt: Union[str, List[dict]],
+    retries: int = 6,
+    delay: float = 1.0,
+    model: str = "gpt-4",
+    cache: Optional[ResponseCache] = None,
+    decision_mode: str = "text"
+) -> Optional[str]:
     """
     Send a prompt to GPT-4 and retrieve the decision ('Cooperate' or 'Defect').
-    Implements retry logic for handling rate limits and other transient errors.
+    `prompt` is a system prompt string or a full message list (see
+    utils.prompt_builder).
+    Implements retry logic for handling rate limits and other transient errors:
+    429s honor Retry-After, otherwise retries back off exponentially from
+    `delay` seconds with jitter.
+    Responses are served from `cache` (or the configured default cache) when set.
+    `decision_mode` (see utils.decisions.DECISION_MODES) chooses between a
+    free-text answer, a stream cut short once the decision is known, and
+    answers constrained by a JSON schema or by logit bias to C/D.
+    Returns None when the answer names no clear decision, so callers can mark
+    any substitute decision as a fallback, and raises DecisionError when no
+    answer could be obtained at all. Problems are logged rather than shown
+    with st.*, since this also runs in headless and background games.
     """
+    from openai import AuthenticationError, RateLimitError, OpenAIError, APIConnectionError, InternalServerError
+    messages, max_tokens, options = decision_request(prompt, decision_mode)
     for attempt in range(retries):
         try:
             logger.info(f"Attempt {attempt + 1}: Sending prompt to GPT-4.")
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": prompt}
-                ],
-                max_tokens=10,
-                temperature=0.8  # Increased for variability
+            content = _chat_completion(
+                client,
+                messages=messages,
+                model=model,
+                max_tokens=max_tokens,
+                temperature=0.8,  # Increased for variability
+                cache=cache,
+                attempt=attempt + 1,
+                options=options,
+                parser=DecisionParser() if decision_mode == "stream" else None
             )
             # Extract the content from the response
-            decision = response.choices[0].message.content.strip().lower()
-            logger.info(f"Received decision: {decision}")
-            if "cooperate" in decision:
-                return "Cooperate"
-            elif "defect" in decision:
-                return "Defect"
-            else:
-                logger.warning(f"Unclear decision '{decision}'. Defaulting to Cooperate.")
-                return "Cooperate"  # Default choice if response is unclear
-        except AuthenticationError:
+            logger.info(f"Received decision: {content.strip().lower()}")
+            return parse_decision(content, decision_mode)
+        except AuthenticationError as e:
             logger.error("AuthenticationError: Invalid OpenAI API key.")
-            st.error("Invalid OpenAI API key. Please enter a valid key.")
-            return None
-        except RateLimitError:
-            logger.warning("RateLimitError: Rate limit exceeded. Retrying...")
-            st.warning("Rate limit exceeded. Retrying...")
-            time.sleep(delay)
+            raise DecisionError("Invalid OpenAI API key.") from e
+        except RateLimitError as e:
+            # The shared limiter already pauses every caller for Retry-After
+            retry_after = parse_retry_after(getattr(e.response, "headers", None))
+            wait = retry_after if retry_after is not None else backoff_delay(attempt, delay)
+            logger.warning(f"RateLimitError: Rate limit exceeded. Retrying in {wait:.1f}s...")
+            if retry_after is None:
+                time.sleep(wait)
+        except (APIConnectionError, InternalServerError) as e:
+            wait = backoff_delay(attempt, delay)
+            logger.warning(f"{type(e).__name__}: {e}. Retrying in {wait:.1f}s...")
+            time.sleep(wait)
         except OpenAIError as e:
             logger.error(f"OpenAIError: {e}")
-            st.error(f"OpenAI API error: {e}")
-            return None
+            raise DecisionError(f"OpenAI API error: {e}") from e
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
-            st.error(f"Unexpected error: {e}")
-            return None
+            raise DecisionError(f"Unexpected error: {e}") from e
     logger.error("Failed to get a decision from GPT-4 after multiple attempts.")
-    st.error("Failed to get a decision from GPT-4 after multiple attempts.")
-    return "Cooperate"  # Default choice in case of repeated failures
+    raise DecisionError(f"No answer from {model} after {retries} attempts.")
+
+def generate_persona_prompts(
+    client: "OpenAI",
+    count: int,
+    theme: str,
+    model: str = "gpt-4",
+    batch: int = 0,
+    cache: Optional[ResponseCache] = None
+) -> List[str]:
+    """
+    Ask for `count` persona prompts drawn from `theme` (see utils.prompt_pool).
+    `batch` numbers the request so that repeated calls are not answered from
+    a replay cache. Errors are raised to the caller, which runs many of these
+    calls at once off the page.
+    """
+    from utils.prompt_pool import parse_persona_lines, persona_request_messages
+    messages = persona_request_messages(count, theme)
+    messages[-1]["content"] += f" (Batch {batch + 1}.)"
+    content = _chat_completion(
+        client,
+        messages=messages,
+        model=model,
+        max_tokens=80 * count,
+        temperature=1.0,
+        cache=cache,
+        call_type="persona_prompts"
+    )
+    return parse_persona_lines(content)
 
-def get_randomized_initial_prompts(client: OpenAI) -> Tuple[str, str]:
+def get_randomized_initial_prompts(
+    client: "OpenAI",
+    model: str = "gpt-4",
+    cache: Optional[ResponseCache] = None
+) -> Tuple[str, str]:
     """
     Generate two randomized initial prompts for Agent A and Agent B using GPT-4.
     """
+    from openai import OpenAIError
     try:
         logger.info("Generating randomized initial prompts using GPT-4.")
-        response = client.chat.completions.create(
-            model="gpt-4",
+        content = _chat_completion(
+            client,
             messages=[
                 {"role": "system", "content": "Generate two random unique scenarios for the Prisoner's Dilemma game, one for each agent. Each scenario should provide a unique role for the agent and end with the question 'Should you Cooperate or Defect?'."}
             ],
+            model=model,
             max_tokens=150,
-            temperature=0.8
+            temperature=0.8,
+            cache=cache,
+            call_type="initial_prompts"
         )
         # Extract content from the response
-        content = response.choices[0].message.content.strip()
+        content = content.strip()
         prompts = [line.strip() for line in content.split('\n') if line.strip()]
         if len(prompts) >= 2:
             prompt_a = prompts[0]
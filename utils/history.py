@@ -0,0 +1,105 @@
+# utils/history.py
+
+from collections.abc import Sequence
+from typing import Iterable
+
+HISTORY_ENCODINGS = ("full", "compact", "window", "run_length", "summary")
+
+_CODES = {"Cooperate": ord("C"), "Defect": ord("D")}
+_DECISIONS = {code: decision for decision, code in _CODES.items()}
+
+class CompactHistory(Sequence):
+    """
+    An agent's decisions stored one byte per round (b'C' / b'D').
+
+    Behaves like the list of 'Cooperate'/'Defect' strings it replaces
+    (indexing, iteration, `in`, len, and the same repr, so the 'full'
+    prompt encoding is unchanged), while `append` also maintains the
+    cooperation count and the current streak so summaries stay O(1).
+    """
+    __slots__ = ("_moves", "cooperations", "streak")
+
+    def __init__(self, decisions: Iterable[str] = ()):
+        self._moves = bytearray()
+        self.cooperations = 0
+        self.streak = 0
+        for decision in decisions:
+            self.append(decision)
+
+    def append(self, decision: str):
+        code = _CODES[decision]
+        self.streak = self.streak + 1 if self._moves and self._moves[-1] == code else 1
+        self.cooperations += code == _CODES["Cooperate"]
+        self._moves.append(code)
+
+    def __len__(self) -> int:
+        return len(self._moves)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return CompactHistory(_DECISIONS[code] for code in self._moves[index])
+        return _DECISIONS[self._moves[index]]
+
+    def __iter__(self):
+        return (_DECISIONS[code] for code in self._moves)
+
+    def __contains__(self, decision) -> bool:
+        return decision in _CODES and _CODES[decision] in self._moves
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, CompactHistory):
+            return self._moves == other._moves
+        return list(self) == list(other) if isinstance(other, (list, tuple)) else NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+    def as_string(self, last: int = None) -> str:
+        """
+        Decisions as a C/D string, oldest first, optionally only the last `last`.
+        """
+        moves = self._moves[-last:] if last else self._moves
+        return moves.decode("ascii")
+
+def _as_compact(history: Sequence[str]) -> CompactHistory:
+    return history if isinstance(history, CompactHistory) else CompactHistory(history)
+
+def _run_length(moves: str) -> str:
+    runs = []
+    for move in moves:
+        if runs and runs[-1][0] == move:
+            runs[-1][1] += 1
+        else:
+            runs.append([move, 1])
+    return " ".join(f"{count}{move}" for move, count in runs)
+
+def describe_history(history: Sequence[str], agent: str, encoding: str = "full", window: int = 10) -> str:
+    """
+    Phrase describing `agent`'s previous decisions for a round prompt.
+
+    Encodings:
+    - "full": the complete list of decision strings (the original format).
+    - "compact": the complete history as a C/D string.
+    - "window": the last `window` rounds as a C/D string.
+    - "run_length": run-length encoded C/D string, e.g. "3C 1D 2C".
+    - "summary": cooperation rate, last move and current streak only.
+    """
+    if encoding == "full":
+        return f"the previous decisions of {agent}: {history}"
+    history = _as_compact(history)
+    if encoding == "compact":
+        return f"the previous decisions of {agent} (C = Cooperate, D = Defect, oldest first): {history.as_string()}"
+    if encoding == "window":
+        shown = min(window, len(history))
+        return f"the last {shown} decisions of {agent} (C = Cooperate, D = Defect, oldest first): {history.as_string(window)}"
+    if encoding == "run_length":
+        return f"the previous decisions of {agent} as runs (C = Cooperate, D = Defect, oldest first): {_run_length(history.as_string())}"
+    if encoding == "summary":
+        rounds = len(history)
+        rate = history.cooperations / rounds if rounds else 0.0
+        last = history[-1] if rounds else "none"
+        return (
+            f"a summary of {agent}'s previous decisions: cooperated in {history.cooperations} of {rounds} rounds "
+            f"({rate:.0%}), last move {last}, {history.streak} {last} in a row"
+        )
+    raise ValueError(f"Unknown history encoding '{encoding}'. Expected one of {HISTORY_ENCODINGS}.")
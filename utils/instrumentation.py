@@ -0,0 +1,205 @@
+# utils/instrumentation.py
+
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict, field
+from typing import Dict, Optional
+
+# USD per 1K (prompt, completion) tokens; unknown models are costed at zero
+MODEL_PRICES = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+}
+
+# Batch API requests are billed at half the synchronous price
+BATCH_PRICE_FACTOR = 0.5
+
+# Prompt tokens served from the provider's prompt cache are billed at half price
+CACHED_PROMPT_PRICE_FACTOR = 0.5
+
+CALL_COLUMNS = [
+    "timestamp", "game_id", "round", "agent", "call_type", "model", "attempt", "outcome",
+    "latency_s", "prompt_tokens", "cached_tokens", "completion_tokens", "total_tokens", "cost_usd",
+]
+
+# Tags (game_id, round, agent) attached to every call made in the current context
+_call_tags: contextvars.ContextVar = contextvars.ContextVar("call_tags", default={})
+
+@contextmanager
+def call_context(**tags):
+    """
+    Tag every model call made inside the block, e.g.
+    `with call_context(game_id=..., round=3, agent="A"): ...`.
+    Nested contexts add to (and override) the outer tags.
+    """
+    token = _call_tags.set({**_call_tags.get(), **tags})
+    try:
+        yield
+    finally:
+        _call_tags.reset(token)
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, batch: bool = False, cached_tokens: int = 0) -> float:
+    """
+    USD cost of a call; `cached_tokens` of the prompt tokens are billed at the cached rate.
+    """
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        # Dated snapshots such as gpt-4-0613 are priced like their family
+        matches = [name for name in MODEL_PRICES if model.startswith(name)]
+        prices = MODEL_PRICES[max(matches, key=len)] if matches else (0.0, 0.0)
+    prompt_cost = (prompt_tokens - cached_tokens + cached_tokens * CACHED_PROMPT_PRICE_FACTOR) * prices[0]
+    cost = (prompt_cost + completion_tokens * prices[1]) / 1000
+    return cost * BATCH_PRICE_FACTOR if batch else cost
+
+@dataclass
+class CallRecord:
+    """
+    One attempt at a model call: what was called, how it ended and what it cost.
+    """
+    call_type: str
+    model: str
+    attempt: int
+    outcome: str
+    latency_s: float
+    prompt_tokens: int = 0
+    cached_tokens: int = 0  # Prompt tokens served from the provider's prompt cache
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    cost_usd: float = 0.0
+    game_id: Optional[str] = None
+    round: Optional[int] = None
+    agent: Optional[str] = None
+    timestamp: float = field(default_factory=time.time)
+
+def cached_prompt_tokens(usage) -> int:
+    """
+    Prompt tokens a response's `usage` reports as prompt cache hits.
+    """
+    details = getattr(usage, "prompt_tokens_details", None)
+    if isinstance(details, dict):  # Usage rebuilt from Batch API JSON
+        return details.get("cached_tokens") or 0
+    return getattr(details, "cached_tokens", 0) or 0
+
+class MetricsRecorder:
+    """
+    Thread-safe, bounded store of CallRecords for the whole process.
+    """
+    def __init__(self, max_records: int = 1_000_000):
+        self._records = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        call_type: str,
+        model: str,
+        attempt: int,
+        outcome: str,
+        latency_s: float,
+        usage=None
+    ) -> CallRecord:
+        """
+        Store one attempt. `usage` is a response's `usage` object, if any.
+        Game, round and agent come from the enclosing call_context.
+        """
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        cached_tokens = cached_prompt_tokens(usage)
+        tags = _call_tags.get()
+        record = CallRecord(
+            call_type=call_type,
+            model=model,
+            attempt=attempt,
+            outcome=outcome,
+            latency_s=latency_s,
+            prompt_tokens=prompt_tokens,
+            cached_tokens=cached_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+            cost_usd=estimate_cost(model, prompt_tokens, completion_tokens, call_type.startswith("batch"), cached_tokens),
+            game_id=tags.get("game_id"),
+            round=tags.get("round"),
+            agent=tags.get("agent"),
+        )
+        with self._lock:
+            self._records.append(record)
+        return record
+
+    def to_dataframe(self, game_id: Optional[str] = None) -> "pd.DataFrame":
+        with self._lock:
+            records = list(self._records)
+        if game_id is not None:
+            records = [record for record in records if record.game_id == game_id]
+        import pandas as pd
+        return pd.DataFrame([asdict(record) for record in records], columns=CALL_COLUMNS)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+_recorder = MetricsRecorder()
+
+def get_recorder() -> MetricsRecorder:
+    return _recorder
+
+def summarize_calls(calls: "pd.DataFrame") -> Dict[str, float]:
+    """
+    Headline numbers for a set of call records. Latency percentiles cover
+    calls that reached the API (cache hits are excluded).
+    """
+    api_calls = calls[calls["outcome"] != "cache_hit"]
+    latencies = api_calls["latency_s"]
+    rounds = calls[["game_id", "round"]].dropna().drop_duplicates().shape[0]
+    prompt_tokens = calls["prompt_tokens"].sum()
+    return {
+        "calls": len(calls),
+        "retries": int((calls["attempt"] > 1).sum()),
+        "rate_limited": int((calls["outcome"] == "rate_limited").sum()),
+        "errors": int(calls["outcome"].isin(["auth_error", "api_error", "error"]).sum()),
+        "cache_hits": int((calls["outcome"] == "cache_hit").sum()),
+        "p50_latency_s": float(latencies.quantile(0.5)) if len(latencies) else 0.0,
+        "p95_latency_s": float(latencies.quantile(0.95)) if len(latencies) else 0.0,
+        "prompt_tokens": int(calls["prompt_tokens"].sum()),
+        "cached_tokens": int(calls["cached_tokens"].sum()),
+        "prompt_cache_hit_rate": float(calls["cached_tokens"].sum() / prompt_tokens) if prompt_tokens else 0.0,
+        "completion_tokens": int(calls["completion_tokens"].sum()),
+        "tokens_per_round": float(calls["total_tokens"].sum() / rounds) if rounds else 0.0,
+        "cost_usd": float(calls["cost_usd"].sum()),
+    }
+
+def per_round_metrics(calls: "pd.DataFrame") -> "pd.DataFrame":
+    """
+    Per (game, round): calls, slowest call (the round's critical path when
+    agents are called concurrently), tokens, cached prompt tokens and cost.
+    """
+    return calls.dropna(subset=["round"]).groupby(["game_id", "round"]).agg(
+        calls=("outcome", "size"),
+        max_latency_s=("latency_s", "max"),
+        total_tokens=("total_tokens", "sum"),
+        cached_tokens=("cached_tokens", "sum"),
+        cost_usd=("cost_usd", "sum"),
+    ).reset_index()
+
+def per_game_metrics(calls: "pd.DataFrame") -> "pd.DataFrame":
+    """
+    Per game: rounds, calls, latency percentiles, tokens per round, the share
+    of prompt tokens served from the prompt cache and cost.
+    """
+    import pandas as pd
+    calls = calls.dropna(subset=["game_id"])
+    grouped = calls.groupby("game_id")
+    return pd.DataFrame({
+        "rounds": grouped["round"].nunique(),
+        "calls": grouped.size(),
+        "rate_limited": grouped["outcome"].apply(lambda outcomes: int((outcomes == "rate_limited").sum())),
+        "p50_latency_s": grouped["latency_s"].quantile(0.5),
+        "p95_latency_s": grouped["latency_s"].quantile(0.95),
+        "tokens_per_round": grouped["total_tokens"].sum() / grouped["round"].nunique().clip(lower=1),
+        "prompt_cache_hit_rate": (grouped["cached_tokens"].sum() / grouped["prompt_tokens"].sum().replace(0, float("nan"))).fillna(0.0),
+        "cost_usd": grouped["cost_usd"].sum(),
+    }).reset_index()
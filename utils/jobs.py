@@ -0,0 +1,221 @@
+# utils/jobs.py
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from utils.checkpoint import CheckpointStore, GameCheckpoint
+from utils.game_logic import round_payoffs, run_prisoners_dilemma_round_concurrent
+from utils.instrumentation import call_context
+from utils.results_model import IncrementalResults
+from utils.results_store import ResultsStore
+
+logger = logging.getLogger(__name__)
+
+# Games played at once; further submitted games wait in the queue
+BACKGROUND_WORKERS = 4
+
+# Job states; the first three are active
+ACTIVE_STATES = ("queued", "running", "paused")
+JOB_STATES = ACTIVE_STATES + ("completed", "cancelled", "failed")
+
+class GameJob:
+    """
+    One dashboard game played on a background thread.
+
+    Progress lives in `results` (an IncrementalResults), which the playing
+    thread appends to and `snapshot` copies for rendering. `pause` takes
+    effect between rounds; `cancel` stops the game after the round in flight
+    and leaves its checkpoint resumable.
+    """
+    def __init__(self, checkpoint: GameCheckpoint, backend_a: "DecisionBackend", backend_b: "DecisionBackend"):
+        self.checkpoint = checkpoint
+        self.game_id = checkpoint.game_id
+        self.num_rounds = checkpoint.num_rounds
+        self.backend_a = backend_a
+        self.backend_b = backend_b
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.submitted_at = time.time()
+        self.results = IncrementalResults(checkpoint.rows)
+        self._lock = threading.Lock()
+        self._running = threading.Event()
+        self._running.set()
+        self._cancelled = threading.Event()
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE_STATES
+
+    @property
+    def completed_rounds(self) -> int:
+        return len(self.results)
+
+    @property
+    def progress(self) -> float:
+        return self.completed_rounds / self.num_rounds if self.num_rounds else 0.0
+
+    def snapshot(self) -> IncrementalResults:
+        with self._lock:
+            return IncrementalResults(self.results.rows)
+
+    @property
+    def paused(self) -> bool:
+        """
+        Whether the game is held; a queued game can be held before it starts.
+        """
+        return self.active and not self._running.is_set()
+
+    def pause(self):
+        with self._lock:
+            if self.active:
+                self._running.clear()
+                # A queued game stays queued until a worker picks it up
+                if self.status == "running":
+                    self.status = "paused"
+
+    def resume(self):
+        with self._lock:
+            if self.active:
+                if self.status == "paused":
+                    self.status = "running"
+                self._running.set()
+
+    def cancel(self):
+        with self._lock:
+            self._cancelled.set()
+            self._running.set()  # Wake a paused game so it can stop
+            # A queued game has no worker yet to record the cancellation
+            if self.status == "queued":
+                self.status = "cancelled"
+
+    def _start(self) -> bool:
+        """
+        Move a queued game to running (or paused, if held meanwhile); False
+        if it was cancelled before a worker picked it up.
+        """
+        with self._lock:
+            if self._cancelled.is_set():
+                self.status = "cancelled"
+                return False
+            self.status = "running" if self._running.is_set() else "paused"
+            return True
+
+    def _wait_if_paused(self) -> bool:
+        """
+        Block while paused; True if the game should go on.
+        """
+        self._running.wait()
+        return not self._cancelled.is_set()
+
+    def _add_round(self, row):
+        with self._lock:
+            self.results.append(*row)
+
+class GameJobManager:
+    """
+    Plays dashboard games on a thread pool that outlives Streamlit script runs.
+
+    Each game commits its rounds to `checkpoints` and `store` exactly like a
+    game played in the page, so a job that is cancelled, fails or dies with
+    the server process shows up as an unfinished game and can be resumed.
+    A paused game keeps its worker thread until it is resumed or cancelled.
+    """
+    def __init__(self, store: ResultsStore, checkpoints: CheckpointStore, max_workers: int = BACKGROUND_WORKERS):
+        self.store = store
+        self.checkpoints = checkpoints
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pd-job")
+        self._jobs: Dict[str, GameJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, checkpoint: GameCheckpoint, backend_a: "DecisionBackend", backend_b: "DecisionBackend") -> GameJob:
+        with self._lock:
+            existing = self._jobs.get(checkpoint.game_id)
+            if existing is not None and existing.active:
+                raise ValueError(f"Game {checkpoint.game_id} is already running in the background.")
+            job = GameJob(checkpoint, backend_a, backend_b)
+            self._jobs[job.game_id] = job
+        self._executor.submit(self._run, job)
+        logger.info(f"Queued background game {job.game_id} ({checkpoint.completed_rounds}/{job.num_rounds} rounds done).")
+        return job
+
+    def get(self, game_id: str) -> Optional[GameJob]:
+        with self._lock:
+            return self._jobs.get(game_id)
+
+    def jobs(self) -> List[GameJob]:
+        """
+        Every job since the last `clear_finished`, newest first.
+        """
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda job: job.submitted_at, reverse=True)
+
+    def active_ids(self) -> List[str]:
+        return [job.game_id for job in self.jobs() if job.active]
+
+    def shutdown(self, wait: bool = True):
+        """
+        Stop accepting games; with `wait`, block until every submitted game
+        has finished, so paused games must be resumed or cancelled first.
+        """
+        self._executor.shutdown(wait=wait)
+
+    def clear_finished(self):
+        with self._lock:
+            self._jobs = {game_id: job for game_id, job in self._jobs.items() if job.active}
+
+    def _run(self, job: GameJob):
+        if not job._start():
+            return
+        try:
+            with call_context(game_id=job.game_id):
+                self._play(job)
+        except Exception as e:
+            logger.error(f"Background game {job.game_id} failed: {e}")
+            job.status, job.error = "failed", str(e)
+            self.checkpoints.finish_game(job.game_id, status="interrupted")
+        finally:
+            self.store.flush(job.game_id)
+
+    def _play(self, job: GameJob):
+        checkpoint = job.checkpoint
+        config = checkpoint.config
+        payoff_matrix = checkpoint.payoff_matrix
+        agent_a_history, agent_b_history = checkpoint.histories()
+        # Rounds restored from the checkpoint are rewritten with the rest of the game
+        self.store.delete(job.game_id)
+        self.store.append(job.game_id, checkpoint.rows)
+
+        for round_num in range(checkpoint.completed_rounds, job.num_rounds):
+            if not job._wait_if_paused():
+                job.status = "cancelled"
+                self.checkpoints.finish_game(job.game_id, status="interrupted")
+                logger.info(f"Background game {job.game_id} cancelled after round {round_num}.")
+                return
+            decision_a, decision_b, fallback_a, fallback_b = run_prisoners_dilemma_round_concurrent(
+                job.backend_a,
+                agent_a_history,
+                agent_b_history,
+                config["remember_history"],
+                config["initial_prompt_a"],
+                config["initial_prompt_b"],
+                client_b=job.backend_b,
+                history_encoding=config["history_encoding"],
+                history_window=config["history_window"],
+                prompt_style=config.get("prompt_style", "legacy"),
+                payoff_matrix=payoff_matrix
+            )
+            payoff_a, payoff_b = round_payoffs(payoff_matrix, decision_a, decision_b)
+            agent_a_history.append(decision_a)
+            agent_b_history.append(decision_b)
+
+            # Commit the round before starting the next one
+            row = (round_num + 1, decision_a, decision_b, payoff_a, payoff_b, fallback_a, fallback_b)
+            self.checkpoints.record_round(job.game_id, row)
+            self.store.append(job.game_id, [row])
+            job._add_round(row)
+
+        self.checkpoints.finish_game(job.game_id)
+        job.status = "completed"
+        logger.info(f"Background game {job.game_id} completed.")
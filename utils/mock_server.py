@@ -0,0 +1,502 @@
+# utils/mock_server.py
+"""
+Deterministic OpenAI-compatible stand-in for offline load tests.
+
+Serves POST /v1/chat/completions (plain or streamed as server-sent events,
+honoring logit_bias and JSON-schema response formats) with configurable
+latency, error rate and 429 injection, plus the Batch API file/poll contract (POST /v1/files,
+POST /v1/batches, GET /v1/batches/{id}, GET /v1/files/{id}/content). Decisions are derived from a hash of the seed, the model, the
+request messages and how many times that exact request has been seen, so a given
+sequence of prompts always gets the same answers regardless of timing.
+
+Run standalone with:
+    python -m utils.mock_server --port 8099 --latency 0.2 --rate-limit-rate 0.05
+"""
+
+import argparse
+import email
+import email.policy
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from utils.prompt_pool import PERSONA_REQUEST_PREFIX
+
+logger = logging.getLogger(__name__)
+
+# Reasoning appended to verbose answers, the way chatty models pad a one-word reply
+VERBOSE_REASON = " because it gives the best expected payoff given the other agent's previous moves."
+
+# Building blocks of the personas returned for persona generation requests
+PERSONA_ROLES = (
+    "a wary merchant", "a veteran diplomat", "a rookie detective", "a retired general", "a startup founder",
+    "a village elder", "a rival chess player", "a union negotiator", "a smuggler", "a research scientist",
+    "a hospital administrator", "a fishing boat captain", "a hedge fund trader", "a small-town mayor",
+    "a professional poker player", "a farmer in a drought", "a film producer", "a border guard",
+)
+PERSONA_ATTITUDES = (
+    "who trusts people until they let you down", "who expects everyone to cheat", "who values long-term alliances",
+    "who never forgives a betrayal", "who takes big risks for big rewards", "who prefers a safe, modest gain",
+    "who believes reputation is everything", "who bluffs to test opponents", "who is deeply loyal to partners",
+)
+PERSONA_STAKES = (
+    "A deal with a competitor is on the table.", "Your partner could sell you out to the authorities.",
+    "Sharing resources could save you both, or ruin you.", "A joint venture depends on both of you keeping your word.",
+    "Undercutting your rival would win you the market this season.", "Your reputation in the community is at stake.",
+)
+
+def split_tokens(content: str):
+    """
+    Rough tokens (whitespace-led words) used for max_tokens, usage and streaming.
+    """
+    return re.findall(r"\s*\S+", content)
+
+class MockLLMServer:
+    """
+    Local HTTP server speaking enough of the OpenAI API for the game loop.
+
+    - latency / latency_jitter: seconds added to every request (uniform jitter).
+    - error_rate: fraction of requests answered with HTTP 500.
+    - rate_limit_rate: fraction answered with HTTP 429 and a Retry-After header.
+    - cooperate_probability: share of 'Cooperate' answers.
+    - advertised_rpm / advertised_tpm: if set, sent as x-ratelimit-limit-*
+      headers on successful responses, like the real API.
+    - batch_delay: seconds a submitted batch reports 'in_progress' before it
+      is 'completed'. Batch requests get the same seeded answers and error
+      injection as live ones, without the per-request latency.
+    - token_latency: seconds per completion token, spent before a plain
+      response is sent or between the chunks of a streamed one.
+    - verbose_rate: fraction of free-text answers that explain themselves
+      ("I choose to defect because ..."), cut off at the request's max_tokens.
+    - model_profiles: per-model overrides of latency, latency_jitter,
+      token_latency, error_rate, rate_limit_rate, cooperate_probability and
+      verbose_rate, keyed by the request's model name, so one server can
+      stand in for several models.
+    - prompt_cache_min_tokens: like the real API's prompt caching, a request
+      whose leading messages were already sent (to the same model) reports
+      that prefix as usage.prompt_tokens_details.cached_tokens, once it is at
+      least this many tokens long (counted in steps of 128 tokens).
+    - prompt_token_latency: seconds per prompt token not served from the
+      prompt cache, so cache hits also show up as lower latency.
+
+    Requests with logit_bias are answered with 'C' or 'D', requests with a
+    JSON response format with {"decision": ...}, and persona generation
+    requests (utils.prompt_pool) with numbered personas assembled from
+    PERSONA_ROLES, PERSONA_ATTITUDES and PERSONA_STAKES.
+    """
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: float = 1.0,
+        cooperate_probability: float = 0.5,
+        seed: int = 0,
+        advertised_rpm: Optional[int] = None,
+        advertised_tpm: Optional[int] = None,
+        batch_delay: float = 0.0,
+        token_latency: float = 0.0,
+        verbose_rate: float = 0.0,
+        model_profiles: Optional[Dict[str, dict]] = None,
+        prompt_cache_min_tokens: int = 1024,
+        prompt_token_latency: float = 0.0
+    ):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.cooperate_probability = cooperate_probability
+        self.seed = seed
+        self.advertised_rpm = advertised_rpm
+        self.advertised_tpm = advertised_tpm
+        self.batch_delay = batch_delay
+        self.token_latency = token_latency
+        self.verbose_rate = verbose_rate
+        self.model_profiles = model_profiles or {}
+        self.prompt_cache_min_tokens = prompt_cache_min_tokens
+        self.prompt_token_latency = prompt_token_latency
+        self.request_count = 0
+        self.streams_closed_early = 0
+        self._seen = {}
+        self._prompt_prefixes = set()
+        self._files = {}
+        self._batches = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-llm-server", daemon=True)
+        self._thread.start()
+        logger.info(f"Mock LLM server listening on {self.url}")
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _draw(self, body: dict) -> random.Random:
+        """
+        Per-request RNG seeded from the seed, the model, the messages and the
+        occurrence count of that model and those messages.
+        """
+        request_key = json.dumps([body.get("model"), body.get("messages", [])], sort_keys=True)
+        with self._lock:
+            self.request_count += 1
+            occurrence = self._seen.get(request_key, 0)
+            self._seen[request_key] = occurrence + 1
+        digest = hashlib.sha256(f"{self.seed}|{occurrence}|{request_key}".encode("utf-8")).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def _cached_prompt_tokens(self, body: dict) -> int:
+        """
+        Tokens of the longest leading run of messages already sent to this
+        model, rounded down to 128 tokens, or 0 below prompt_cache_min_tokens.
+        Records every leading run of this request for later ones.
+        """
+        digest = hashlib.sha256(str(body.get("model")).encode("utf-8"))
+        prefixes = []
+        tokens = 0
+        for message in body.get("messages", []):
+            digest.update(json.dumps(message, sort_keys=True).encode("utf-8"))
+            tokens += len(str(message.get("content", ""))) // 4
+            prefixes.append((digest.hexdigest(), tokens))
+        with self._lock:
+            cached = max((count for key, count in prefixes if key in self._prompt_prefixes), default=0)
+            self._prompt_prefixes.update(key for key, _ in prefixes)
+        return cached // 128 * 128 if cached >= self.prompt_cache_min_tokens else 0
+
+    def chat_completion(self, body: dict, simulate_latency: bool = True):
+        """
+        Return (status, headers, payload) for a chat completion request.
+        """
+        rng = self._draw(body)
+        profile = self.model_profiles.get(body.get("model"), {})
+        latency = profile.get("latency", self.latency)
+        latency_jitter = profile.get("latency_jitter", self.latency_jitter)
+        rate_limit_rate = profile.get("rate_limit_rate", self.rate_limit_rate)
+        error_rate = profile.get("error_rate", self.error_rate)
+        delay = latency + rng.uniform(0, latency_jitter)
+        if delay > 0 and simulate_latency:
+            time.sleep(delay)
+
+        roll = rng.random()
+        if roll < rate_limit_rate:
+            error = {"error": {"message": "Rate limit reached (mock).", "type": "rate_limit_error", "code": "rate_limit_exceeded"}}
+            return 429, {"Retry-After": str(self.retry_after)}, error
+        if roll < rate_limit_rate + error_rate:
+            error = {"error": {"message": "Internal server error (mock).", "type": "server_error", "code": None}}
+            return 500, {}, error
+
+        cooperate_probability = profile.get("cooperate_probability", self.cooperate_probability)
+        decision = "Cooperate" if rng.random() < cooperate_probability else "Defect"
+        messages = body.get("messages") or [{}]
+        if str(messages[0].get("content", "")).startswith(PERSONA_REQUEST_PREFIX):
+            content = self._personas(rng, str(messages[-1].get("content", "")))
+        elif body.get("logit_bias"):
+            content = decision[0]
+        elif (body.get("response_format") or {}).get("type") in ("json_schema", "json_object"):
+            content = json.dumps({"decision": decision})
+        elif rng.random() < profile.get("verbose_rate", self.verbose_rate):
+            content = f"I choose to {decision.lower()}{VERBOSE_REASON}"
+        else:
+            content = decision
+        tokens = split_tokens(content)
+        finish_reason = "stop"
+        if body.get("max_tokens") and len(tokens) > body["max_tokens"]:
+            tokens = tokens[:body["max_tokens"]]
+            content = "".join(tokens)
+            finish_reason = "length"
+        if simulate_latency and not body.get("stream"):
+            time.sleep(profile.get("token_latency", self.token_latency) * len(tokens))
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in body.get("messages", [])) // 4 + 1
+        cached_tokens = self._cached_prompt_tokens(body)
+        if simulate_latency and self.prompt_token_latency:
+            time.sleep(self.prompt_token_latency * (prompt_tokens - cached_tokens))
+        payload = {
+            "id": f"chatcmpl-mock-{rng.getrandbits(48):012x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock-gpt-4"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": finish_reason,
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(tokens),
+                "total_tokens": prompt_tokens + len(tokens),
+                "prompt_tokens_details": {"cached_tokens": cached_tokens},
+            },
+        }
+        headers = {}
+        if self.advertised_rpm:
+            headers["x-ratelimit-limit-requests"] = str(self.advertised_rpm)
+        if self.advertised_tpm:
+            headers["x-ratelimit-limit-tokens"] = str(self.advertised_tpm)
+        return 200, headers, payload
+
+    def _personas(self, rng: random.Random, request: str) -> str:
+        match = re.search(r"(\d+) personas", request)
+        count = int(match.group(1)) if match else 5
+        return "\n".join(
+            f"{index}. You are {rng.choice(PERSONA_ROLES)} {rng.choice(PERSONA_ATTITUDES)}. "
+            f"{rng.choice(PERSONA_STAKES)} Should you Cooperate or Defect?"
+            for index in range(1, count + 1)
+        )
+
+    def stream_events(self, body: dict, payload: dict):
+        """
+        Server-sent events for a completion `payload`: a role chunk, one chunk
+        per token (token_latency apart), the finish chunk, a usage chunk if
+        requested, then [DONE].
+        """
+        token_latency = self.model_profiles.get(body.get("model"), {}).get("token_latency", self.token_latency)
+        base = {"id": payload["id"], "object": "chat.completion.chunk", "created": payload["created"], "model": payload["model"]}
+        choice = payload["choices"][0]
+        yield {**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]}
+        for token in split_tokens(choice["message"]["content"]):
+            if token_latency:
+                time.sleep(token_latency)
+            yield {**base, "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+        yield {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": choice["finish_reason"]}]}
+        if (body.get("stream_options") or {}).get("include_usage"):
+            yield {**base, "choices": [], "usage": payload["usage"]}
+
+    def upload_file(self, filename: str, purpose: str, data: bytes) -> dict:
+        file_id = f"file-mock-{uuid.uuid4().hex[:16]}"
+        file_object = {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(data),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+        with self._lock:
+            self._files[file_id] = (file_object, data)
+        return file_object
+
+    def create_batch(self, body: dict):
+        """
+        Answer every request of the batch's input file up front; the results
+        become visible once `batch_delay` has passed.
+        """
+        with self._lock:
+            stored = self._files.get(body.get("input_file_id"))
+        if stored is None:
+            return 404, {}, {"error": {"message": "No such input file.", "type": "invalid_request_error"}}
+        outputs, errors = [], []
+        lines = [json.loads(line) for line in stored[1].decode("utf-8").splitlines() if line.strip()]
+        for request in lines:
+            status, _, payload = self.chat_completion(request["body"], simulate_latency=False)
+            record = {
+                "id": f"batch_req_{uuid.uuid4().hex[:16]}",
+                "custom_id": request["custom_id"],
+                "response": {"status_code": status, "request_id": uuid.uuid4().hex, "body": payload},
+                "error": None if status == 200 else payload["error"],
+            }
+            (outputs if status == 200 else errors).append(json.dumps(record))
+
+        now = int(time.time())
+        batch = {
+            "id": f"batch_mock_{uuid.uuid4().hex[:16]}",
+            "object": "batch",
+            "endpoint": body.get("endpoint"),
+            "errors": None,
+            "input_file_id": body["input_file_id"],
+            "completion_window": body.get("completion_window", "24h"),
+            "status": "in_progress",
+            "output_file_id": None,
+            "error_file_id": None,
+            "created_at": now,
+            "in_progress_at": now,
+            "expires_at": now + 86400,
+            "completed_at": None,
+            "request_counts": {"total": len(lines), "completed": len(outputs), "failed": len(errors)},
+            "metadata": body.get("metadata"),
+        }
+        pending = {
+            "output_file_id": self.upload_file("output.jsonl", "batch_output", "\n".join(outputs).encode("utf-8"))["id"] if outputs else None,
+            "error_file_id": self.upload_file("errors.jsonl", "batch_output", "\n".join(errors).encode("utf-8"))["id"] if errors else None,
+        }
+        with self._lock:
+            self._batches[batch["id"]] = (batch, pending, time.monotonic() + self.batch_delay)
+        return 200, {}, batch
+
+    def retrieve_batch(self, batch_id: str):
+        with self._lock:
+            stored = self._batches.get(batch_id)
+        if stored is None:
+            return 404, {}, {"error": {"message": "No such batch.", "type": "invalid_request_error"}}
+        batch, pending, ready_at = stored
+        if batch["status"] == "in_progress" and time.monotonic() >= ready_at:
+            batch.update(pending, status="completed", completed_at=int(time.time()))
+        return 200, {}, batch
+
+    def file_content(self, file_id: str) -> Optional[bytes]:
+        with self._lock:
+            stored = self._files.get(file_id)
+        return stored[1] if stored else None
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length)
+                path = self.path.rstrip("/")
+                if path.endswith("/files"):
+                    return self._send(200, {}, self._upload(raw))
+                try:
+                    body = json.loads(raw or b"{}")
+                except json.JSONDecodeError:
+                    return self._send(400, {}, {"error": {"message": "Invalid JSON body.", "type": "invalid_request_error"}})
+                if path.endswith("/chat/completions"):
+                    status, headers, payload = server.chat_completion(body)
+                    if status == 200 and body.get("stream"):
+                        return self._stream(headers, server.stream_events(body, payload))
+                    return self._send(status, headers, payload)
+                if path.endswith("/batches"):
+                    return self._send(*server.create_batch(body))
+                self._not_found()
+
+            def do_GET(self):
+                parts = self.path.rstrip("/").split("/")
+                if len(parts) >= 2 and parts[-2] == "batches":
+                    return self._send(*server.retrieve_batch(parts[-1]))
+                if len(parts) >= 3 and parts[-3] == "files" and parts[-1] == "content":
+                    data = server.file_content(parts[-2])
+                    if data is not None:
+                        self.send_response(200)
+                        self.send_header("Content-Type", "application/octet-stream")
+                        self.send_header("Content-Length", str(len(data)))
+                        self.end_headers()
+                        self.wfile.write(data)
+                        return
+                self._not_found()
+
+            def _upload(self, raw: bytes) -> dict:
+                # Multipart form with a 'file' part and a 'purpose' field
+                message = email.message_from_bytes(
+                    b"Content-Type: " + self.headers["Content-Type"].encode("latin-1") + b"\r\n\r\n" + raw,
+                    policy=email.policy.HTTP
+                )
+                fields = {}
+                for part in message.iter_parts():
+                    fields[part.get_param("name", header="content-disposition")] = (
+                        part.get_filename(), part.get_payload(decode=True)
+                    )
+                filename, data = fields.get("file", ("upload.jsonl", b""))
+                purpose = (fields.get("purpose", (None, b""))[1] or b"").decode("utf-8")
+                return server.upload_file(filename or "upload.jsonl", purpose, data or b"")
+
+            def _not_found(self):
+                self._send(404, {}, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+
+            def _stream(self, headers, events):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                try:
+                    for event in events:
+                        self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                        self.wfile.flush()
+                    self.wfile.write(b"data: [DONE]\n\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    with server._lock:
+                        server.streams_closed_early += 1
+
+            def _send(self, status, headers, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        return Handler
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the mock OpenAI-compatible server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.0, help="Base latency per request in seconds.")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="Extra uniform latency in seconds.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429.")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s.")
+    parser.add_argument("--cooperate-probability", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-delay", type=float, default=0.0,
+                        help="Seconds a submitted batch stays in progress.")
+    parser.add_argument("--token-latency", type=float, default=0.0,
+                        help="Seconds per completion token (between chunks when streaming).")
+    parser.add_argument("--verbose-rate", type=float, default=0.0,
+                        help="Fraction of free-text answers padded with an explanation.")
+    parser.add_argument("--model-profiles", type=json.loads, default=None,
+                        help='JSON object of per-model overrides, e.g. \'{"fast-model": {"latency": 0.05, "cooperate_probability": 0.9}}\'.')
+    parser.add_argument("--prompt-cache-min-tokens", type=int, default=1024,
+                        help="Shortest repeated message prefix reported as cached prompt tokens.")
+    parser.add_argument("--prompt-token-latency", type=float, default=0.0,
+                        help="Seconds per prompt token not served from the prompt cache.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    server = MockLLMServer(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        cooperate_probability=args.cooperate_probability,
+        seed=args.seed,
+        batch_delay=args.batch_delay,
+        token_latency=args.token_latency,
+        verbose_rate=args.verbose_rate,
+        model_profiles=args.model_profiles,
+        prompt_cache_min_tokens=args.prompt_cache_min_tokens,
+        prompt_token_latency=args.prompt_token_latency
+    )
+    server.start()
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+# utils/model_comparison.py
+
+import logging
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence, Tuple
+from utils.backends import DecisionBackend, OpenAIBackend
+from utils.batch_runner import EXPERIMENT_COLUMNS, ExperimentSpec, experiment_row_prefix, make_game_id, run_game
+from utils.cache import ResponseCache
+from utils.checkpoint import CheckpointStore
+from utils.decisions import DECISION_MODES
+from utils.instrumentation import summarize_calls
+from utils.rate_limit import configure_rate_limits
+from config import RESULT_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# A comparison's results rows: the model, then the usual batch-runner columns
+COMPARISON_COLUMNS = ["Model"] + EXPERIMENT_COLUMNS + RESULT_COLUMNS
+
+@dataclass(frozen=True)
+class ModelSpec:
+    """
+    One model in a comparison: the model name sent to the API, an optional
+    OpenAI-compatible base URL (a local server or another provider) with its
+    API key, and the model's own game worker pool and rate-limit budget.
+
+    Rate limiters are per model name, so two entries naming the same model
+    share one budget.
+    """
+    model: str
+    base_url: Optional[str] = None
+    api_key: Optional[str] = None
+    max_workers: int = 4
+    requests_per_minute: Optional[float] = None
+    tokens_per_minute: Optional[float] = None
+    decision_mode: str = "text"
+
+    @property
+    def name(self) -> str:
+        name = f"{self.model} @ {self.base_url}" if self.base_url else self.model
+        return name if self.decision_mode == "text" else f"{name} [{self.decision_mode}]"
+
+_SPEC_OPTIONS = {
+    "workers": ("max_workers", int),
+    "rpm": ("requests_per_minute", float),
+    "tpm": ("tokens_per_minute", float),
+    "key": ("api_key", str),
+    "mode": ("decision_mode", str),
+}
+
+def parse_model_spec(text: str, max_workers: int = 4, decision_mode: str = "text") -> ModelSpec:
+    """
+    Parse 'MODEL[@BASE_URL][,workers=N][,rpm=N][,tpm=N][,key=KEY][,mode=MODE]',
+    e.g. 'gpt-4o-mini,rpm=500' or 'llama3@http://localhost:11434/v1,workers=2'.
+    """
+    head, *options = [part.strip() for part in text.split(",")]
+    model, _, base_url = head.partition("@")
+    if not model:
+        raise ValueError(f"No model name in '{text}'.")
+    fields = {"model": model, "base_url": base_url or None, "max_workers": max_workers, "decision_mode": decision_mode}
+    for option in options:
+        key, _, value = option.partition("=")
+        if key not in _SPEC_OPTIONS or not value:
+            raise ValueError(f"Unknown model option '{option}' in '{text}'. Expected one of {list(_SPEC_OPTIONS)}.")
+        field_name, convert = _SPEC_OPTIONS[key]
+        fields[field_name] = convert(value)
+    if fields["decision_mode"] not in DECISION_MODES:
+        raise ValueError(f"Unknown decision mode '{fields['decision_mode']}' in '{text}'. Expected one of {DECISION_MODES}.")
+    return ModelSpec(**fields)
+
+def create_model_backend(model: ModelSpec, client: Optional["OpenAI"] = None, cache: Optional[ResponseCache] = None) -> OpenAIBackend:
+    """
+    Backend for `model`: through `client` for OpenAI models, or through a
+    client of its own for models served at a base URL. Clients built here have
+    their retries disabled so that errors and 429s reach get_gpt4_decision.
+    """
+    if model.base_url is None:
+        if client is None:
+            raise ValueError(f"An OpenAI client is needed for model '{model.model}'.")
+        return OpenAIBackend(client, model=model.model, cache=cache, decision_mode=model.decision_mode)
+    from openai import OpenAI
+    backend = OpenAIBackend(
+        OpenAI(api_key=model.api_key or "none", base_url=model.base_url, max_retries=0),
+        model=model.model,
+        cache=cache,
+        decision_mode=model.decision_mode
+    )
+    backend.name = model.name
+    return backend
+
+def comparison_game_id(model: ModelSpec, spec: ExperimentSpec, repetition: int) -> str:
+    return f"{model.name}|{make_game_id(spec, repetition)}"
+
+def run_model_comparison(
+    models: Sequence[ModelSpec],
+    specs: List[ExperimentSpec],
+    client: Optional["OpenAI"] = None,
+    opponent: Optional[DecisionBackend] = None,
+    on_game_complete: Optional[Callable[[ModelSpec, ExperimentSpec, int, List[Tuple]], None]] = None,
+    checkpoints: Optional[CheckpointStore] = None
+) -> pd.DataFrame:
+    """
+    Play every repetition of every spec with each model, all models at once.
+
+    Each model has its own pool of `max_workers` game threads and its own rate
+    limiter (capped at its `requests_per_minute`/`tokens_per_minute`), so a
+    slow or throttled model does not hold back the others. Agent B is played
+    by the same model unless `opponent` is given. Model calls are recorded
+    under comparison_game_id, so latency and tokens can be split by model.
+
+    Returns one DataFrame with COMPARISON_COLUMNS, sorted so that the same
+    experiment, repetition and round line up across models.
+    """
+    names = [model.name for model in models]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Each model may only be listed once: {names}.")
+    backends = []
+    for model in models:
+        if model.requests_per_minute or model.tokens_per_minute:
+            configure_rate_limits(model.model, requests_per_minute=model.requests_per_minute, tokens_per_minute=model.tokens_per_minute)
+        backends.append(create_model_backend(model, client))
+    jobs = [(spec, repetition) for spec in specs for repetition in range(1, spec.repetitions + 1)]
+    logger.info(f"Comparing {len(models)} models on {len(jobs)} games each.")
+
+    executors = [
+        ThreadPoolExecutor(max_workers=model.max_workers, thread_name_prefix=f"pd-model{index}")
+        for index, model in enumerate(models)
+    ]
+    rows = []
+    try:
+        futures = {}
+        for model, backend, executor in zip(models, backends, executors):
+            for spec, repetition in jobs:
+                game_id = comparison_game_id(model, spec, repetition)
+                future = executor.submit(run_game, backend, spec, opponent, game_id, checkpoints)
+                futures[future] = (model, spec, repetition)
+        for done, future in enumerate(as_completed(futures), start=1):
+            model, spec, repetition = futures[future]
+            try:
+                results = future.result()
+            except Exception as e:
+                logger.error(f"Game {spec.experiment_id} #{repetition} with {model.name} failed: {e}")
+                continue
+            prefix = (model.name,) + experiment_row_prefix(spec, repetition)
+            rows.extend(prefix + row for row in results)
+            logger.info(f"Finished game {done}/{len(futures)}: {model.name} {spec.experiment_id} #{repetition}")
+            if on_game_complete:
+                on_game_complete(model, spec, repetition, results)
+    finally:
+        for executor in executors:
+            executor.shutdown()
+
+    df = pd.DataFrame(rows, columns=COMPARISON_COLUMNS)
+    return df.sort_values(["Experiment ID", "Repetition", "Round", "Model"], ignore_index=True)
+
+def _game_statistics(df: pd.DataFrame) -> pd.DataFrame:
+    cooperate_a = df["Agent A Decision"] == "Cooperate"
+    cooperate_b = df["Agent B Decision"] == "Cooperate"
+    return df.assign(
+        cooperate_a=cooperate_a,
+        cooperate_b=cooperate_b,
+        mutual_cooperation=cooperate_a & cooperate_b,
+        fallback=df["Agent A Fallback"] | df["Agent B Fallback"],
+    )
+
+_STATISTICS = {
+    "Cooperation A": ("cooperate_a", "mean"),
+    "Cooperation B": ("cooperate_b", "mean"),
+    "Mutual Cooperation": ("mutual_cooperation", "mean"),
+    "Mean Payoff A": ("Agent A Payoff", "mean"),
+    "Mean Payoff B": ("Agent B Payoff", "mean"),
+    "Fallback Rate": ("fallback", "mean"),
+}
+
+def compare_models(df: pd.DataFrame, by: Sequence[str] = ("Experiment ID",)) -> pd.DataFrame:
+    """
+    Cooperation and payoff statistics side by side: one row per group of
+    `by`, one column per (statistic, model).
+    """
+    stats = _game_statistics(df).groupby(list(by) + ["Model"], dropna=False).agg(**_STATISTICS)
+    return stats.unstack("Model")
+
+def model_summary(df: pd.DataFrame, calls: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    One row per model: overall cooperation and payoffs, plus latency, token
+    and cost figures from the model's call records when `calls` is given.
+    """
+    summary = _game_statistics(df).groupby("Model").agg(**_STATISTICS)
+    summary.insert(0, "Games", df.drop_duplicates(["Model", "Experiment ID", "Repetition"]).groupby("Model").size())
+    if calls is not None and len(calls):
+        calls = calls.dropna(subset=["game_id"])
+        calls = calls.assign(Model=calls["game_id"].str.split("|", n=1).str[0])
+        metrics = {
+            model: summarize_calls(model_calls)
+            for model, model_calls in calls[calls["Model"].isin(summary.index)].groupby("Model")
+        }
+        if metrics:
+            columns = ["calls", "rate_limited", "errors", "p50_latency_s", "p95_latency_s", "tokens_per_round", "prompt_cache_hit_rate", "cost_usd"]
+            summary = summary.join(pd.DataFrame.from_dict(metrics, orient="index")[columns])
+    return summary.reset_index()
@@ -0,0 +1,202 @@
+# utils/payoff_sweep.py
+
+import itertools
+import logging
+import math
+import random
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from utils.batch_runner import EXPERIMENT_COLUMNS, ExperimentSpec, experiment_row_prefix, make_game_id, run_game
+from utils.checkpoint import CheckpointStore
+from utils.rate_limit import configure_rate_limits
+from utils.game_logic import is_prisoners_dilemma, pd_parameters, randomize_payoff_matrix
+from config import RESULT_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+SWEEP_COLUMNS = [
+    "Experiment ID", "Payoff Matrix", "T", "R", "P", "S", "Games",
+    "Cooperation Rate", "Cooperation CI Low", "Cooperation CI High",
+    "Mean Payoff", "Payoff CI Low", "Payoff CI High", "Converged",
+]
+
+def matrix_name(payoff_matrix: dict) -> str:
+    return "T{:g} R{:g} P{:g} S{:g}".format(*pd_parameters(payoff_matrix))
+
+def sample_payoff_matrices(n: int, seed: Optional[int] = None, pd_only: bool = True, max_draws: int = 100_000) -> Dict[str, dict]:
+    """
+    `n` distinct matrices from randomize_payoff_matrix, keyed by matrix_name;
+    with `pd_only`, draws that are not a Prisoner's Dilemma are rejected.
+    """
+    rng = random.Random(seed)
+    matrices = {}
+    for _ in range(max_draws):
+        if len(matrices) == n:
+            break
+        matrix = randomize_payoff_matrix(rng)
+        if not pd_only or is_prisoners_dilemma(matrix):
+            matrices.setdefault(matrix_name(matrix), matrix)
+    if len(matrices) < n:
+        logger.warning(f"Only {len(matrices)} distinct payoff matrices found in {max_draws} draws.")
+    return matrices
+
+def payoff_grid(
+    temptations: Iterable[float],
+    rewards: Iterable[float],
+    punishments: Iterable[float],
+    suckers: Iterable[float]
+) -> Dict[str, dict]:
+    """
+    Every symmetric matrix over the given T, R, P, S values that is a
+    Prisoner's Dilemma, keyed by matrix_name.
+    """
+    matrices = {}
+    for temptation, reward, punishment, sucker in itertools.product(temptations, rewards, punishments, suckers):
+        matrix = {
+            ("Cooperate", "Cooperate"): (reward, reward),
+            ("Cooperate", "Defect"): (sucker, temptation),
+            ("Defect", "Cooperate"): (temptation, sucker),
+            ("Defect", "Defect"): (punishment, punishment),
+        }
+        if is_prisoners_dilemma(matrix):
+            matrices[matrix_name(matrix)] = matrix
+    return matrices
+
+def bootstrap_ci(
+    samples: Sequence[Sequence[float]],
+    n_boot: int = 2000,
+    confidence: float = 0.95,
+    seed: Optional[int] = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Mean and percentile-bootstrap interval of each sample set, all at once.
+
+    The sets are packed into one zero-padded (sets, games) array and every
+    resample of every set is drawn as one (sets, n_boot, games) index array,
+    so there is no Python loop over sets or resamples. Empty sets get NaN.
+    """
+    counts = np.array([len(values) for values in samples])
+    width = max(counts.max(initial=0), 1)
+    packed = np.zeros((len(samples), width))
+    for row, values in enumerate(samples):
+        packed[row, :len(values)] = values
+    rng = np.random.default_rng(seed)
+    picks = (rng.random((len(samples), n_boot, width)) * counts[:, None, None]).astype(np.int64)
+    resampled = np.take_along_axis(packed[:, None, :], picks, axis=2)
+    in_sample = np.arange(width) < counts[:, None, None]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        boot_means = (resampled * in_sample).sum(axis=2) / counts[:, None]
+        means = packed.sum(axis=1) / counts
+    tail = (1 - confidence) / 2
+    lows, highs = np.quantile(boot_means, [tail, 1 - tail], axis=1)
+    return means, lows, highs
+
+def game_statistics(rows: Sequence[Tuple]) -> Tuple[float, float]:
+    """
+    A game's cooperation rate (both agents) and mean payoff per agent and round.
+    """
+    cooperations = sum((row[1] == "Cooperate") + (row[2] == "Cooperate") for row in rows)
+    payoffs = sum(row[3] + row[4] for row in rows)
+    return cooperations / (2 * len(rows)), payoffs / (2 * len(rows))
+
+def _games_wanted(games: int, width: float, ci_width: float, batch_games: int, budget_left: int) -> int:
+    # Interval width shrinks like 1/sqrt(games): project the games the target
+    # needs and take up to batch_games of them this wave
+    if games == 0 or np.isnan(width) or ci_width <= 0:
+        return min(batch_games, budget_left)
+    needed = math.ceil(games * (width / ci_width) ** 2) - games
+    return max(1, min(batch_games, needed, budget_left))
+
+def run_payoff_sweep(
+    client: "OpenAI",
+    specs: List[ExperimentSpec],
+    min_games: int = 4,
+    batch_games: int = 4,
+    ci_width: float = 0.1,
+    confidence: float = 0.95,
+    n_boot: int = 2000,
+    max_workers: int = 4,
+    requests_per_minute: Optional[float] = None,
+    tokens_per_minute: Optional[float] = None,
+    client_b: Optional["DecisionBackend"] = None,
+    checkpoints: Optional[CheckpointStore] = None,
+    on_game_complete: Optional[Callable[[ExperimentSpec, int, List[Tuple]], None]] = None,
+    seed: Optional[int] = None
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Play each spec (typically one per payoff matrix) until the bootstrap
+    interval of its cooperation rate is at most `ci_width` wide, or its
+    `repetitions` (the game budget per spec) are used up.
+
+    Games are played in waves on `max_workers` threads: `min_games` per spec
+    first, then each spec whose interval is still too wide gets up to
+    `batch_games` more, as many as its current width projects it needs, so
+    the budget goes to the specs with the most variance. Intervals for all
+    specs are recomputed together after every wave (see bootstrap_ci).
+
+    Returns the results rows (EXPERIMENT_COLUMNS + RESULT_COLUMNS, like
+    batch_runner.run_experiments) and a summary with SWEEP_COLUMNS. Raises
+    ValueError for an empty `specs` list.
+    """
+    if not specs:
+        raise ValueError("A payoff sweep needs at least one spec (e.g. a payoff grid with a Prisoner's Dilemma in it).")
+    # (repetition, game_statistics or None if the game failed) per spec
+    games: Dict[str, List[Tuple]] = {spec.experiment_id: [] for spec in specs}
+    rows = []
+    if len(games) != len(specs):
+        raise ValueError("Each spec in a payoff sweep needs its own experiment ID.")
+    if requests_per_minute or tokens_per_minute:
+        configure_rate_limits(requests_per_minute=requests_per_minute, tokens_per_minute=tokens_per_minute)
+    pending = {spec.experiment_id: min(min_games, spec.repetitions) for spec in specs}
+    wave = 0
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pd-sweep") as executor:
+        while pending:
+            wave += 1
+            jobs = {}
+            for spec in specs:
+                played = len(games[spec.experiment_id])
+                for repetition in range(played + 1, played + pending.get(spec.experiment_id, 0) + 1):
+                    game_id = make_game_id(spec, repetition)
+                    jobs[executor.submit(run_game, client, spec, client_b, game_id, checkpoints)] = (spec, repetition)
+            for future in as_completed(jobs):
+                spec, repetition = jobs[future]
+                try:
+                    results = future.result()
+                except Exception as e:
+                    logger.error(f"Game {spec.experiment_id} #{repetition} failed: {e}")
+                    results = []
+                # A failed game still uses its repetition, so the budget is respected
+                games[spec.experiment_id].append((repetition, game_statistics(results) if results else None))
+                if results:
+                    rows.extend(experiment_row_prefix(spec, repetition) + row for row in results)
+                    if on_game_complete:
+                        on_game_complete(spec, repetition, results)
+
+            summary = _summarize(specs, games, n_boot, confidence, ci_width, seed)
+            pending = {}
+            widths = summary["Cooperation CI High"] - summary["Cooperation CI Low"]
+            for spec, width, played in zip(specs, widths, summary["Games"]):
+                budget_left = spec.repetitions - len(games[spec.experiment_id])
+                # A NaN width (no game finished yet) counts as too wide
+                if budget_left > 0 and not width <= ci_width:
+                    pending[spec.experiment_id] = _games_wanted(played, width, ci_width, batch_games, budget_left)
+            logger.info(f"Sweep wave {wave}: {int(summary['Converged'].sum())}/{len(specs)} specs within ±{ci_width / 2:g}.")
+
+    df = pd.DataFrame(rows, columns=EXPERIMENT_COLUMNS + RESULT_COLUMNS)
+    return df.sort_values(["Experiment ID", "Repetition", "Round"], ignore_index=True), summary
+
+def _summarize(specs, games, n_boot, confidence, ci_width, seed) -> pd.DataFrame:
+    statistics = [[stats for _, stats in games[spec.experiment_id] if stats is not None] for spec in specs]
+    cooperation = bootstrap_ci([[coop for coop, _ in stats] for stats in statistics], n_boot, confidence, seed)
+    payoff = bootstrap_ci([[mean for _, mean in stats] for stats in statistics], n_boot, confidence, seed)
+    summary = pd.DataFrame(
+        [(spec.experiment_id, spec.payoff_name) + pd_parameters(spec.payoff_matrix) for spec in specs],
+        columns=SWEEP_COLUMNS[:6]
+    )
+    summary["Games"] = [len(stats) for stats in statistics]
+    summary["Cooperation Rate"], summary["Cooperation CI Low"], summary["Cooperation CI High"] = cooperation
+    summary["Mean Payoff"], summary["Payoff CI Low"], summary["Payoff CI High"] = payoff
+    summary["Converged"] = (summary["Cooperation CI High"] - summary["Cooperation CI Low"]) <= ci_width
+    return summary
@@ -0,0 +1,414 @@
+# utils/population.py
+
+import logging
+import math
+import random
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+from utils.backends import DecisionBackend
+from utils.batch_runner import ExperimentSpec, run_game
+from utils.tournament import (
+    CLASSIC_STRATEGIES, MOVES, MemoryOneStrategy, payoff_matrix_to_array, score_games, simulate_games
+)
+from config import PAYOFF_PRESETS, DEFAULT_INITIAL_PROMPT_A, DEFAULT_INITIAL_PROMPT_B
+
+logger = logging.getLogger(__name__)
+
+TOPOLOGIES = ("well_mixed", "grid")
+GAMES = ("pairwise", "public_goods")
+UPDATE_RULES = ("replicator", "moran")
+NEIGHBOURHOODS = ("von_neumann", "moore")
+LLM_STRATEGY = "LLM"
+
+def resolve_payoff_matrix(payoff_matrix: Union[str, dict]) -> dict:
+    """
+    Accept a payoff dict or the name of one of PAYOFF_PRESETS.
+    """
+    if isinstance(payoff_matrix, str):
+        if payoff_matrix not in PAYOFF_PRESETS:
+            raise ValueError(f"Unknown payoff preset '{payoff_matrix}'. Expected one of {list(PAYOFF_PRESETS)}.")
+        return PAYOFF_PRESETS[payoff_matrix]
+    return payoff_matrix
+
+def well_mixed_pairs(size: int, matches_per_agent: int, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sparse random schedule: each pass pairs the population off along a random
+    permutation, so every agent plays about `matches_per_agent` matches and
+    the schedule has O(size * matches_per_agent) entries instead of O(size^2).
+    """
+    passes = [rng.permutation(size) for _ in range(matches_per_agent)]
+    half = size // 2
+    idx_a = np.concatenate([order[:half] for order in passes])
+    idx_b = np.concatenate([order[half:2 * half] for order in passes])
+    return idx_a, idx_b
+
+def grid_neighbours(side: int, neighbourhood: str = "von_neumann") -> np.ndarray:
+    """
+    (side * side, k) indices of each cell's neighbours on a torus.
+    """
+    if neighbourhood not in NEIGHBOURHOODS:
+        raise ValueError(f"Unknown neighbourhood '{neighbourhood}'. Expected one of {NEIGHBOURHOODS}.")
+    offsets = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+    if neighbourhood == "moore":
+        offsets += [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+    rows, cols = np.divmod(np.arange(side * side), side)
+    return np.stack([((rows + dr) % side) * side + (cols + dc) % side for dr, dc in offsets], axis=1)
+
+def grid_pairs(side: int, neighbourhood: str = "von_neumann") -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Every edge of the torus grid exactly once.
+    """
+    neighbours = grid_neighbours(side, neighbourhood)
+    # Offsets come in opposite pairs; the first of each pair covers every edge once
+    half = neighbours[:, [0, 1] + ([4, 5] if neighbourhood == "moore" else [])]
+    return np.repeat(np.arange(side * side), half.shape[1]), half.reshape(-1)
+
+def simulate_public_goods(
+    strategies: np.ndarray,
+    num_rounds: int,
+    multiplier: float = 3.0,
+    cost: float = 1.0,
+    seed: Optional[int] = None,
+    noise: float = 0.0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Play G public-goods groups of g members at once.
+
+    `strategies` is (G, g, 5) memory-one rows. Each round cooperators pay
+    `cost` into a pot that is multiplied by `multiplier` and shared by the
+    whole group. A member's memory-one state pairs its own last move with
+    whether most of the rest of its group cooperated. Returns the (G, g)
+    total payoffs and cooperation counts.
+    """
+    rng = np.random.default_rng(seed)
+    num_groups, group_size = strategies.shape[:2]
+    payoffs = np.zeros((num_groups, group_size))
+    cooperations = np.zeros((num_groups, group_size), dtype=np.int64)
+    prob = strategies[:, :, 0]
+    for _ in range(num_rounds):
+        defect = rng.random((num_groups, group_size)) >= prob
+        if noise:
+            defect ^= rng.random((num_groups, group_size)) < noise
+        cooperate = ~defect
+        contributors = cooperate.sum(axis=1, keepdims=True)
+        payoffs += multiplier * cost * contributors / group_size - cost * cooperate
+        cooperations += cooperate
+        others_defect = (contributors - cooperate) * 2 < group_size - 1
+        state = defect * 2 + others_defect
+        prob = np.take_along_axis(strategies, (state + 1)[:, :, None], axis=2)[:, :, 0]
+    return payoffs, cooperations
+
+def _pairwise_chunk(args) -> np.ndarray:
+    strategies_a, strategies_b, num_rounds, seed, noise = args
+    return simulate_games(strategies_a, strategies_b, num_rounds, seed=seed, noise=noise)["outcome_counts"]
+
+def _public_goods_chunk(args) -> Tuple[np.ndarray, np.ndarray]:
+    strategies, num_rounds, multiplier, seed, noise = args
+    return simulate_public_goods(strategies, num_rounds, multiplier=multiplier, seed=seed, noise=noise)
+
+class MemoryOneBackend(DecisionBackend):
+    """
+    Plays a MemoryOneStrategy through the DecisionBackend interface, so it can
+    face LLM agents in ordinary prompt-driven games.
+    """
+    def __init__(self, strategy: MemoryOneStrategy, seed: Optional[int] = None):
+        self.strategy = strategy
+        self.name = strategy.name
+        self._rng = random.Random(seed)
+
+    def decide(self, prompt, own_history, opponent_history):
+        if not len(own_history):
+            probability = self.strategy.first
+        else:
+            state = MOVES.index(own_history[-1]) * 2 + MOVES.index(opponent_history[-1])
+            probability = self.strategy.p[state]
+        return "Cooperate" if self._rng.random() < probability else "Defect"
+
+class PopulationSimulation:
+    """
+    Evolutionary dynamics of a population of memory-one strategies.
+
+    - topology: "well_mixed" (random sparse pairings every generation) or
+      "grid" (a torus of side sqrt(size); agents meet their neighbours).
+    - game: "pairwise" Prisoner's Dilemma matches under `payoff_matrix` (a dict
+      or a PAYOFF_PRESETS name), or "public_goods" groups of `group_size`
+      (on the grid, every agent heads a group of itself and its neighbours).
+    - update_rule: "replicator" (proportional imitation of a random model,
+      the finite-population form of replicator dynamics) or "moran"
+      (death-birth: `moran_events` agents die each generation and are replaced
+      by offspring chosen with probability proportional to exp(selection_strength * fitness)).
+
+    All matches of a generation are simulated as arrays with
+    tournament.simulate_games, and payoffs are accumulated per agent with
+    bincount. With `workers` > 1 the chunks of matches run in a process pool.
+    Populations of 10k+ agents take well under a second per generation.
+
+    A fraction `llm_fraction` of agents can be backed by `llm_backend` (e.g.
+    an OpenAIBackend, which calls get_gpt4_decision). Their pairwise matches
+    are played as ordinary prompt-driven games, up to `llm_workers` at a time.
+    LLM agents keep their identity: they are never replaced and never copied.
+    """
+    def __init__(
+        self,
+        size: int = 10_000,
+        strategies: Sequence[MemoryOneStrategy] = CLASSIC_STRATEGIES,
+        payoff_matrix: Union[str, dict] = "Default",
+        topology: str = "well_mixed",
+        game: str = "pairwise",
+        update_rule: str = "replicator",
+        num_rounds: int = 10,
+        matches_per_agent: int = 4,
+        neighbourhood: str = "von_neumann",
+        group_size: int = 5,
+        multiplier: float = 3.0,
+        selection_strength: float = 1.0,
+        moran_events: int = 1,
+        mutation_rate: float = 0.0,
+        noise: float = 0.0,
+        llm_backend: Optional[DecisionBackend] = None,
+        llm_fraction: float = 0.0,
+        llm_history_encoding: str = "summary",
+        llm_workers: int = 8,
+        workers: int = 1,
+        chunk_size: int = 250_000,
+        seed: Optional[int] = None
+    ):
+        if topology not in TOPOLOGIES:
+            raise ValueError(f"Unknown topology '{topology}'. Expected one of {TOPOLOGIES}.")
+        if game not in GAMES:
+            raise ValueError(f"Unknown game '{game}'. Expected one of {GAMES}.")
+        if update_rule not in UPDATE_RULES:
+            raise ValueError(f"Unknown update rule '{update_rule}'. Expected one of {UPDATE_RULES}.")
+        if topology == "grid" and math.isqrt(size) ** 2 != size:
+            raise ValueError(f"A grid population needs a square size, got {size}.")
+        if llm_fraction and (llm_backend is None or game != "pairwise"):
+            raise ValueError("LLM agents need an llm_backend and only play pairwise games.")
+
+        self.size = size
+        self.strategies = list(strategies)
+        self.strategy_rows = np.stack([strategy.as_row() for strategy in self.strategies])
+        self.payoff_matrix = resolve_payoff_matrix(payoff_matrix)
+        self.payoff_array = payoff_matrix_to_array(self.payoff_matrix)
+        self.topology = topology
+        self.game = game
+        self.update_rule = update_rule
+        self.num_rounds = num_rounds
+        self.matches_per_agent = matches_per_agent
+        self.group_size = group_size
+        self.multiplier = multiplier
+        self.selection_strength = selection_strength
+        self.moran_events = moran_events
+        self.mutation_rate = mutation_rate
+        self.noise = noise
+        self.llm_backend = llm_backend
+        self.llm_history_encoding = llm_history_encoding
+        self.llm_workers = llm_workers
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.rng = np.random.default_rng(seed)
+        self.generation = 0
+
+        self.population = self.rng.integers(len(self.strategies), size=size)
+        self.is_llm = np.zeros(size, dtype=bool)
+        self.is_llm[self.rng.choice(size, size=round(llm_fraction * size), replace=False)] = True
+
+        self.neighbours = None
+        if topology == "grid":
+            self.neighbours = grid_neighbours(math.isqrt(size), neighbourhood)
+            self._grid_pairs = grid_pairs(math.isqrt(size), neighbourhood)
+        self._executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _map(self, fn: Callable, jobs: List):
+        if self._executor is None:
+            return [fn(job) for job in jobs]
+        return list(self._executor.map(fn, jobs))
+
+    def _seeds(self, count: int) -> List[int]:
+        return [int(seed) for seed in self.rng.integers(2**63, size=count)]
+
+    def play(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Play one generation's matches. Returns each agent's fitness (mean
+        payoff per round) and cooperation rate.
+        """
+        if self.game == "public_goods":
+            return self._play_public_goods()
+        if self.topology == "grid":
+            idx_a, idx_b = self._grid_pairs
+        else:
+            idx_a, idx_b = well_mixed_pairs(self.size, self.matches_per_agent, self.rng)
+
+        payoff_a = np.empty(idx_a.size)
+        payoff_b = np.empty(idx_a.size)
+        coop_a = np.empty(idx_a.size)
+        coop_b = np.empty(idx_a.size)
+        llm_match = self.is_llm[idx_a] | self.is_llm[idx_b]
+
+        classic = np.flatnonzero(~llm_match)
+        chunks = [classic[start:start + self.chunk_size] for start in range(0, classic.size, self.chunk_size)]
+        jobs = [
+            (self.strategy_rows[self.population[idx_a[chunk]]], self.strategy_rows[self.population[idx_b[chunk]]],
+             self.num_rounds, seed, self.noise)
+            for chunk, seed in zip(chunks, self._seeds(len(chunks)))
+        ]
+        for chunk, counts in zip(chunks, self._map(_pairwise_chunk, jobs)):
+            payoff_a[chunk], payoff_b[chunk] = score_games(counts, self.payoff_array)
+            coop_a[chunk] = counts[:, 0] + counts[:, 1]
+            coop_b[chunk] = counts[:, 0] + counts[:, 2]
+
+        llm_matches = np.flatnonzero(llm_match)
+        if llm_matches.size:
+            results = self._play_llm_matches(idx_a[llm_matches], idx_b[llm_matches])
+            payoff_a[llm_matches], payoff_b[llm_matches], coop_a[llm_matches], coop_b[llm_matches] = results
+
+        # Vectorized accumulation of every match onto both of its players
+        agents = np.concatenate([idx_a, idx_b])
+        matches = np.bincount(agents, minlength=self.size) * self.num_rounds
+        totals = np.bincount(agents, np.concatenate([payoff_a, payoff_b]), minlength=self.size)
+        cooperations = np.bincount(agents, np.concatenate([coop_a, coop_b]), minlength=self.size)
+        played = np.maximum(matches, 1)
+        return totals / played, cooperations / played
+
+    def _play_public_goods(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self.topology == "grid":
+            # Every agent heads a group of itself and its neighbours
+            groups = np.concatenate([np.arange(self.size)[:, None], self.neighbours], axis=1)
+        else:
+            usable = self.size - self.size % self.group_size
+            groups = np.concatenate([
+                self.rng.permutation(self.size)[:usable].reshape(-1, self.group_size)
+                for _ in range(self.matches_per_agent)
+            ])
+        chunk_groups = max(1, self.chunk_size // groups.shape[1])
+        chunks = [groups[start:start + chunk_groups] for start in range(0, len(groups), chunk_groups)]
+        jobs = [
+            (self.strategy_rows[self.population[chunk]], self.num_rounds, self.multiplier, seed, self.noise)
+            for chunk, seed in zip(chunks, self._seeds(len(chunks)))
+        ]
+        results = self._map(_public_goods_chunk, jobs)
+        members = groups.reshape(-1)
+        payoffs = np.concatenate([payoff.reshape(-1) for payoff, _ in results])
+        cooperations = np.concatenate([coop.reshape(-1) for _, coop in results])
+        played = np.maximum(np.bincount(members, minlength=self.size) * self.num_rounds, 1)
+        return (
+            np.bincount(members, payoffs, minlength=self.size) / played,
+            np.bincount(members, cooperations, minlength=self.size) / played
+        )
+
+    def _play_llm_matches(self, idx_a: np.ndarray, idx_b: np.ndarray):
+        """
+        Play matches involving LLM agents as prompt-driven games.
+        """
+        # Put the LLM agent on side A whenever only one side is an LLM
+        swap = ~self.is_llm[idx_a]
+        side_a = np.where(swap, idx_b, idx_a)
+        side_b = np.where(swap, idx_a, idx_b)
+        spec = ExperimentSpec(
+            "population", self.payoff_matrix, "population", DEFAULT_INITIAL_PROMPT_A, DEFAULT_INITIAL_PROMPT_B,
+            remember_history=True, num_rounds=self.num_rounds, history_encoding=self.llm_history_encoding
+        )
+
+        def opponent(agent, seed):
+            if self.is_llm[agent]:
+                return self.llm_backend
+            return MemoryOneBackend(self.strategies[self.population[agent]], seed)
+
+        jobs = [
+            (spec, opponent(b, seed), f"population-g{self.generation}-{a}-{b}")
+            for a, b, seed in zip(side_a, side_b, self._seeds(side_a.size))
+        ]
+        with ThreadPoolExecutor(max_workers=self.llm_workers, thread_name_prefix="pd-population") as executor:
+            games = list(executor.map(lambda job: run_game(self.llm_backend, job[0], job[1], job[2]), jobs))
+        logger.info(f"Played {len(games)} LLM matches in generation {self.generation}.")
+
+        payoff_llm = np.array([sum(row[3] for row in rows) for rows in games], dtype=np.float64)
+        payoff_other = np.array([sum(row[4] for row in rows) for rows in games], dtype=np.float64)
+        coop_llm = np.array([sum(row[1] == "Cooperate" for row in rows) for rows in games], dtype=np.float64)
+        coop_other = np.array([sum(row[2] == "Cooperate" for row in rows) for rows in games], dtype=np.float64)
+        return (
+            np.where(swap, payoff_other, payoff_llm), np.where(swap, payoff_llm, payoff_other),
+            np.where(swap, coop_other, coop_llm), np.where(swap, coop_llm, coop_other)
+        )
+
+    def _models(self) -> np.ndarray:
+        """
+        One random model per agent: any agent when well mixed, a neighbour on the grid.
+        """
+        if self.neighbours is None:
+            return self.rng.integers(self.size, size=self.size)
+        choice = self.rng.integers(self.neighbours.shape[1], size=self.size)
+        return self.neighbours[np.arange(self.size), choice]
+
+    def update(self, fitness: np.ndarray):
+        """
+        Apply one generation of selection and mutation to `population`.
+        """
+        evolving = ~self.is_llm
+        if self.update_rule == "replicator":
+            models = self._models()
+            spread = np.ptp(fitness[evolving]) or 1.0
+            gain = np.clip((fitness[models] - fitness) / spread, 0.0, 1.0)
+            switch = evolving & ~self.is_llm[models] & (self.rng.random(self.size) < gain)
+            self.population = np.where(switch, self.population[models], self.population)
+        else:
+            weights = np.exp(self.selection_strength * (fitness - fitness.max()))
+            weights[self.is_llm] = 0.0
+            candidates = np.flatnonzero(evolving)
+            deaths = self.rng.choice(candidates, size=min(self.moran_events, candidates.size), replace=False)
+            if self.neighbours is None:
+                parents = self.rng.choice(self.size, size=deaths.size, p=weights / weights.sum())
+            else:
+                neighbour_weights = weights[self.neighbours[deaths]]
+                cumulative = neighbour_weights.cumsum(axis=1)
+                draws = self.rng.random(deaths.size) * cumulative[:, -1]
+                picks = (cumulative <= draws[:, None]).sum(axis=1)
+                keep = cumulative[:, -1] > 0  # Cells surrounded only by LLM agents stay as they are
+                parents = np.where(keep, self.neighbours[deaths, np.minimum(picks, cumulative.shape[1] - 1)], deaths)
+            # Offspring are drawn from the population as it was before any death
+            self.population[deaths] = self.population[parents]
+
+        if self.mutation_rate:
+            mutate = evolving & (self.rng.random(self.size) < self.mutation_rate)
+            self.population[mutate] = self.rng.integers(len(self.strategies), size=int(mutate.sum()))
+
+    def step(self) -> Dict:
+        """
+        Play one generation, update the population and return its summary row.
+        """
+        fitness, cooperation = self.play()
+        counts = np.bincount(self.population[~self.is_llm], minlength=len(self.strategies))
+        row = {"Generation": self.generation}
+        row.update({strategy.name: count / self.size for strategy, count in zip(self.strategies, counts)})
+        if self.is_llm.any():
+            row[LLM_STRATEGY] = self.is_llm.mean()
+            row["LLM Mean Payoff"] = fitness[self.is_llm].mean()
+        row["Mean Payoff"] = fitness.mean()
+        row["Cooperation Rate"] = cooperation.mean()
+        self.update(fitness)
+        self.generation += 1
+        return row
+
+    def run(self, generations: int, on_generation: Optional[Callable[[Dict], None]] = None) -> pd.DataFrame:
+        """
+        Run `generations` generations; returns one summary row per generation
+        with the population share of every strategy.
+        """
+        rows = []
+        for _ in range(generations):
+            rows.append(self.step())
+            if on_generation:
+                on_generation(rows[-1])
+        return pd.DataFrame(rows)
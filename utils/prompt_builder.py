@@ -0,0 +1,79 @@
+# utils/prompt_builder.py
+
+from typing import List, Sequence
+from utils.history import describe_history
+
+# How round prompts are assembled:
+# - legacy: one system message per round; the initial prompt in round 1, then
+#   a short question about the opponent's history (the persona is dropped)
+# - prefix_stable: a system message that never changes during a game (persona,
+#   payoffs, rules) followed by the rounds so far as user/assistant turns, so
+#   each round's request extends the previous one and providers can serve the
+#   shared prefix from their prompt cache
+PROMPT_STYLES = ("legacy", "prefix_stable")
+
+_AGENTS = ("Agent A", "Agent B")
+
+def describe_payoffs(payoff_matrix: dict, agent: str) -> str:
+    """
+    The payoff matrix as seen by `agent`, one line per pair of decisions.
+    """
+    own, other = (0, 1) if agent == "Agent A" else (1, 0)
+    opponent = _AGENTS[other]
+    lines = []
+    for decisions, payoffs in payoff_matrix.items():
+        lines.append(
+            f"- You {decisions[own]}, {opponent} {decisions[other]}s: "
+            f"you get {payoffs[own]}, {opponent} gets {payoffs[other]}."
+        )
+    return "\n".join(lines)
+
+def system_prefix(persona: str, payoff_matrix: dict, agent: str) -> str:
+    """
+    The fixed part of `agent`'s prompt: persona, payoffs and rules.
+    """
+    opponent = _AGENTS[1] if agent == "Agent A" else _AGENTS[0]
+    return (
+        f"{persona}\n\n"
+        f"You are {agent} in a repeated Prisoner's Dilemma against {opponent}. "
+        f"Each round both agents choose to Cooperate or Defect without seeing the other's choice.\n"
+        f"Payoffs per round:\n{describe_payoffs(payoff_matrix, agent)}\n"
+        f"Answer each round with a single word: Cooperate or Defect."
+    )
+
+def build_agent_messages(
+    persona: str,
+    payoff_matrix: dict,
+    agent: str,
+    own_history: Sequence[str],
+    opponent_history: Sequence[str],
+    remember_history: bool = True,
+    history_encoding: str = "full",
+    history_window: int = 10
+) -> List[dict]:
+    """
+    `agent`'s messages for the next round in the prefix_stable style.
+
+    With the "full" encoding every past round is a user turn asking for the
+    decision and an assistant turn holding the agent's own answer, and the
+    opponent's move is reported at the start of the next user turn, so the
+    list only ever grows at the end. Other encodings (and games without
+    memory) keep the system message as the cached prefix and describe the
+    history in one final user turn.
+    """
+    opponent = _AGENTS[1] if agent == "Agent A" else _AGENTS[0]
+    messages = [{"role": "system", "content": system_prefix(persona, payoff_matrix, agent)}]
+    round_num = len(own_history) + 1
+    if not remember_history or not own_history:
+        messages.append({"role": "user", "content": f"Round {round_num}. Cooperate or Defect?"})
+    elif history_encoding == "full":
+        report = ""
+        for index, (own, other) in enumerate(zip(own_history, opponent_history), start=1):
+            messages.append({"role": "user", "content": f"{report}Round {index}. Cooperate or Defect?"})
+            messages.append({"role": "assistant", "content": own})
+            report = f"{opponent} chose {other}. "
+        messages.append({"role": "user", "content": f"{report}Round {round_num}. Cooperate or Defect?"})
+    else:
+        history = describe_history(opponent_history, opponent, history_encoding, history_window)
+        messages.append({"role": "user", "content": f"Round {round_num}. Given {history}, Cooperate or Defect?"})
+    return messages
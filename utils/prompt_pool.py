@@ -0,0 +1,328 @@
+# utils/prompt_pool.py
+
+import hashlib
+import logging
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import numpy as np
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_PATH = os.path.join(".results", "prompt_pool.sqlite")
+
+# Prompts whose SimHash fingerprints differ in at most this many of 64 bits
+# are treated as near-duplicates of each other
+NEAR_DUPLICATE_BITS = 3
+
+# Persona generation requests start with this line (the mock server answers them)
+PERSONA_REQUEST_PREFIX = "Write persona prompts for agents playing a repeated Prisoner's Dilemma."
+
+# Settings cycled through by generation calls, so concurrent calls ask for different personas
+PERSONA_THEMES = (
+    "business and trade", "diplomacy and politics", "science and research", "sports and competition",
+    "crime and law enforcement", "family and community", "military and security", "art and entertainment",
+    "medicine and care", "technology and startups", "farming and rural life", "history and legend",
+)
+
+_NUMBERING = re.compile(r"^\s*(?:\d+\s*[.):]|[-*•])\s*")
+_PAIR_NAME = re.compile(r"^pool(\d+)-(\d+)$")
+
+@dataclass(frozen=True)
+class PoolPrompt:
+    prompt_id: int
+    text: str
+    source: str
+    created_at: float
+
+def normalize_prompt(text: str) -> str:
+    """
+    Case-, punctuation- and whitespace-insensitive form of a prompt.
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+def prompt_key(text: str) -> str:
+    """
+    Content hash of the normalized prompt: equal keys are exact duplicates.
+    """
+    return hashlib.sha256(normalize_prompt(text).encode("utf-8")).hexdigest()
+
+def simhash(text: str) -> int:
+    """
+    64-bit SimHash of the prompt's word trigrams (words, for short prompts).
+
+    Each trigram is hashed and votes on every bit; prompts sharing most of
+    their wording get fingerprints a few bits apart, with no embedding model.
+    """
+    words = normalize_prompt(text).split()
+    shingles = [" ".join(words[i:i + 3]) for i in range(len(words) - 2)] or words or [""]
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles],
+        dtype=np.uint64
+    )
+    bits = (hashes[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)
+    votes = (2 * bits.astype(np.int64) - 1).sum(axis=0)
+    return sum(1 << int(bit) for bit in np.flatnonzero(votes > 0))
+
+def hamming_distances(fingerprint: int, fingerprints: np.ndarray) -> np.ndarray:
+    """
+    Bits differing between `fingerprint` and each of `fingerprints` (uint64).
+    """
+    differing = np.bitwise_xor(fingerprints, np.uint64(fingerprint))
+    return np.unpackbits(differing.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+def persona_request_messages(count: int, theme: str) -> List[dict]:
+    return [
+        {"role": "system", "content": (
+            f"{PERSONA_REQUEST_PREFIX}\n"
+            "Each persona is one to three sentences in the second person ('You are ...'), gives the agent "
+            "a role and an attitude to trust and risk, and ends with 'Should you Cooperate or Defect?'. "
+            "Write each persona on its own numbered line and nothing else."
+        )},
+        {"role": "user", "content": f"Write {count} personas drawn from {theme}."},
+    ]
+
+def parse_persona_lines(content: str, min_length: int = 20) -> List[str]:
+    """
+    Persona prompts in a numbered or bulleted reply, one per line.
+    """
+    lines = (_NUMBERING.sub("", line).strip() for line in content.splitlines())
+    return [line for line in lines if len(line) >= min_length]
+
+def pair_name(prompt_a: PoolPrompt, prompt_b: PoolPrompt) -> str:
+    """
+    Prompt pair name recording the pool entries, e.g. 'pool12-40'.
+    """
+    return f"pool{prompt_a.prompt_id}-{prompt_b.prompt_id}"
+
+def parse_pair_name(name: str) -> Optional[Tuple[int, int]]:
+    """
+    Pool entry IDs of a pair_name, or None for prompt pairs not from a pool.
+    """
+    match = _PAIR_NAME.match(name)
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+class PromptPool:
+    """
+    Persona prompts kept in a SQLite file, free of duplicates.
+
+    A prompt is rejected when its normalized text (see normalize_prompt)
+    matches an entry's, found through the unique index on its hash, or when
+    its SimHash is within `near_duplicate_bits` of an entry's. At the default
+    of 3 bits that catches near-verbatim copies of longer prompts; a changed
+    word in a 25-word persona moves about 6 bits, and unrelated personas from
+    the same template stay at least 4 apart. The fingerprints of all entries are
+    held in one NumPy array, so each check is a single vectorized comparison.
+
+    Entry IDs never change, so games can record the IDs of the prompts they
+    used (see pair_name) and be replayed from the pool later.
+    """
+    def __init__(self, path: str = DEFAULT_POOL_PATH, near_duplicate_bits: int = NEAR_DUPLICATE_BITS):
+        self.path = path
+        self.near_duplicate_bits = near_duplicate_bits
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS prompts ("
+                "prompt_id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE, simhash INTEGER NOT NULL, "
+                "text TEXT NOT NULL, source TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS prompts_source ON prompts (source)")
+            rows = self._conn.execute("SELECT prompt_id, simhash FROM prompts ORDER BY prompt_id").fetchall()
+        self._ids = [prompt_id for prompt_id, _ in rows]
+        # SQLite integers are signed; fingerprints are stored as their signed 64-bit view
+        self._fingerprints = np.array([fingerprint for _, fingerprint in rows], dtype=np.int64).view(np.uint64)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def ids(self) -> List[int]:
+        with self._lock:
+            return list(self._ids)
+
+    def add(self, texts: Iterable[str], source: str = "manual") -> List[Optional[int]]:
+        """
+        Store each new prompt; returns its entry ID, or None for a duplicate
+        (of an entry or of an earlier text in the same call).
+        """
+        added = []
+        with self._lock, self._conn:
+            for text in texts:
+                text = text.strip()
+                fingerprint = simhash(text)
+                if len(self._fingerprints) and hamming_distances(fingerprint, self._fingerprints).min() <= self.near_duplicate_bits:
+                    added.append(None)
+                    continue
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO prompts (key, simhash, text, source, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (prompt_key(text), fingerprint - (1 << 64) if fingerprint >> 63 else fingerprint, text, source, time.time())
+                )
+                if not cursor.rowcount:
+                    added.append(None)
+                    continue
+                self._ids.append(cursor.lastrowid)
+                self._fingerprints = np.append(self._fingerprints, np.uint64(fingerprint))
+                added.append(cursor.lastrowid)
+        return added
+
+    def get(self, prompt_id: int) -> Optional[PoolPrompt]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT prompt_id, text, source, created_at FROM prompts WHERE prompt_id = ?", (prompt_id,)
+            ).fetchone()
+        return PoolPrompt(*row) if row else None
+
+    def find(self, text: str) -> Optional[int]:
+        """
+        Entry ID of an exact (normalized) duplicate of `text`, if stored.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT prompt_id FROM prompts WHERE key = ?", (prompt_key(text),)).fetchone()
+        return row[0] if row else None
+
+    def prompts(self, source: Optional[str] = None) -> List[PoolPrompt]:
+        query = "SELECT prompt_id, text, source, created_at FROM prompts"
+        with self._lock:
+            if source is None:
+                rows = self._conn.execute(query + " ORDER BY prompt_id").fetchall()
+            else:
+                rows = self._conn.execute(query + " WHERE source = ? ORDER BY prompt_id", (source,)).fetchall()
+        return [PoolPrompt(*row) for row in rows]
+
+    def sample_pairs(self, n: int, seed: Optional[int] = None) -> List[Tuple[PoolPrompt, PoolPrompt]]:
+        """
+        `n` distinct (prompt A, prompt B) pairs of different entries, drawn
+        uniformly (reproducibly with a seed).
+        """
+        ids = self.ids()
+        if len(ids) < 2:
+            raise ValueError("The prompt pool needs at least two prompts to sample pairs.")
+        n = min(n, len(ids) * (len(ids) - 1))
+        rng = random.Random(seed)
+        pairs = []
+        seen = set()
+        while len(pairs) < n:
+            pair = tuple(rng.sample(ids, 2))
+            if pair not in seen:
+                seen.add(pair)
+                pairs.append(pair)
+        return [(self.get(a), self.get(b)) for a, b in pairs]
+
+    def prompt_pairs(self, n: int, seed: Optional[int] = None) -> Dict[str, Tuple[str, str]]:
+        """
+        sample_pairs as the prompt pairs of utils.batch_runner.build_experiment_grid,
+        named with pair_name so every game's results record its pool entries.
+        """
+        return {pair_name(a, b): (a.text, b.text) for a, b in self.sample_pairs(n, seed)}
+
+    def pair(self, name: str) -> Optional[Tuple[str, str]]:
+        """
+        The prompts of a pair_name, to replay a game from the pool.
+        """
+        ids = parse_pair_name(name)
+        if ids is None:
+            return None
+        prompt_a, prompt_b = self.get(ids[0]), self.get(ids[1])
+        return (prompt_a.text, prompt_b.text) if prompt_a and prompt_b else None
+
+def generate_prompts(
+    client: "OpenAI",
+    pool: PromptPool,
+    count: int,
+    model: str = "gpt-4",
+    per_call: int = 10,
+    max_workers: int = 8,
+    max_calls: Optional[int] = None,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    cancelled: Optional[threading.Event] = None
+) -> int:
+    """
+    Add `count` new persona prompts to `pool`, asking for `per_call` personas
+    per model call with up to `max_workers` calls in flight.
+
+    Calls cycle through PERSONA_THEMES and go through the usual rate limiter,
+    cache and call records (call type 'persona_prompts'). Duplicates are
+    dropped by the pool, so calls continue until `count` prompts were added
+    or `max_calls` (by default twice the calls needed, plus one per worker)
+    were made. `on_progress(added, calls)` is called after each call.
+    Returns the number of prompts added.
+    """
+    from utils.gpt4 import generate_persona_prompts
+    if max_calls is None:
+        max_calls = 2 * -(-count // per_call) + max_workers
+    added = calls = submitted = 0
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pd-personas") as executor:
+        in_flight = set()
+        while True:
+            stopping = added >= count or (cancelled is not None and cancelled.is_set())
+            while not stopping and len(in_flight) < max_workers and submitted < max_calls:
+                theme = PERSONA_THEMES[submitted % len(PERSONA_THEMES)]
+                in_flight.add(executor.submit(generate_persona_prompts, client, per_call, theme, model, submitted))
+                submitted += 1
+            if not in_flight:
+                break
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                calls += 1
+                try:
+                    personas = future.result()
+                except Exception as e:
+                    logger.error(f"Persona generation call failed: {e}")
+                    continue
+                new = [prompt_id for prompt_id in pool.add(personas[:count - added], source=model) if prompt_id is not None]
+                added += len(new)
+                if on_progress:
+                    on_progress(added, calls)
+    logger.info(f"Added {added} persona prompts to the pool in {calls} calls.")
+    return added
+
+class PromptGeneration:
+    """
+    generate_prompts running on a background thread, for the dashboard.
+    """
+    def __init__(self, client: "OpenAI", pool: PromptPool, count: int, model: str = "gpt-4", **kwargs):
+        self.count = count
+        self.added = 0
+        self.calls = 0
+        self.status = "running"
+        self.error: Optional[str] = None
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(client, pool, count, model), kwargs=kwargs, name="pd-prompt-pool", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def active(self) -> bool:
+        return self.status == "running"
+
+    @property
+    def progress(self) -> float:
+        return min(self.added / self.count, 1.0) if self.count else 1.0
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def _on_progress(self, added: int, calls: int):
+        self.added, self.calls = added, calls
+
+    def _run(self, client, pool, count, model, **kwargs):
+        try:
+            generate_prompts(client, pool, count, model, on_progress=self._on_progress, cancelled=self._cancelled, **kwargs)
+            self.status = "cancelled" if self._cancelled.is_set() else "completed"
+        except Exception as e:
+            logger.error(f"Prompt generation failed: {e}")
+            self.status, self.error = "failed", str(e)
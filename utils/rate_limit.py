@@ -0,0 +1,243 @@
+# utils/rate_limit.py
+
+import logging
+import random
+import re
+import threading
+import time
+from typing import Dict, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """
+    Reservation-style token bucket: `reserve` always succeeds immediately and
+    returns how long the caller must wait before its reservation is covered.
+    Holds at most `burst_seconds` worth of refill.
+    """
+    def __init__(self, per_minute: float, burst_seconds: float = 10.0):
+        self.burst_seconds = burst_seconds
+        self.tokens = 0.0
+        self.set_rate(per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def set_rate(self, per_minute: float):
+        if self.tokens < 0:
+            # Keep outstanding reservations due at the same time
+            self.tokens *= per_minute / self.per_minute
+        self.per_minute = per_minute
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * self.burst_seconds)
+
+    def reserve(self, amount: float, now: float) -> float:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= amount
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def refund(self, amount: float):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_UNIT_SECONDS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+def parse_duration(value: str) -> Optional[float]:
+    """
+    Parse OpenAI reset headers such as '1s', '6m0s' or '20ms' into seconds.
+    """
+    parts = _DURATION.findall(value or "")
+    if not parts:
+        return None
+    return sum(float(number) * _UNIT_SECONDS[unit] for number, unit in parts)
+
+def parse_retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """
+    Seconds to wait according to 'retry-after-ms' or 'retry-after', if present.
+    """
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass  # HTTP-date form; fall back to exponential backoff
+    return None
+
+class AdaptiveRateLimiter:
+    """
+    Request and token budgets for one model, shared by every thread.
+
+    Callers `acquire` before each request. The allowed request and token
+    rates start at `initial_requests_per_minute`/`initial_tokens_per_minute`
+    and grow a step with each success up to their ceiling: the
+    configured `requests_per_minute`/`tokens_per_minute`, or the account limit
+    learned from x-ratelimit-* response headers when that is lower. A 429
+    multiplies both rates by `decrease_factor` (AIMD), at
+    most once per `decrease_cooldown` seconds so a burst of 429s from requests
+    already in flight counts once, and a Retry-After pauses all callers until
+    it has elapsed.
+    """
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        initial_requests_per_minute: float = 60.0,
+        initial_tokens_per_minute: float = 40_000.0,
+        min_requests_per_minute: float = 6.0,
+        increase_per_success: float = 0.05,
+        decrease_factor: float = 0.5,
+        decrease_cooldown: float = 2.0
+    ):
+        # Caps set by the caller; headers can lower the ceiling but never raise it above these
+        self.requests_cap = requests_per_minute or float("inf")
+        self.tokens_cap = tokens_per_minute or float("inf")
+        self.account_requests_per_minute = float("inf")
+        self.account_tokens_per_minute = float("inf")
+        self.initial_tokens_per_minute = initial_tokens_per_minute
+        self.min_requests_per_minute = min_requests_per_minute
+        self.increase_per_success = increase_per_success
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+        self.blocked_until = 0.0
+        self._last_decrease = float("-inf")
+        self._lock = threading.Lock()
+        self._requests = TokenBucket(min(initial_requests_per_minute, self.max_requests_per_minute))
+        self._tokens = None
+        if tokens_per_minute:
+            self._tokens = TokenBucket(min(initial_tokens_per_minute, self.max_tokens_per_minute))
+
+    @property
+    def max_requests_per_minute(self) -> float:
+        return min(self.requests_cap, self.account_requests_per_minute)
+
+    @property
+    def max_tokens_per_minute(self) -> float:
+        return min(self.tokens_cap, self.account_tokens_per_minute)
+
+    @property
+    def requests_per_minute(self) -> float:
+        return self._requests.per_minute
+
+    @property
+    def tokens_per_minute(self) -> Optional[float]:
+        return self._tokens.per_minute if self._tokens is not None else None
+
+    def acquire(self, tokens: int = 0) -> float:
+        """
+        Block until a request estimated at `tokens` tokens may be sent.
+        Returns the time spent waiting.
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self.blocked_until - now)
+            wait = max(wait, self._requests.reserve(1, now))
+            if self._tokens is not None and tokens:
+                wait = max(wait, self._tokens.reserve(tokens, now))
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def on_success(self, headers: Optional[Mapping[str, str]] = None, tokens_used: int = 0, tokens_reserved: int = 0):
+        with self._lock:
+            if headers:
+                self._update_limits(headers)
+            if self._tokens is not None and tokens_reserved:
+                # Settle the estimate against the real usage
+                self._tokens.refund(tokens_reserved - tokens_used)
+            self._increase(self._requests, self.max_requests_per_minute)
+            if self._tokens is not None:
+                self._increase(self._tokens, self.max_tokens_per_minute)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None):
+        with self._lock:
+            now = time.monotonic()
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+            if now - self._last_decrease < self.decrease_cooldown:
+                return
+            self._last_decrease = now
+            current = self._requests.per_minute
+            self._requests.set_rate(max(self.min_requests_per_minute, current * self.decrease_factor))
+            if self._tokens is not None:
+                self._tokens.set_rate(max(1.0, self._tokens.per_minute * self.decrease_factor))
+        logger.warning(
+            f"Rate limited; request rate lowered to {self._requests.per_minute:.0f}/min"
+            + (f", pausing {retry_after:.1f}s." if retry_after else ".")
+        )
+
+    def _increase(self, bucket: TokenBucket, ceiling: float):
+        current = bucket.per_minute
+        if current < ceiling:
+            step = max(1.0, current * self.increase_per_success)
+            bucket.set_rate(min(ceiling, current + step))
+
+    def _update_limits(self, headers: Mapping[str, str]):
+        # Learned account limits only lower the ceilings; the rates keep ramping
+        # towards them on success rather than jumping there
+        try:
+            if headers.get("x-ratelimit-limit-requests"):
+                self.account_requests_per_minute = float(headers["x-ratelimit-limit-requests"])
+            if headers.get("x-ratelimit-limit-tokens"):
+                self.account_tokens_per_minute = float(headers["x-ratelimit-limit-tokens"])
+                if self._tokens is None:
+                    self._tokens = TokenBucket(min(self.initial_tokens_per_minute, self.max_tokens_per_minute))
+        except ValueError:
+            return
+        if self._requests.per_minute > self.max_requests_per_minute:
+            self._requests.set_rate(self.max_requests_per_minute)
+        if self._tokens is not None and self._tokens.per_minute > self.max_tokens_per_minute:
+            self._tokens.set_rate(self.max_tokens_per_minute)
+        if headers.get("x-ratelimit-remaining-requests") == "0":
+            reset = parse_duration(headers.get("x-ratelimit-reset-requests"))
+            if reset:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + reset)
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """
+    Exponential backoff with full jitter for retry number `attempt` (0-based).
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+# One limiter per model, shared across games, threads and sessions
+_limiters: Dict[str, AdaptiveRateLimiter] = {}
+_limiter_defaults = {}
+# Options set for one model with configure_rate_limits(model, ...), applied over the defaults
+_limiter_overrides: Dict[str, dict] = {}
+_limiters_lock = threading.Lock()
+
+def configure_rate_limits(model: Optional[str] = None, **limits):
+    """
+    Set limiter options (AdaptiveRateLimiter keyword arguments) for `model`,
+    or the defaults for all models when `model` is None. Per-model options
+    take precedence over the defaults and survive later changes to them.
+
+    Only limiters whose options actually change are replaced (losing their
+    learned rate): for new defaults, the limiters of models without their
+    own options; for a model, that model's limiter.
+    """
+    with _limiters_lock:
+        if model is None:
+            if {**_limiter_defaults, **limits} == _limiter_defaults:
+                return
+            _limiter_defaults.update(limits)
+            for name in [name for name in _limiters if name not in _limiter_overrides]:
+                del _limiters[name]
+        else:
+            # None leaves the option to the defaults, e.g. a ModelSpec without a tpm budget
+            limits = {key: value for key, value in limits.items() if value is not None}
+            overrides = {**_limiter_overrides.get(model, {}), **limits}
+            if model in _limiters and _limiter_overrides.get(model) == overrides:
+                return
+            _limiter_overrides[model] = overrides
+            _limiters[model] = AdaptiveRateLimiter(**{**_limiter_defaults, **overrides})
+
+def get_rate_limiter(model: str) -> AdaptiveRateLimiter:
+    with _limiters_lock:
+        limiter = _limiters.get(model)
+        if limiter is None:
+            options = {**_limiter_defaults, **_limiter_overrides.get(model, {})}
+            limiter = _limiters[model] = AdaptiveRateLimiter(**options)
+        return limiter
@@ -0,0 +1,71 @@
+# utils/results_model.py
+
+from collections import Counter
+from typing import Iterable, List, Tuple
+from config import RESULT_COLUMNS
+
+class IncrementalResults:
+    """
+    Results of one game, kept as column lists plus running aggregates.
+
+    `append` is O(1): it updates totals, cumulative payoff series, per-agent
+    cooperation counts and decision-pair counts in place, so charts and the
+    summary never have to rescan earlier rounds. `rows` keeps the classic list
+    of (Round, Agent A Decision, Agent B Decision, Agent A Payoff, Agent B Payoff,
+    Agent A Fallback, Agent B Fallback) tuples for session state and CSV export.
+    """
+    def __init__(self, rows: Iterable[Tuple] = ()):
+        self.rows: List[Tuple] = []
+        self.rounds: List[int] = []
+        self.payoffs_a: List[float] = []
+        self.payoffs_b: List[float] = []
+        self.cumulative_a: List[float] = []
+        self.cumulative_b: List[float] = []
+        self.total_a = 0
+        self.total_b = 0
+        self.decision_counts_a = Counter()
+        self.decision_counts_b = Counter()
+        self.pair_counts = Counter()
+        self.fallbacks_a = 0
+        self.fallbacks_b = 0
+        for row in rows:
+            self.append(*row)
+
+    def append(
+        self,
+        round_num: int,
+        decision_a: str,
+        decision_b: str,
+        payoff_a,
+        payoff_b,
+        fallback_a: bool = False,
+        fallback_b: bool = False
+    ):
+        self.rows.append((round_num, decision_a, decision_b, payoff_a, payoff_b, fallback_a, fallback_b))
+        self.rounds.append(round_num)
+        self.payoffs_a.append(payoff_a)
+        self.payoffs_b.append(payoff_b)
+        self.total_a += payoff_a
+        self.total_b += payoff_b
+        self.cumulative_a.append(self.total_a)
+        self.cumulative_b.append(self.total_b)
+        self.decision_counts_a[decision_a] += 1
+        self.decision_counts_b[decision_b] += 1
+        self.pair_counts[f"{decision_a} vs {decision_b}"] += 1
+        self.fallbacks_a += fallback_a
+        self.fallbacks_b += fallback_b
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def cooperations_a(self) -> int:
+        return self.decision_counts_a["Cooperate"]
+
+    @property
+    def cooperations_b(self) -> int:
+        return self.decision_counts_b["Cooperate"]
+
+    def to_dataframe(self) -> "pd.DataFrame":
+        import pandas as pd
+        return pd.DataFrame(self.rows, columns=RESULT_COLUMNS)
@@ -0,0 +1,232 @@
+# utils/results_store.py
+
+import functools
+import glob
+import itertools
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import quote, unquote
+from config import RESULT_COLUMNS
+
+# pyarrow and pandas are imported where rows are read or written, so listing
+# stored games (done on every dashboard rerun) stays cheap
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_PATH = ".results"
+
+# Decisions are stored as int8 dictionary codes over this fixed dictionary
+DECISIONS = ["Cooperate", "Defect"]
+_DECISION_CODES = {decision: code for code, decision in enumerate(DECISIONS)}
+
+# Orders part files written by this process within the same nanosecond
+_part_sequence = itertools.count()
+
+@functools.lru_cache(maxsize=None)
+def column_types() -> Dict[str, "pa.DataType"]:
+    """
+    Arrow type per known column; anything else is left to Arrow's inference.
+    """
+    import pyarrow as pa
+    return {
+        "Model": pa.dictionary(pa.int32(), pa.string()),
+        "Experiment ID": pa.dictionary(pa.int32(), pa.string()),
+        "Payoff Matrix": pa.dictionary(pa.int32(), pa.string()),
+        "Prompt Pair": pa.dictionary(pa.int32(), pa.string()),
+        "Remember History": pa.bool_(),
+        "History Encoding": pa.dictionary(pa.int32(), pa.string()),
+        "Num Rounds": pa.int32(),
+        "Repetition": pa.int32(),
+        "Round": pa.int32(),
+        "Agent A Decision": pa.dictionary(pa.int8(), pa.string()),
+        "Agent B Decision": pa.dictionary(pa.int8(), pa.string()),
+        "Agent A Payoff": pa.float32(),
+        "Agent B Payoff": pa.float32(),
+        "Agent A Fallback": pa.bool_(),
+        "Agent B Fallback": pa.bool_(),
+    }
+
+def _decision_array(values: Sequence[Optional[str]]) -> "pa.DictionaryArray":
+    import pyarrow as pa
+    codes = pa.array([_DECISION_CODES.get(value) for value in values], type=pa.int8())
+    return pa.DictionaryArray.from_arrays(codes, pa.array(DECISIONS))
+
+def rows_to_table(rows: Sequence[Tuple], columns: Sequence[str] = RESULT_COLUMNS) -> "pa.Table":
+    """
+    Convert results tuples (in `columns` order) to a compactly typed Arrow table.
+    """
+    import pyarrow as pa
+    arrays = []
+    for name, values in zip(columns, zip(*rows) if rows else [()] * len(columns)):
+        column_type = column_types().get(name)
+        if name.endswith("Decision"):
+            arrays.append(_decision_array(values))
+        elif isinstance(column_type, pa.DictionaryType):
+            arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(values, type=column_type))
+    return pa.Table.from_arrays(arrays, names=list(columns))
+
+class ResultsStore:
+    """
+    Append-only, columnar store of game results on disk.
+
+    Each experiment (a dashboard game or a batch-runner grid cell) gets its own
+    directory under `root`. Appended rows are buffered and written as Arrow IPC
+    part files of up to `chunk_rows` rows, so memory use stays flat however
+    long a sweep runs. Reads memory-map the part files, which makes loading
+    zero-copy; exports stream batch by batch to CSV or Parquet.
+    """
+    def __init__(self, root: str = DEFAULT_STORE_PATH, chunk_rows: int = 50_000):
+        self.root = root
+        self.chunk_rows = chunk_rows
+        self._buffers: Dict[str, Tuple[Tuple[str, ...], List[Tuple]]] = {}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _directory(self, experiment_id: str) -> str:
+        return os.path.join(self.root, quote(experiment_id, safe=""))
+
+    def _part_files(self, experiment_id: str) -> List[str]:
+        return sorted(glob.glob(os.path.join(self._directory(experiment_id), "part-*.arrow")))
+
+    def append(self, experiment_id: str, rows: Iterable[Tuple], columns: Sequence[str] = RESULT_COLUMNS):
+        """
+        Buffer `rows` for `experiment_id`; full chunks are written straight away.
+        """
+        columns = tuple(columns)
+        with self._lock:
+            buffered_columns, buffer = self._buffers.setdefault(experiment_id, (columns, []))
+            if buffered_columns != columns:
+                raise ValueError(f"Columns for '{experiment_id}' changed from {buffered_columns} to {columns}.")
+            buffer.extend(rows)
+            while len(buffer) >= self.chunk_rows:
+                self._write_part(experiment_id, columns, buffer[:self.chunk_rows])
+                del buffer[:self.chunk_rows]
+
+    def flush(self, experiment_id: Optional[str] = None):
+        """
+        Write buffered rows of one experiment (or of all) to disk.
+        """
+        with self._lock:
+            ids = [experiment_id] if experiment_id is not None else list(self._buffers)
+            for key in ids:
+                columns, buffer = self._buffers.pop(key, ((), []))
+                if buffer:
+                    self._write_part(key, columns, buffer)
+
+    def _write_part(self, experiment_id: str, columns: Sequence[str], rows: Sequence[Tuple]):
+        directory = self._directory(experiment_id)
+        os.makedirs(directory, exist_ok=True)
+        import pyarrow as pa
+        # Unique across stores and processes writing the same experiment, and
+        # ordered by write time, so parts sort in the order rows were appended
+        name = f"part-{time.time_ns():020d}-{os.getpid()}-{next(_part_sequence):06d}.arrow"
+        path = os.path.join(directory, name)
+        table = rows_to_table(rows, columns)
+        # Write then rename, so readers never see a half-written part
+        with pa.OSFile(path + ".tmp", "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(path + ".tmp", path)
+        logger.debug(f"Wrote {len(rows)} rows to {path}")
+
+    def experiments(self) -> List[str]:
+        """
+        IDs of every experiment with rows on disk, oldest first.
+        """
+        directories = [entry for entry in os.scandir(self.root) if entry.is_dir()]
+        directories.sort(key=lambda entry: entry.stat().st_mtime)
+        return [unquote(entry.name) for entry in directories if glob.glob(os.path.join(entry.path, "part-*.arrow"))]
+
+    def fingerprint(self, experiment_id: str) -> Tuple[Tuple[str, int, int], ...]:
+        """
+        Name, size and modification time of each part file of an experiment;
+        changes whenever its rows on disk do.
+        """
+        parts = []
+        for path in self._part_files(experiment_id):
+            stat = os.stat(path)
+            parts.append((os.path.basename(path), stat.st_size, stat.st_mtime_ns))
+        return tuple(parts)
+
+    def __contains__(self, experiment_id: str) -> bool:
+        return bool(self._part_files(experiment_id))
+
+    def read_table(self, experiment_id: Optional[str] = None, columns: Optional[List[str]] = None) -> "pa.Table":
+        """
+        Memory-map the part files of one experiment (or of all) into one table.
+        """
+        import pyarrow as pa
+        ids = [experiment_id] if experiment_id is not None else self.experiments()
+        tables = []
+        for key in ids:
+            for path in self._part_files(key):
+                table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+                tables.append(table.select(columns) if columns else table)
+        if not tables:
+            return rows_to_table([], columns or RESULT_COLUMNS)
+        return pa.concat_tables(tables, promote_options="permissive").unify_dictionaries()
+
+    def read(self, experiment_id: Optional[str] = None, columns: Optional[List[str]] = None) -> "pd.DataFrame":
+        """
+        Results as a DataFrame; decision columns come back as categoricals.
+        """
+        return self.read_table(experiment_id, columns).to_pandas()
+
+    def iter_rows(self, experiment_id: str, columns: Sequence[str] = RESULT_COLUMNS) -> Iterator[Tuple]:
+        """
+        Yield the stored rows of one experiment as plain tuples of `columns`.
+        """
+        import pyarrow as pa
+        for path in self._part_files(experiment_id):
+            table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all().select(list(columns))
+            yield from zip(*(column.to_pylist() for column in table.columns))
+
+    def _batches(self, experiment_id: Optional[str]) -> Iterator["pa.RecordBatch"]:
+        import pyarrow as pa
+        ids = [experiment_id] if experiment_id is not None else self.experiments()
+        for key in ids:
+            for path in self._part_files(key):
+                reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+                for index in range(reader.num_record_batches):
+                    batch = reader.get_batch(index)
+                    # Plain strings keep batches from different parts schema-compatible
+                    yield batch.cast(pa.schema([
+                        field.with_type(field.type.value_type) if pa.types.is_dictionary(field.type) else field
+                        for field in batch.schema
+                    ]))
+
+    def export_csv(self, sink, experiment_id: Optional[str] = None):
+        """
+        Stream stored rows to a CSV file path or binary file object.
+        """
+        import pyarrow.csv as pa_csv
+        writer = None
+        for batch in self._batches(experiment_id):
+            if writer is None:
+                writer = pa_csv.CSVWriter(sink, batch.schema)
+            writer.write_batch(batch)
+        if writer is not None:
+            writer.close()
+
+    def export_parquet(self, sink, experiment_id: Optional[str] = None):
+        """
+        Stream stored rows to a Parquet file path or binary file object.
+        """
+        import pyarrow.parquet as pq
+        writer = None
+        for batch in self._batches(experiment_id):
+            if writer is None:
+                writer = pq.ParquetWriter(sink, batch.schema)
+            writer.write_batch(batch)
+        if writer is not None:
+            writer.close()
+
+    def delete(self, experiment_id: str):
+        with self._lock:
+            self._buffers.pop(experiment_id, None)
+            shutil.rmtree(self._directory(experiment_id), ignore_errors=True)
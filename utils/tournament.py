@@ -0,0 +1,219 @@
+# utils/tournament.py
+
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+from config import RESULT_COLUMNS
+
+# Move encoding used throughout the array engine
+MOVES = ("Cooperate", "Defect")
+COOPERATE, DEFECT = 0, 1
+
+@dataclass(frozen=True)
+class MemoryOneStrategy:
+    """
+    A strategy that only looks at the previous round.
+
+    `first` is the probability of cooperating in round 1 and `p` holds the
+    probabilities of cooperating after (own, opponent) moves of
+    (C, C), (C, D), (D, C) and (D, D). Deterministic strategies use 0/1.
+    """
+    name: str
+    first: float
+    p: Tuple[float, float, float, float]
+
+    def as_row(self) -> np.ndarray:
+        return np.array((self.first,) + tuple(self.p), dtype=np.float64)
+
+CLASSIC_STRATEGIES = [
+    MemoryOneStrategy("ALLC", 1.0, (1.0, 1.0, 1.0, 1.0)),
+    MemoryOneStrategy("ALLD", 0.0, (0.0, 0.0, 0.0, 0.0)),
+    MemoryOneStrategy("TFT", 1.0, (1.0, 0.0, 1.0, 0.0)),
+    MemoryOneStrategy("STFT", 0.0, (1.0, 0.0, 1.0, 0.0)),
+    MemoryOneStrategy("GRIM", 1.0, (1.0, 0.0, 0.0, 0.0)),
+    MemoryOneStrategy("WSLS", 1.0, (1.0, 0.0, 0.0, 1.0)),
+    MemoryOneStrategy("GTFT", 1.0, (1.0, 1 / 3, 1.0, 1 / 3)),
+    MemoryOneStrategy("ALT", 1.0, (0.0, 0.0, 1.0, 1.0)),
+    MemoryOneStrategy("RANDOM", 0.5, (0.5, 0.5, 0.5, 0.5)),
+]
+
+def random_strategies(n: int, seed: Optional[int] = None) -> List[MemoryOneStrategy]:
+    """
+    Draw `n` stochastic memory-one strategies with uniform probabilities.
+    """
+    rng = np.random.default_rng(seed)
+    probs = rng.random((n, 5))
+    return [
+        MemoryOneStrategy(f"M1-{i:03d}", float(row[0]), tuple(float(x) for x in row[1:]))
+        for i, row in enumerate(probs)
+    ]
+
+def payoff_matrix_to_array(payoff_matrix: dict) -> np.ndarray:
+    """
+    Convert a payoff dict keyed by (decision_a, decision_b) into a
+    (2, 2, 2) array indexed [move_a, move_b, player] with 0 = Cooperate.
+    """
+    array = np.zeros((2, 2, 2), dtype=np.float64)
+    for (decision_a, decision_b), payoffs in payoff_matrix.items():
+        array[MOVES.index(decision_a), MOVES.index(decision_b)] = payoffs
+    return array
+
+def payoff_matrices_to_array(payoff_matrices: Sequence[dict]) -> np.ndarray:
+    return np.stack([payoff_matrix_to_array(matrix) for matrix in payoff_matrices])
+
+def simulate_games(
+    strategies_a: np.ndarray,
+    strategies_b: np.ndarray,
+    num_rounds: int,
+    seed: Optional[int] = None,
+    noise: float = 0.0,
+    record_moves: bool = False
+) -> Dict[str, np.ndarray]:
+    """
+    Play G independent games at once.
+
+    - strategies_a / strategies_b: (G, 5) rows of [first, p_CC, p_CD, p_DC, p_DD].
+    - noise: probability that any move is flipped (trembling hand).
+
+    Every round is a handful of array operations across all G games, so the
+    only Python-level loop is over rounds. The moves never depend on the
+    payoffs, so only the (G, 4) counts of joint outcomes CC, CD, DC, DD are
+    kept; score them against any number of matrices with `score_games`.
+    With `record_moves`, (G, num_rounds) int8 move arrays are returned too.
+    """
+    rng = np.random.default_rng(seed)
+    num_games = strategies_a.shape[0]
+    # Flat lookups: row g's probability for state s is flat[g * 5 + 1 + s]
+    strat_a_flat = np.ascontiguousarray(strategies_a, dtype=np.float32).reshape(-1)
+    strat_b_flat = np.ascontiguousarray(strategies_b, dtype=np.float32).reshape(-1)
+    strat_base = np.arange(num_games, dtype=np.int64) * 5 + 1
+    count_base = np.arange(num_games, dtype=np.int64) * 4
+
+    counts = np.zeros(num_games * 4, dtype=np.int64)
+    moves_a_log = np.empty((num_games, num_rounds), dtype=np.int8) if record_moves else None
+    moves_b_log = np.empty((num_games, num_rounds), dtype=np.int8) if record_moves else None
+
+    prob_a = strat_a_flat[strat_base - 1]
+    prob_b = strat_b_flat[strat_base - 1]
+    for round_idx in range(num_rounds):
+        draws = rng.random((2, num_games), dtype=np.float32)
+        move_a = (draws[0] >= prob_a).view(np.int8)
+        move_b = (draws[1] >= prob_b).view(np.int8)
+        if noise:
+            flips = (rng.random((2, num_games), dtype=np.float32) < noise).view(np.int8)
+            move_a ^= flips[0]
+            move_b ^= flips[1]
+
+        # Joint outcome from A's point of view doubles as A's next state
+        state_a = move_a * 2 + move_b
+        counts[count_base + state_a] += 1
+        if record_moves:
+            moves_a_log[:, round_idx] = move_a
+            moves_b_log[:, round_idx] = move_b
+        prob_a = strat_a_flat[strat_base + state_a]
+        prob_b = strat_b_flat[strat_base + move_b * 2 + move_a]
+
+    result = {"outcome_counts": counts.reshape(num_games, 4)}
+    if record_moves:
+        result["moves_a"] = moves_a_log
+        result["moves_b"] = moves_b_log
+    return result
+
+def score_games(outcome_counts: np.ndarray, payoffs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Total payoffs of players A and B for every game under every matrix.
+
+    `payoffs` is (M, 2, 2, 2) or a single (2, 2, 2) array; returns two
+    (G, M) arrays (or (G,) for a single matrix).
+    """
+    single = payoffs.ndim == 3
+    table = np.asarray(payoffs, dtype=np.float64).reshape(-1, 4, 2)
+    counts = outcome_counts.astype(np.float64)
+    total_a = counts @ table[:, :, 0].T
+    total_b = counts @ table[:, :, 1].T
+    if single:
+        return total_a[:, 0], total_b[:, 0]
+    return total_a, total_b
+
+def run_tournament(
+    strategies: Sequence[MemoryOneStrategy],
+    payoff_matrices: Sequence[dict],
+    num_rounds: int = 200,
+    repetitions: int = 1,
+    seed: Optional[int] = None,
+    noise: float = 0.0,
+    chunk_size: int = 250_000
+) -> pd.DataFrame:
+    """
+    Axelrod-style round robin: every pair of strategies (including self-play)
+    meets `repetitions` times, and each match is scored under every payoff
+    matrix.
+
+    Because play does not depend on payoffs, each match is simulated once and
+    scored against all matrices with one matrix product (common random
+    numbers across matrices). Returns one row per (matrix, strategy, opponent)
+    with the strategy's mean payoff per round and cooperation rate.
+    """
+    strategy_rows = np.stack([strategy.as_row() for strategy in strategies])
+    payoff_array = payoff_matrices_to_array(payoff_matrices)
+    names = np.array([strategy.name for strategy in strategies])
+    num_matrices = len(payoff_matrices)
+
+    idx_a, idx_b = np.triu_indices(len(strategies))
+    game_pair = np.repeat(np.arange(idx_a.size), repetitions)
+    rng = np.random.default_rng(seed)
+    counts = np.concatenate([
+        simulate_games(
+            strategy_rows[idx_a[game_pair[start:start + chunk_size]]],
+            strategy_rows[idx_b[game_pair[start:start + chunk_size]]],
+            num_rounds,
+            seed=rng.integers(2**63),
+            noise=noise
+        )["outcome_counts"]
+        for start in range(0, game_pair.size, chunk_size)
+    ])
+    # Average repetitions of each pair before scoring
+    counts = counts.reshape(idx_a.size, repetitions, 4).mean(axis=1)
+    score_a, score_b = score_games(counts, payoff_array)  # (pairs, matrices)
+    coop_a = (counts[:, 0] + counts[:, 1]) / num_rounds
+    coop_b = (counts[:, 0] + counts[:, 2]) / num_rounds
+
+    mirror = idx_a != idx_b  # Self-play matches are only reported once
+    def per_matrix(values):
+        return np.tile(values, num_matrices)
+    return pd.DataFrame({
+        "Matrix": np.repeat(np.arange(num_matrices), idx_a.size + mirror.sum()),
+        "Strategy": per_matrix(np.concatenate([names[idx_a], names[idx_b[mirror]]])),
+        "Opponent": per_matrix(np.concatenate([names[idx_b], names[idx_a[mirror]]])),
+        "Score": np.concatenate([score_a, score_b[mirror]]).T.reshape(-1) / num_rounds,
+        "Opponent Score": np.concatenate([score_b, score_a[mirror]]).T.reshape(-1) / num_rounds,
+        "Cooperation Rate": per_matrix(np.concatenate([coop_a, coop_b[mirror]])),
+    })
+
+def tournament_standings(matches: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rank strategies by mean per-round score over all opponents and matrices.
+    """
+    standings = matches.groupby("Strategy").agg(
+        **{"Mean Score": ("Score", "mean"), "Cooperation Rate": ("Cooperation Rate", "mean")}
+    )
+    return standings.sort_values("Mean Score", ascending=False).reset_index()
+
+def moves_to_results(moves_a: np.ndarray, moves_b: np.ndarray, payoff_matrix: dict) -> pd.DataFrame:
+    """
+    Convert one game's move arrays into the dashboard's results schema.
+    """
+    payoff_array = payoff_matrix_to_array(payoff_matrix)
+    moves_a = np.asarray(moves_a, dtype=np.int64)
+    moves_b = np.asarray(moves_b, dtype=np.int64)
+    labels = np.array(MOVES)
+    return pd.DataFrame({
+        RESULT_COLUMNS[0]: np.arange(1, moves_a.size + 1),
+        RESULT_COLUMNS[1]: labels[moves_a],
+        RESULT_COLUMNS[2]: labels[moves_b],
+        RESULT_COLUMNS[3]: payoff_array[moves_a, moves_b, 0],
+        RESULT_COLUMNS[4]: payoff_array[moves_a, moves_b, 1],
+        RESULT_COLUMNS[5]: False,
+        RESULT_COLUMNS[6]: False,
+    })
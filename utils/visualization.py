@@ -5,9 +5,13 @@ import plotly.express as px
 import plotly.graph_objects as go
 import streamlit as st
 import logging
+import time
+from typing import Optional
+from utils.results_model import IncrementalResults
+from utils.instrumentation import summarize_calls, per_round_metrics
+from utils.model_comparison import compare_models, model_summary
+from utils.analytics import rolling_cooperation, strategy_profile
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def plot_payoff_over_rounds(df_results: pd.DataFrame):
@@ -26,8 +30,10 @@ def plot_payoff_over_rounds(df_results: pd.DataFrame):
     return fig
 
 def plot_cumulative_payoffs(df_results: pd.DataFrame):
-    df_results['Cumulative A Payoff'] = df_results['Agent A Payoff'].cumsum()
-    df_results['Cumulative B Payoff'] = df_results['Agent B Payoff'].cumsum()
+    df_results = df_results.assign(**{
+        'Cumulative A Payoff': df_results['Agent A Payoff'].cumsum(),
+        'Cumulative B Payoff': df_results['Agent B Payoff'].cumsum(),
+    })
     fig = px.line(
         df_results,
         x='Round',
@@ -44,8 +50,8 @@ def plot_cumulative_payoffs(df_results: pd.DataFrame):
 
 def plot_decision_patterns_heatmap(df_results: pd.DataFrame):
     try:
-        df_results['Combined Decision'] = df_results['Agent A Decision'] + " vs " + df_results['Agent B Decision']
-        decision_counts = df_results['Combined Decision'].value_counts().reset_index()
+        combined_decision = df_results['Agent A Decision'] + " vs " + df_results['Agent B Decision']
+        decision_counts = combined_decision.value_counts().reset_index()
         decision_counts.columns = ['Decision Combination', 'Count']
         fig = px.bar(
             decision_counts,
@@ -158,3 +164,382 @@ def visualize_results(df_results: pd.DataFrame, payoff_placeholder, cumulative_p
     fig_decision_counts = plot_decision_counts(df_results)
     if fig_decision_counts:
         decision_counts_placeholder.plotly_chart(fig_decision_counts, use_container_width=True, key=f"decision_counts_{current_count}")
+
+
+class LiveDashboard:
+    """
+    Charts and summary for a game in progress, updated incrementally.
+
+    Figures are built once and only their trace data is replaced from the
+    running series in an IncrementalResults, so no DataFrame is rebuilt and
+    nothing is recounted per round. Redraws are throttled to at most one per
+    `refresh_interval` seconds; call `render()` at the end of a game to show
+    the final state.
+    """
+    def __init__(self, results: IncrementalResults, refresh_interval: float = 0.5):
+        self.results = results
+        self.refresh_interval = refresh_interval
+        self._last_render = float("-inf")
+
+        st.markdown("### **Prisoner's Dilemma Payoffs Over Rounds**")
+        self.payoff_placeholder = st.empty()
+        st.markdown("### **Cumulative Payoffs Over Rounds**")
+        self.cumulative_placeholder = st.empty()
+        st.markdown("### **Decision Patterns Heatmap**")
+        self.heatmap_placeholder = st.empty()
+        st.markdown("### **Decision Counts for Agents**")
+        self.decision_counts_placeholder = st.empty()
+        self.summary_placeholder = st.empty()
+
+        self.fig_payoff = self._line_figure("Prisoner's Dilemma Payoffs Over Rounds", "Payoff", "Agent A Payoff", "Agent B Payoff")
+        self.fig_cumulative = self._line_figure("Cumulative Payoffs Over Rounds", "Cumulative Payoff", "Cumulative A Payoff", "Cumulative B Payoff")
+        self.fig_heatmap = go.Figure(go.Bar(marker=dict(colorscale='Viridis', showscale=True), hovertemplate="%{x}: %{y}<extra></extra>"))
+        self.fig_heatmap.update_layout(
+            title="Decision Patterns Heatmap",
+            xaxis={'categoryorder': 'total descending', 'title': 'Decision Combination'},
+            yaxis_title='Number of Occurrences',
+            hovermode='closest'
+        )
+        self.fig_decision_counts = go.Figure([
+            go.Bar(name='Agent A', marker_color='indianred'),
+            go.Bar(name='Agent B', marker_color='lightsalmon'),
+        ])
+        self.fig_decision_counts.update_layout(
+            barmode='group',
+            title="Decision Counts for Agents",
+            xaxis_title="Decision",
+            yaxis_title="Count",
+            legend_title="Agents",
+            hovermode='x unified'
+        )
+
+    @staticmethod
+    def _line_figure(title: str, y_title: str, name_a: str, name_b: str) -> go.Figure:
+        fig = go.Figure([
+            go.Scatter(mode='lines', name=name_a),
+            go.Scatter(mode='lines', name=name_b),
+        ])
+        fig.update_layout(
+            title=title,
+            xaxis_title='Round',
+            yaxis_title=y_title,
+            legend_title_text='Agents',
+            hovermode='x unified'
+        )
+        return fig
+
+    def add_round(self, *row):
+        """
+        Append one results row (see IncrementalResults.append) and maybe redraw.
+        """
+        self.results.append(*row)
+        self.refresh()
+
+    def refresh(self):
+        """
+        Redraw if at least `refresh_interval` seconds passed since the last draw.
+        """
+        if time.monotonic() - self._last_render >= self.refresh_interval:
+            self.render()
+
+    def render(self):
+        results = self.results
+        self._last_render = time.monotonic()
+        if 'chart_update_counter' not in st.session_state:
+            st.session_state.chart_update_counter = 0
+        st.session_state.chart_update_counter += 1
+        current_count = st.session_state.chart_update_counter
+
+        with self.fig_payoff.batch_update():
+            self.fig_payoff.data[0].update(x=results.rounds, y=results.payoffs_a)
+            self.fig_payoff.data[1].update(x=results.rounds, y=results.payoffs_b)
+        with self.fig_cumulative.batch_update():
+            self.fig_cumulative.data[0].update(x=results.rounds, y=results.cumulative_a)
+            self.fig_cumulative.data[1].update(x=results.rounds, y=results.cumulative_b)
+        pairs = list(results.pair_counts.items())
+        self.fig_heatmap.data[0].update(x=[pair for pair, _ in pairs], y=[count for _, count in pairs], marker_color=[count for _, count in pairs])
+        with self.fig_decision_counts.batch_update():
+            for trace, counts in zip(self.fig_decision_counts.data, (results.decision_counts_a, results.decision_counts_b)):
+                trace.update(x=list(counts), y=list(counts.values()))
+
+        self.payoff_placeholder.plotly_chart(self.fig_payoff, use_container_width=True, key=f"payoff_over_rounds_{current_count}")
+        self.cumulative_placeholder.plotly_chart(self.fig_cumulative, use_container_width=True, key=f"cumulative_payoffs_{current_count}")
+        self.heatmap_placeholder.plotly_chart(self.fig_heatmap, use_container_width=True, key=f"decision_patterns_heatmap_{current_count}")
+        self.decision_counts_placeholder.plotly_chart(self.fig_decision_counts, use_container_width=True, key=f"decision_counts_{current_count}")
+
+        num_rounds = len(results)
+        with self.summary_placeholder.container():
+            st.markdown("### **Game Summary**")
+            st.write(f"**Total Payoff for Agent A:** {results.total_a}")
+            st.write(f"**Total Payoff for Agent B:** {results.total_b}")
+            st.write(f"**Agent A Cooperated:** {results.cooperations_a} times out of {num_rounds}")
+            st.write(f"**Agent B Cooperated:** {results.cooperations_b} times out of {num_rounds}")
+            if results.fallbacks_a or results.fallbacks_b:
+                st.warning(
+                    f"Fallback decisions (no usable model answer): Agent A {results.fallbacks_a}, "
+                    f"Agent B {results.fallbacks_b}. They are flagged in the downloaded results."
+                )
+
+def display_call_metrics(calls: pd.DataFrame):
+    """
+    Dashboard panel with latency, retry, token, prompt cache and cost figures
+    for the model calls of a game (records from utils.instrumentation).
+    """
+    st.markdown("### **Model Call Metrics**")
+    if calls.empty:
+        st.info("No model calls were recorded for this game.")
+        return
+    summary = summarize_calls(calls)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Calls", summary["calls"], f"{summary['retries']} retries", delta_color="off")
+    col2.metric("p50 / p95 latency", f"{summary['p50_latency_s']:.2f}s / {summary['p95_latency_s']:.2f}s")
+    col3.metric("Tokens per round", f"{summary['tokens_per_round']:.0f}", f"{summary['prompt_cache_hit_rate']:.0%} prompt cached", delta_color="off")
+    col4.metric("Estimated cost", f"${summary['cost_usd']:.4f}", f"{summary['rate_limited']} rate limited", delta_color="off")
+
+    fig = px.histogram(
+        calls[calls["outcome"] != "cache_hit"],
+        x="latency_s",
+        color="outcome",
+        nbins=30,
+        labels={"latency_s": "Latency (s)"},
+        title="Model Call Latency"
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    with st.expander("Per-round call metrics"):
+        st.dataframe(per_round_metrics(calls), use_container_width=True)
+
+def display_model_comparison(df: pd.DataFrame, calls: pd.DataFrame):
+    """
+    Dashboard panel comparing models run on the same experiment grid
+    (results of utils.model_comparison.run_model_comparison).
+    """
+    st.markdown("### **Model Comparison**")
+    if df.empty:
+        st.info("No games finished in this comparison.")
+        return
+    summary = model_summary(df, calls)
+    st.dataframe(summary, use_container_width=True)
+
+    by_experiment = compare_models(df)
+    cooperation = by_experiment["Mutual Cooperation"].reset_index().melt(
+        id_vars="Experiment ID", var_name="Model", value_name="Mutual Cooperation"
+    )
+    fig = px.bar(
+        cooperation,
+        x="Experiment ID",
+        y="Mutual Cooperation",
+        color="Model",
+        barmode="group",
+        title="Mutual Cooperation Rate by Experiment"
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    if "p50_latency_s" in summary:
+        fig = px.bar(
+            summary,
+            x="Model",
+            y=["p50_latency_s", "p95_latency_s"],
+            barmode="group",
+            labels={"value": "Latency (s)", "variable": "Percentile"},
+            title="Model Call Latency"
+        )
+        st.plotly_chart(fig, use_container_width=True)
+    with st.expander("Statistics by experiment"):
+        st.dataframe(by_experiment, use_container_width=True)
+
+def display_game_progress(game_id: str, results: IncrementalResults):
+    """
+    Compact view of a game in progress: running totals and cumulative payoffs.
+    """
+    st.markdown(f"#### Game {game_id}")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Rounds", len(results))
+    col2.metric("Payoff A / B", f"{results.total_a} / {results.total_b}")
+    col3.metric("Cooperated A / B", f"{results.cooperations_a} / {results.cooperations_b}")
+    fig = go.Figure([
+        go.Scatter(x=results.rounds, y=results.cumulative_a, mode='lines', name='Cumulative A Payoff'),
+        go.Scatter(x=results.rounds, y=results.cumulative_b, mode='lines', name='Cumulative B Payoff'),
+    ])
+    fig.update_layout(title="Cumulative Payoffs Over Rounds", xaxis_title='Round', yaxis_title='Cumulative Payoff', height=300)
+    st.plotly_chart(fig, use_container_width=True, key=f"progress_{game_id}")
+
+def plot_rolling_cooperation(df_results: pd.DataFrame, window: int = 10):
+    rolling = rolling_cooperation(df_results, window)
+    fig = px.line(
+        rolling,
+        x='Round',
+        y=['Agent A', 'Agent B'],
+        labels={'value': 'Cooperation Rate', 'Round': 'Round'},
+        title=f"Cooperation Rate over the Last {window} Rounds"
+    )
+    fig.update_layout(legend_title_text='Agents', hovermode='x unified', yaxis_range=[0, 1])
+    return fig
+
+def plot_conditional_cooperation(metrics: pd.DataFrame):
+    columns = ["P(C | Opponent C)", "P(C | Opponent D)", "Retaliation Rate", "Forgiveness Rate"]
+    means = metrics.groupby("Agent")[columns].mean().reset_index().melt(
+        id_vars="Agent", var_name="Metric", value_name="Rate"
+    )
+    fig = px.bar(
+        means,
+        x='Metric',
+        y='Rate',
+        color='Agent',
+        barmode='group',
+        title="Conditional Cooperation, Retaliation and Forgiveness"
+    )
+    fig.update_layout(yaxis_range=[0, 1], hovermode='x unified')
+    return fig
+
+def plot_strategy_profile(metrics: pd.DataFrame):
+    fig = px.bar(
+        strategy_profile(metrics),
+        x='Nearest Strategy',
+        y='Share',
+        color='Agent',
+        barmode='group',
+        title="Nearest Classic Strategy"
+    )
+    fig.update_layout(yaxis_range=[0, 1], hovermode='x unified')
+    return fig
+
+def plot_streak_lengths(metrics: pd.DataFrame):
+    fig = px.histogram(
+        metrics,
+        x='Longest Cooperation Streak',
+        color='Agent',
+        barmode='overlay',
+        nbins=30,
+        title="Longest Cooperation Streak per Game"
+    )
+    fig.update_layout(yaxis_title='Games')
+    return fig
+
+def display_strategy_analytics(metrics: pd.DataFrame, df_results: Optional[pd.DataFrame] = None):
+    """
+    Dashboard panel with the per-game metrics of utils.analytics.game_metrics:
+    conditional cooperation, retaliation and forgiveness, streaks and nearest
+    classic strategy. With `df_results` (a single game) the rolling
+    cooperation rate is charted too; over many games, the distributions.
+    """
+    st.markdown("### **Strategy Analytics**")
+    if metrics.empty:
+        st.info("No games to analyze.")
+        return
+    if df_results is not None:
+        st.plotly_chart(plot_rolling_cooperation(df_results), use_container_width=True)
+    col1, col2 = st.columns(2)
+    col1.plotly_chart(plot_conditional_cooperation(metrics), use_container_width=True)
+    col2.plotly_chart(plot_strategy_profile(metrics), use_container_width=True)
+    if df_results is None:
+        st.plotly_chart(plot_streak_lengths(metrics), use_container_width=True)
+    with st.expander("Per-game strategy metrics"):
+        st.dataframe(metrics, use_container_width=True)
+
+def plot_sweep_surface(summary: pd.DataFrame, value: str = "Cooperation Rate"):
+    fig = px.density_heatmap(
+        summary,
+        x='T',
+        y='S',
+        z=value,
+        histfunc='avg',
+        text_auto='.2f',
+        labels={'T': 'Temptation (T)', 'S': "Sucker's Payoff (S)"},
+        title=f"{value} by Temptation and Sucker's Payoff"
+    )
+    fig.update_layout(coloraxis_colorbar_title_text=value)
+    return fig
+
+def plot_sweep_intervals(summary: pd.DataFrame, value: str = "Cooperation Rate", prefix: str = "Cooperation"):
+    ordered = summary.sort_values(value)
+    fig = go.Figure(go.Scatter(
+        x=ordered["Payoff Matrix"],
+        y=ordered[value],
+        mode='markers',
+        error_y=dict(
+            type='data',
+            symmetric=False,
+            array=ordered[f"{prefix} CI High"] - ordered[value],
+            arrayminus=ordered[value] - ordered[f"{prefix} CI Low"]
+        ),
+        customdata=ordered["Games"],
+        hovertemplate="%{x}<br>%{y:.3f}<br>%{customdata} games<extra></extra>"
+    ))
+    fig.update_layout(title=f"{value} per Payoff Matrix with Confidence Intervals", xaxis_title='Payoff Matrix', yaxis_title=value)
+    return fig
+
+def display_payoff_sweep(summary: pd.DataFrame):
+    """
+    Dashboard panel for a payoff-matrix sweep (utils.payoff_sweep): how many
+    matrices converged, cooperation and payoff surfaces over T and S, and
+    each matrix's estimates with their bootstrap intervals.
+    """
+    st.markdown("### **Payoff Matrix Sweep**")
+    if summary.empty or not summary["Games"].any():
+        st.info("No games finished in this sweep.")
+        return
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Matrices", len(summary))
+    col2.metric("Converged", f"{int(summary['Converged'].sum())} / {len(summary)}")
+    col3.metric("Games played", int(summary["Games"].sum()))
+    col1, col2 = st.columns(2)
+    col1.plotly_chart(plot_sweep_surface(summary, "Cooperation Rate"), use_container_width=True)
+    col2.plotly_chart(plot_sweep_surface(summary, "Mean Payoff"), use_container_width=True)
+    st.plotly_chart(plot_sweep_intervals(summary, "Cooperation Rate", "Cooperation"), use_container_width=True)
+    st.plotly_chart(plot_sweep_intervals(summary, "Mean Payoff", "Payoff"), use_container_width=True)
+    with st.expander("Sweep summary by payoff matrix"):
+        st.dataframe(summary, use_container_width=True)
+
+def plot_baselines(baselines: pd.DataFrame, df_results: Optional[pd.DataFrame] = None):
+    fig = px.scatter(
+        baselines,
+        x='Agent A Payoff',
+        y='Agent B Payoff',
+        hover_name=baselines['Strategy A'] + " vs " + baselines['Strategy B'],
+        hover_data={'Mutual Cooperation': ':.2f', 'Agent A Payoff': ':.2f', 'Agent B Payoff': ':.2f'},
+        title="Expected Payoff per Round: Classic Strategy Pairs vs This Game"
+    )
+    fig.update_traces(name='Strategy pairs', showlegend=True)
+    if df_results is not None and not df_results.empty:
+        fig.add_trace(go.Scatter(
+            x=[df_results['Agent A Payoff'].mean()],
+            y=[df_results['Agent B Payoff'].mean()],
+            mode='markers',
+            marker=dict(symbol='star', size=16),
+            name='This game'
+        ))
+    return fig
+
+def display_matrix_baselines(analysis: "MatrixAnalysis", df_results: Optional[pd.DataFrame] = None):
+    """
+    Dashboard panel with the analysis of a payoff matrix (utils.equilibrium):
+    whether it is a Prisoner's Dilemma, its Nash equilibria and Pareto-optimal
+    outcomes, and the exact expected payoffs of classic strategy pairs, with
+    the game in `df_results` placed among them.
+    """
+    st.markdown("### **Payoff Matrix Baselines**")
+    if analysis.violations:
+        st.warning("Not a Prisoner's Dilemma: " + "; ".join(analysis.violations) + ".")
+    col1, col2 = st.columns(2)
+    col1.markdown("**Nash equilibria (one round)**\n" + "\n".join(
+        f"- {equilibrium.describe()}: payoffs {equilibrium.payoff_a:.2f} / {equilibrium.payoff_b:.2f}"
+        for equilibrium in analysis.nash_equilibria
+    ))
+    col2.markdown("**Pareto-optimal outcomes**\n" + "\n".join(
+        f"- ({decision_a}, {decision_b})" for decision_a, decision_b in analysis.pareto_optimal
+    ))
+    baselines = analysis.baselines
+    if df_results is not None and not df_results.empty:
+        coop_a = df_results["Agent A Decision"] == "Cooperate"
+        coop_b = df_results["Agent B Decision"] == "Cooperate"
+        # Closest in behaviour: each agent's cooperation rate and mutual cooperation
+        game = pd.Series({
+            "Agent A Cooperation": coop_a.mean(),
+            "Agent B Cooperation": coop_b.mean(),
+            "Mutual Cooperation": (coop_a & coop_b).mean(),
+        })
+        distance = ((baselines[game.index] - game) ** 2).sum(axis=1)
+        closest = baselines.loc[distance.idxmin()]
+        st.caption(f"Closest classic pairing: {closest['Strategy A']} vs {closest['Strategy B']}.")
+    st.plotly_chart(plot_baselines(baselines, df_results), use_container_width=True)
+    with st.expander("Expected payoffs of classic strategy pairs"):
+        st.dataframe(baselines, use_container_width=True)